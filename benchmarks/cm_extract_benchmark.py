@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from urllib.parse import quote
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from misc.parse_config import extract_config_info
+from misc.sql_queries import phone_number_query, email_address_query, serial_numbers_query, serial_numbers_query_mysql, cm_db_query, cm_db_query_mysql
+from user_input.cm_extract import extract_cm_tables
+
+'''
+Compares reading the Community Minerals Database queries one after another (as `read_cm_live_db`
+used to) with the partitioned, concurrent extraction of `user_input/cm_extract.py`. Reports wall
+time and the peak of Python memory of each.\n
+
+Usage:
+    python benchmarks/cm_extract_benchmark.py                      (database from misc/database_config.cfg)
+    python benchmarks/cm_extract_benchmark.py --url sqlite:///copy_of_cm.db --workers 8 --partition-size 50000
+'''
+
+
+def sequential(engine, queries: list) -> list:
+    return [pd.read_sql_query(query, engine) for query in queries]
+
+def measure(read, *args) -> 'tuple[float, float, list]':
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    dfs = read(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak / 2 ** 20, dfs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="SQLAlchemy URL of the database, the configured CM Database if not given")
+    parser.add_argument('--workers', type=int, default=4, help="Partitions read at the same time")
+    parser.add_argument('--partition-size', type=int, default=100000, help="Contact IDs per partition")
+    args = parser.parse_args()
+
+    if args.url:
+        url = args.url
+    else:
+        db_host, db_port, db_user, db_password, db_name = extract_config_info()
+        url = f'mysql+pymysql://{db_user}:{quote(db_password)}@{db_host}:{db_port}/{db_name}'
+
+    engine = create_engine(url, pool_size=args.workers, max_overflow=0)
+    if engine.dialect.name == 'sqlite':
+        queries = [phone_number_query, email_address_query, serial_numbers_query, cm_db_query]
+    else:
+        queries = [phone_number_query, email_address_query, serial_numbers_query_mysql, cm_db_query_mysql]
+
+    try:
+        sequential_seconds, sequential_peak, sequential_dfs = measure(sequential, engine, queries)
+        partitioned_seconds, partitioned_peak, partitioned_dfs = measure(extract_cm_tables, engine, queries,
+                                                                         args.workers, args.partition_size)
+    finally:
+        engine.dispose()
+
+    assert [len(df) for df in sequential_dfs] == [len(df) for df in partitioned_dfs]
+
+    print(f"rows per query: {[len(df) for df in partitioned_dfs]}")
+    print(f"sequential:  {sequential_seconds:7.2f}s, peak {sequential_peak:8.1f} MiB")
+    print(f"partitioned: {partitioned_seconds:7.2f}s, peak {partitioned_peak:8.1f} MiB "
+          f"({args.workers} workers, {args.partition_size} IDs per partition)")
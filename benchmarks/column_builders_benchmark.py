@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import random
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transform.column_builders import activity_note_column, marketing_medium_column, assigned_user_column
+
+'''
+Benchmarks the shared column builders against the row by row functions each transform module
+used to apply. Both must give the same column.\n
+
+Usage:
+    python benchmarks/column_builders_benchmark.py --rows 10000 100000
+'''
+
+def legacy_activity_note(row):
+    data_source = row.get('Data Source')
+    from_number = row.get('From')
+    contact_time = row.get('Contact Time')
+
+    if data_source == 'JC Call':
+        return f"JC abandoned call from {from_number} on {contact_time}"
+
+    if data_source == 'RC Call':
+        return f"RC abandoned call from {from_number} on {contact_time}"
+
+    if pd.notna(row.get('Text')):
+        return (
+            f"{data_source}\n\n{row.get('Text')}\n\n"
+            f"Date and Time: {contact_time}\n\n"
+            f"Team Member (Recipient): {row.get('Team Member 2')}"
+        )
+
+    return (
+        "Note: the content of this text is empty\n\n"
+        f"Date and Time: {contact_time}\n\n"
+        f"Team Member (Recipient): {row.get('Team Member 2')}"
+    )
+
+def legacy_marketing_medium(row):
+    team = row.get('Team')
+
+    if team in ('Ringless Voicemail - LG', 'RVM - LG'):
+        return 'RVM'
+    elif team == 'Call Center':
+        return 'Direct Mail'
+    elif team in ('Lead Generation', 'LG'):
+        return 'Cold Call'
+    else:
+        return 'Direct Mail'
+
+def legacy_assigned_user(df: pd.DataFrame) -> pd.Series:
+
+    assigned_user = df.apply(
+        lambda x: 'Jannin' if x['Team Member 2'] in ['Anna Grace Tayag', 'Jude Gella', 'Marketing Team', 'Your Number']
+        or pd.isna(x['Team Member 2'])
+        else x['Team Member 2'],
+        axis=1
+    )
+    assigned_user[assigned_user.str.contains('keena', case=False, na=False)] = 'Jannin'
+
+    return assigned_user
+
+def synthetic_calls(rows: int, rng: random.Random) -> pd.DataFrame:
+
+    return pd.DataFrame({
+        'Contact Time': [pd.Timestamp('2024-03-01') + pd.Timedelta(minutes=rng.randrange(60 * 24 * 30)) for _ in range(rows)],
+        'From': [str(5550000000 + rng.randrange(10 ** 6)) for _ in range(rows)],
+        'To': '5551234567',
+        'Text': [rng.choice([None, 'Please call me back', 'Is this still available?']) for _ in range(rows)],
+        'Data Source': [rng.choice(['JC Call', 'RC Call', 'RC Text', 'JC Text']) for _ in range(rows)],
+        'Team Member 2': [rng.choice(['Anna Grace Tayag', 'Keena Cruz', 'Bob Reyes', None, 'Your Number']) for _ in range(rows)],
+        'Team': [rng.choice(['RVM - LG', 'Call Center', 'LG', 'Lead Generation', 'Other']) for _ in range(rows)]
+    })
+
+def best_time(build, repeat: int) -> 'tuple[float, pd.Series]':
+
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        column = build()
+        best = min(best, time.perf_counter() - started)
+
+    return best, column
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help="Numbers of call rows")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    for rows in args.rows:
+        calls_df = synthetic_calls(rows, rng)
+        builders = [
+            ('activity note', lambda: calls_df.apply(legacy_activity_note, axis=1), lambda: activity_note_column(calls_df, 'From')),
+            ('marketing medium', lambda: calls_df.apply(legacy_marketing_medium, axis=1), lambda: marketing_medium_column(calls_df)),
+            ('assigned user', lambda: legacy_assigned_user(calls_df), lambda: assigned_user_column(calls_df))
+        ]
+
+        print(f"{rows} rows")
+        for name, legacy, builder in builders:
+            legacy_time, legacy_column = best_time(legacy, args.repeat)
+            new_time, new_column = best_time(builder, args.repeat)
+            pd.testing.assert_series_equal(legacy_column, new_column)
+
+            print(f"  {name:<17} apply {legacy_time:.3f}s  builder {new_time:.3f}s  ({new_time / legacy_time:.1%} of apply)")
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import random
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transform.column_builders import email_columns
+
+'''
+Benchmarks the `email_columns` pivot against the grouped lists, `iterrows` and `pd.concat` that
+both `add_email_columns` used to build the `Person - Email 1` to `Person - Email 17` columns.\n
+Both must give the same dataframe.\n
+
+Usage:
+    python benchmarks/email_pivot_benchmark.py --keys 1000 10000 100000
+    python benchmarks/email_pivot_benchmark.py --keys 10000 --max-emails 60
+'''
+
+def legacy_email_columns(emails_df: pd.DataFrame, key_column: str) -> pd.DataFrame:
+
+    email_address_final_df = pd.DataFrame(columns=[key_column] + [f'Person - Email {i}' for i in range(1, 18)])
+    grouped = emails_df.groupby('key')['email'].apply(list).reset_index()
+
+    rows_to_add = []
+    for _, row in grouped.iterrows():
+        row_data = {key_column: row['key']}
+        row_data.update({f'Person - Email {i+1}': email for i, email in enumerate(row['email'][:17])})
+        rows_to_add.append(row_data)
+
+    return pd.concat([email_address_final_df, pd.DataFrame(rows_to_add)], ignore_index=True).drop_duplicates()
+
+def synthetic_emails(keys: int, max_emails: int, rng: random.Random) -> pd.DataFrame:
+
+    # Most contacts have a few emails, some have dozens, the rows of a contact are not next to each other
+    counts = [rng.randint(1, 3) if rng.random() < 0.9 else rng.randint(4, max_emails) for _ in range(keys)]
+    key_values = [key for key, count in enumerate(counts) for _ in range(count)]
+
+    return pd.DataFrame({
+        'key': key_values,
+        'email': [rng.choice([None, f"contact{rng.randrange(10 ** 6)}@example.com"]) if rng.random() < 0.05
+                  else f"contact{rng.randrange(10 ** 6)}@example.com" for _ in key_values]
+    }).sample(frac=1, random_state=rng.randrange(1 << 30), ignore_index=True)
+
+def best_time(build, repeat: int) -> 'tuple[float, pd.DataFrame]':
+
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result_df = build()
+        best = min(best, time.perf_counter() - started)
+
+    return best, result_df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--keys', type=int, nargs='+', default=[1000, 10000, 100000], help="Numbers of contacts")
+    parser.add_argument('--max-emails', type=int, default=40, help="Most emails a contact can have")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    for keys in args.keys:
+        emails_df = synthetic_emails(keys, args.max_emails, rng)
+
+        legacy_time, legacy_df = best_time(lambda: legacy_email_columns(emails_df, 'Person - Phone'), args.repeat)
+        new_time, new_df = best_time(lambda: email_columns(emails_df['key'], emails_df['email'], 'Person - Phone'), args.repeat)
+        pd.testing.assert_frame_equal(legacy_df, new_df)
+
+        print(f"{keys} contacts, {len(emails_df)} email rows")
+        print(f"  iterrows: {legacy_time:.3f}s")
+        print(f"  pivot:    {new_time:.3f}s")
+        print(f"  speedup:  {legacy_time / new_time:.1f}x")
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import user_input.parallel_get as parallel_get
+from user_input.pipedrive_client import PipedriveClient
+from user_input.pipedrive_snapshot import PIPEDRIVE_SNAPSHOT_PATH, read_pipedrive_snapshot
+
+'''
+Measures Pipedrive extraction against the local stand-in server (benchmarks/pipedrive_stand_in.py),
+so runs are repeatable and do not depend on the live API.\n
+
+For every deal count the stand-in is started in its own process, then two numbers are taken:
+fetch throughput (pages downloaded and decoded, nothing else) and the time to a complete snapshot
+(`parallel_get.main(full_refresh=True)`, i.e. metadata, full pull, Parquet snapshot and phone index).
+Everything is written to a temporary folder.\n
+
+Usage:
+    python benchmarks/fetch_benchmark.py --deals 10000 100000 1000000 --latency 0.05 --throttle-rate 0.01
+'''
+
+
+def start_stand_in_process(args: argparse.Namespace, deal_count: int) -> 'tuple[subprocess.Popen, str]':
+
+    stand_in = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipedrive_stand_in.py'),
+         '--deals', str(deal_count), '--port', '0', '--latency', str(args.latency),
+         '--throttle-rate', str(args.throttle_rate), '--failure-rate', str(args.failure_rate)],
+        stdout=subprocess.PIPE,
+        text=True
+    )
+
+    return stand_in, stand_in.stdout.readline().strip()
+
+def time_fetch(base_url: str) -> 'tuple[float, int, dict]':
+
+    with PipedriveClient('benchmark', base_url=base_url) as client:
+        started = time.perf_counter()
+        total_items = client.count_deals()
+        deal_count = sum(len(result.get('data') or [])
+                         for _, result in client.iter_numbered_pages(parallel_get.DEALS_ENDPOINT, {}, total_items=total_items))
+
+        return time.perf_counter() - started, deal_count, client.transfer_stats()
+
+def time_snapshot(base_url: str) -> 'tuple[float, int]':
+
+    os.environ['PIPEDRIVE_BASE_URL'] = base_url
+    os.environ['API_KEY'] = 'benchmark'
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        current_dir = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            os.makedirs(os.path.dirname(PIPEDRIVE_SNAPSHOT_PATH), exist_ok=True)
+            started = time.perf_counter()
+            parallel_get.main(full_refresh=True)
+            elapsed = time.perf_counter() - started
+
+            return elapsed, len(read_pipedrive_snapshot(columns=['Deal - ID']))
+        finally:
+            os.chdir(current_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deals', type=int, nargs='+', default=[10000, 100000, 1000000], help="Deal counts to serve")
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean seconds the stand-in adds to every response")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests answered with 500")
+    args = parser.parse_args()
+
+    for deal_count in args.deals:
+        stand_in, base_url = start_stand_in_process(args, deal_count)
+        try:
+            fetch_seconds, fetched, transfer_stats = time_fetch(base_url)
+            snapshot_seconds, snapshot_rows = time_snapshot(base_url)
+        finally:
+            stand_in.terminate()
+            stand_in.wait()
+
+        assert fetched == deal_count and snapshot_rows == deal_count, (fetched, snapshot_rows, deal_count)
+
+        print(f"{deal_count:>9} deals | fetch {fetch_seconds:7.2f}s ({fetched / fetch_seconds:8.0f} deals/s, "
+              f"{transfer_stats['bytes_received'] / 2 ** 20:7.1f} MiB on the wire) | "
+              f"complete snapshot {snapshot_seconds:7.2f}s ({snapshot_rows / snapshot_seconds:8.0f} deals/s)")
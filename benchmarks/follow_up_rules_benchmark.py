@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transform.follow_up import add_subject_and_assigned_user
+
+'''
+Benchmarks the compiled follow up rules against the row by row `new_add_subject_column` and
+`new_add_assigned_user` they replaced.\n
+The legacy implementation is timed on a sample of the rows and scaled to all of them. Both
+implementations must give the same `Subject` and `Assigned to user` for the sample.\n
+
+Usage:
+    python benchmarks/follow_up_rules_benchmark.py --rows 1000 10000 100000 1000000
+    python benchmarks/follow_up_rules_benchmark.py --rows 50000 --legacy-sample 50000
+'''
+
+def legacy_assign(deal_id_search_result: pd.DataFrame, user_designation: dict, conditions_dict: dict, output: str) -> pd.Series:
+
+    pipeline_conversion = {}
+    date_today = datetime.today()
+    for key, value in user_designation.items():
+        pipeline_conversion[value[0]] = key
+
+    def output_value(values, row, default=False):
+        if output == 'Subject':
+            return values if not default or values != 'None' else None
+        if values == 'Deal Owner':
+            return row['Deal - Owner']
+        elif values == 'CA Tracking Flag':
+            return row['Deal - CA Tracking Flag']
+        return values if values != 'None' else None
+
+    index = 1 if output == 'Subject' else 2
+
+    def check_deal_pipeline(key, pipeline_value):
+        if 'sales' in key.lower():
+            return f"{key.lower()} pipeline" == pipeline_value.lower()
+        return key.lower() in pipeline_value.lower()
+
+    def assign(row):
+        for key in pipeline_conversion:
+            if check_deal_pipeline(key, row['Deal - Pipeline']):
+                value = pipeline_conversion[key]
+
+                found_value = False
+                initial_value = ''
+                for conditions in conditions_dict[value]:
+                    for condition, list_values in conditions.items():
+                        if ' > ' in condition and condition.split(' > ')[0].lower() == row[list_values[0]].lower():
+                            date_value = row[f"Deal - {condition.split(' > ')[0].title()} Date"]
+                            if pd.notna(date_value) and date_value != '':
+                                if (date_today - datetime.strptime(date_value, '%Y-%m-%d')).days > int(condition.split(' > ')[1]):
+                                    return output_value(list_values[index], row)
+
+                        elif ' < ' in condition and condition.split(' < ')[0].lower() == row[list_values[0]].lower():
+                            date_value = row[f"Deal - {condition.split(' < ')[0].title()} Date"]
+                            if pd.notna(date_value) and date_value != '':
+                                if (date_today - datetime.strptime(date_value, '%Y-%m-%d')).days < int(condition.split(' < ')[1]):
+                                    return output_value(list_values[index], row)
+
+                        elif row[list_values[0]].lower() == condition.lower():
+                            found_value = True
+                            initial_value = output_value(list_values[index], row)
+
+                return initial_value if found_value else output_value(user_designation[value][index], row, default=True)
+
+        return None
+
+    return deal_id_search_result.apply(assign, axis=1)
+
+def synthetic_settings() -> 'tuple[dict, dict]':
+
+    user_designation = {
+        1: ['Qualifying', 'QA - Follow Up', 'Deal Owner'],
+        2: ['Conversion', 'None', 'CA Tracking Flag'],
+        3: ['Underwriting', 'UW - Follow Up', 'None'],
+        4: ['Sales', 'Sales - Follow Up', 'Deal Owner'],
+        5: ['Junior Sales', 'None', 'None'],
+        6: ['White Glove', 'WG - Follow Up', 'Keena'],
+        7: ['Fast Close', 'FC - Follow Up', 'Deal Owner'],
+        8: ['PSA', 'None', 'None'],
+        9: ['Diligence', 'DD - Follow Up', 'CA Tracking Flag'],
+        10: ['Closing', 'None', 'Deal Owner']
+    }
+    conditions_dict = {key: [] for key in user_designation}
+    conditions_dict[1] = [
+        {'Offer Ready > 30': ['Deal - Stage', 'AA - Follow Up', 'Deal Owner']},
+        {'Offer Ready < 7': ['Deal - Stage', 'AA - New Offer', 'CA Tracking Flag']},
+        {'Contacted': ['Deal - Stage', 'Call Back', 'None']},
+        {'contacted': ['Deal - Stage', 'Call Back Again', 'Keena']}
+    ]
+    conditions_dict[4] = [
+        {'Won': ['Deal - Status', 'Closing - Follow Up', 'Deal Owner']},
+        {'Offer Ready > 14': ['Deal - Stage', 'Sales - Offer', 'Deal Owner']}
+    ]
+    conditions_dict[6] = [
+        {'Offer Ready < 60': ['Deal - Stage', 'WG - Offer', 'None']}
+    ]
+
+    return user_designation, conditions_dict
+
+def synthetic_rows(rows: int, rng: random.Random) -> pd.DataFrame:
+
+    pipelines = ['Qualifying Pipeline', 'Conversion', 'Underwriting Pipeline', 'Sales Pipeline', 'Junior Sales Pipeline',
+                 'Sales Ops', 'White Glove Pipeline', 'Fast Close', 'PSA Pipeline', 'Diligence', 'Closing', 'Archive']
+    stages = ['Offer Ready', 'offer ready', 'Contacted', 'New', 'Negotiation']
+    today = datetime.today()
+
+    return pd.DataFrame({
+        'Deal - Pipeline': [rng.choice(pipelines) for _ in range(rows)],
+        'Deal - Stage': [rng.choice(stages) for _ in range(rows)],
+        'Deal - Status': [rng.choice(['Open', 'Won', 'Lost']) for _ in range(rows)],
+        'Deal - Offer Ready Date': [rng.choice([None, '', (today - timedelta(days=rng.randint(-5, 90))).strftime('%Y-%m-%d')])
+                                    for _ in range(rows)],
+        'Deal - Owner': [rng.choice(['Ana', 'Ben', None]) for _ in range(rows)],
+        'Deal - CA Tracking Flag': [rng.choice(['Flag A', 'Flag B', None]) for _ in range(rows)]
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000, 1000000], help="Numbers of follow up rows")
+    parser.add_argument('--legacy-sample', type=int, default=20000, help="Rows the legacy implementation is timed on")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    user_designation, conditions_dict = synthetic_settings()
+
+    for rows in args.rows:
+        rows_df = synthetic_rows(rows, rng)
+
+        started = time.perf_counter()
+        new_df = add_subject_and_assigned_user(rows_df.copy(), user_designation, conditions_dict)
+        new_time = time.perf_counter() - started
+
+        sample_df = rows_df.head(args.legacy_sample)
+        started = time.perf_counter()
+        legacy_subject = legacy_assign(sample_df, user_designation, conditions_dict, 'Subject')
+        legacy_user = legacy_assign(sample_df, user_designation, conditions_dict, 'Assigned to user')
+        legacy_time = (time.perf_counter() - started) * rows / len(sample_df)
+
+        assert legacy_subject.tolist() == new_df['Subject'].head(len(sample_df)).tolist(), "Subject differs"
+        assert legacy_user.tolist() == new_df['Assigned to user'].head(len(sample_df)).tolist(), "Assigned to user differs"
+
+        estimated = " (estimated)" if len(sample_df) < rows else ""
+        print(f"{rows} rows")
+        print(f"  row by row:     {legacy_time:.3f}s{estimated}")
+        print(f"  compiled rules: {new_time:.3f}s")
+        print(f"  speedup:        {legacy_time / new_time:.1f}x")
@@ -0,0 +1,94 @@
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_input.parallel_get import DEAL_FIELDS, process_data, slim_deals_page
+from user_input.pipedrive_client import decode_json, orjson
+from process_data_benchmark import synthetic_lookups
+from pipedrive_stand_in import synthetic_deal
+
+'''
+Measures CPU time and memory per deals page for the old decode path (`json.loads` of whole deal
+objects, as `response.json()` did) and the new one (`decode_json` with orjson when installed, and the
+page trimmed by `slim_deals_page`).\n
+
+For each path the benchmark reports the CPU time to decode and to convert a page, the memory a
+decoded page holds while it waits in the pipeline queues, and the peak memory of decoding and
+converting one page.\n
+
+Usage:
+    python benchmarks/page_decode_benchmark.py --pages 50 --page-size 500
+'''
+
+
+def page_bodies(page_count: int, page_size: int, fields: 'list | None' = None) -> list:
+
+    bodies = []
+    for page in range(page_count):
+        deals = [synthetic_deal(page * page_size + index) for index in range(page_size)]
+        if fields:
+            deals = [{field: deal.get(field) for field in fields} for deal in deals]
+        bodies.append(json.dumps({'success': True, 'data': deals}).encode())
+
+    return bodies
+
+def old_decode(content: bytes) -> dict:
+    return json.loads(content)
+
+def new_decode(content: bytes) -> dict:
+    return slim_deals_page(decode_json(content))
+
+def measure(decode, bodies: list, lookups: dict) -> dict:
+
+    decode_seconds = 0.0
+    convert_seconds = 0.0
+    for content in bodies:
+        started = time.process_time()
+        result = decode(content)
+        decode_seconds += time.process_time() - started
+
+        started = time.process_time()
+        process_data(result, lookups)
+        convert_seconds += time.process_time() - started
+        del result
+
+    # Memory of one decoded page waiting in a queue, and peak of decoding and converting it
+    gc.collect()
+    tracemalloc.start()
+    result = decode(bodies[0])
+    held_bytes = tracemalloc.get_traced_memory()[0]
+    process_data(result, lookups)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+
+    return {
+        'decode_ms': decode_seconds / len(bodies) * 1000,
+        'convert_ms': convert_seconds / len(bodies) * 1000,
+        'held_mib': held_bytes / 2 ** 20,
+        'peak_mib': peak_bytes / 2 ** 20
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=50, help="Number of pages to decode")
+    parser.add_argument('--page-size', type=int, default=500, help="Deals per page")
+    args = parser.parse_args()
+
+    lookups = synthetic_lookups()
+    print(f"orjson {'installed' if orjson is not None else 'not installed, decode_json uses json'}")
+
+    for label, fields in (('whole deal objects', None), ('field-selected deals', DEAL_FIELDS)):
+        bodies = page_bodies(args.pages, args.page_size, fields)
+        print(f"{label} ({sum(map(len, bodies)) / len(bodies) / 2 ** 10:.0f} KiB per page):")
+
+        for name, decode in (('old', old_decode), ('new', new_decode)):
+            stats = measure(decode, bodies, lookups)
+            print(f"  {name}: decode {stats['decode_ms']:6.2f} ms/page, process_data {stats['convert_ms']:6.2f} ms/page, "
+                  f"decoded page holds {stats['held_mib']:5.2f} MiB, peak {stats['peak_mib']:5.2f} MiB")
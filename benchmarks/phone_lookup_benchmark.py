@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_input.parallel_get import process_data
+from user_input.pipedrive_snapshot import read_pipedrive_snapshot, write_pipedrive_snapshot
+from user_input.phone_index import build_phone_index, load_phone_index
+from process_data_benchmark import synthetic_pages, synthetic_lookups
+
+'''
+Compares looking up Deal IDs of ANI numbers by exploding the phone_number column of the snapshot,
+as Lookup Deal ID did before, with the memory-mapped phone index.\n
+
+Usage:
+    python benchmarks/phone_lookup_benchmark.py --pages 200 --calls 2000
+'''
+
+def legacy_lookup(snapshot_path: str, phones: pd.Series) -> pd.Series:
+
+    pipedrive_df = read_pipedrive_snapshot(columns=['Deal - ID', 'phone_number'], path=snapshot_path)
+    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].fillna('').astype(str)
+    pipedrive_df = pipedrive_df[pipedrive_df['phone_number'].str.strip() != '']
+    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].str.split(',')
+    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].apply(lambda x: sorted(set(x), key=x.index))
+
+    pipedrive_final_data = pipedrive_df.explode('phone_number').reset_index(drop=True)
+    pipedrive_final_data['phone_number'] = pipedrive_final_data['phone_number'].str.replace(r'\D', '', regex=True)
+    pipedrive_final_data = pipedrive_final_data[pipedrive_final_data['phone_number'] != '']
+
+    grouped_df = (
+        pipedrive_final_data.groupby('phone_number')['Deal - ID']
+        .agg(lambda row: " | ".join(row.astype(str).unique()))
+        .reset_index()
+    )
+    phone_to_deal = grouped_df.set_index('phone_number')['Deal - ID'].to_dict()
+
+    return phones.map(phone_to_deal)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=200, help="Number of synthetic 500-deal pages")
+    parser.add_argument('--calls', type=int, default=2000, help="Number of ANI numbers to look up")
+    args = parser.parse_args()
+
+    lookups = synthetic_lookups()
+    pipedrive_df = pd.concat([process_data(page, lookups) for page in synthetic_pages(args.pages)], ignore_index=True)
+
+    # Half of the calls come from a known phone number
+    rng = random.Random(11)
+    known_phones = pipedrive_df['Person - Phone 1'].dropna().tolist()
+    phones = pd.Series([rng.choice(known_phones) if rng.random() < 0.5 else str(rng.randint(2000000000, 9999999999))
+                        for _ in range(args.calls)])
+
+    with tempfile.TemporaryDirectory() as folder:
+        snapshot_path = os.path.join(folder, 'pipedrive_data.parquet')
+        index_path = os.path.join(folder, 'phone_index')
+        write_pipedrive_snapshot(pipedrive_df, snapshot_path)
+
+        started = time.perf_counter()
+        legacy_deal_ids = legacy_lookup(snapshot_path, phones)
+        legacy_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        build_phone_index(snapshot_path, index_path)
+        build_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        deal_ids = load_phone_index(snapshot_path, index_path).lookup_deal_ids(phones)
+        index_time = time.perf_counter() - started
+
+    assert deal_ids.fillna('').equals(legacy_deal_ids.fillna('')), "Deal IDs differ"
+
+    print(f"{len(pipedrive_df)} deals, {len(phones)} ANI numbers, {deal_ids.notna().sum()} found")
+    print(f"explode and group per run: {legacy_time:.3f}s")
+    print(f"index build at sync:       {build_time:.3f}s")
+    print(f"index load and lookup:     {index_time:.4f}s")
@@ -0,0 +1,282 @@
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import random
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_input.parallel_get import (
+    DEAL_STATUS_KEY, CA_TRACKING_FLAG_KEY, UNIQUE_DATABASE_ID_KEY, OFFER_READY_DATE_KEY, OFFER_READY_SMALL_DATE_KEY
+)
+
+'''
+Local stand-in for the parts of the Pipedrive API the extractor uses, so extraction can be run and
+benchmarked without the live host.\n
+
+Serves api/v1/deals (with pagination and field selectors), deals/summary, recents, dealFields,
+pipelines and stages. Deals are either generated from their index, so any number of deals can be
+served without holding them in memory, or replayed from recorded fixtures. Latency, 429 responses
+and failures can be injected.\n
+
+Usage:
+    python benchmarks/pipedrive_stand_in.py --deals 100000 --port 8765 --latency 0.05 --throttle-rate 0.01
+
+    Then point the extractor at it:
+        PIPEDRIVE_BASE_URL=http://127.0.0.1:8765 python user_input/parallel_get.py
+
+Recorded fixtures are a folder with deals.json (list of deal objects) and the response bodies
+dealFields.json, pipelines.json and stages.json.\n
+'''
+
+# Filler for the fields a full deal object has but the extractor does not read
+UNUSED_DEAL_FIELDS = {f"{index:040x}": None for index in range(60)}
+UNUSED_DEAL_FIELDS.update({
+    'org_id': {'name': 'Mineral Owner LLC', 'people_count': 1, 'owner_id': 1, 'address': None, 'active_flag': True},
+    'creator_user_id': {'id': 1, 'name': 'Creator', 'email': 'creator@example.com', 'has_pic': 0, 'active_flag': True},
+    'currency': 'USD', 'value': 0, 'status': 'open', 'visible_to': '3', 'probability': None
+})
+
+SYNTHETIC_OWNERS = [f"Owner {index}" for index in range(1, 26)]
+SYNTHETIC_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_metadata() -> dict:
+
+    return {
+        'dealFields': {'success': True, 'data': [
+            {'id': 12560, 'key': CA_TRACKING_FLAG_KEY, 'options': [{'id': id, 'label': f"Flag {id}"} for id in range(1, 11)]},
+            {'id': 12496, 'key': DEAL_STATUS_KEY, 'options': [{'id': id, 'label': f"Status {id}"} for id in range(1, 21)]}
+        ]},
+        'pipelines': {'success': True, 'data': [{'id': id, 'name': f"Pipeline {id} Pipeline"} for id in range(1, 9)]},
+        'stages': {'success': True, 'data': [{'id': id, 'name': f"Stage {id}", 'pipeline_id': 1 + id % 8} for id in range(1, 41)]}
+    }
+
+def synthetic_deal(index: int) -> dict:
+    '''
+    Builds the deal at `index`. The same index always gives the same deal.\n
+    '''
+
+    rng = random.Random(index)
+    deal_id = index + 1
+    phones = [{'label': 'work', 'value': f" {rng.randint(2000000000, 9999999999)} ", 'primary': position == 0}
+              for position in range(rng.choice([0, 1, 1, 1, 2, 3]))]
+
+    return {
+        'id': deal_id,
+        'title': f"Deal {deal_id}",
+        'person_id': None if rng.random() < 0.05 else {
+            'name': f"Person {deal_id}",
+            'email': [{'label': 'work', 'value': f"person{deal_id}@example.com", 'primary': True}],
+            'phone': phones,
+            'owner_id': 1,
+            'value': deal_id * 3
+        },
+        'user_id': {'id': 1, 'name': rng.choice(SYNTHETIC_OWNERS), 'email': 'owner@example.com', 'active_flag': True},
+        'stage_id': rng.randint(1, 40),
+        'pipeline_id': rng.randint(1, 8),
+        CA_TRACKING_FLAG_KEY: rng.choice([None, '1', '2,3']),
+        UNIQUE_DATABASE_ID_KEY: f"UDB{deal_id}",
+        DEAL_STATUS_KEY: rng.choice([None, '1', '4,5', '2,19']),
+        OFFER_READY_DATE_KEY: rng.choice([None, '2024-05-01']),
+        OFFER_READY_SMALL_DATE_KEY: rng.choice([None, '2024-06-12']),
+        'update_time': (SYNTHETIC_EPOCH + timedelta(seconds=index)).strftime('%Y-%m-%d %H:%M:%S'),
+        **UNUSED_DEAL_FIELDS
+    }
+
+
+class StandIn:
+    '''
+    Deal store and fault injection settings shared by all request handlers.\n
+    '''
+
+    def __init__(self,
+                 deal_count: int = 10000,
+                 fixtures: 'str | None' = None,
+                 latency: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 failure_rate: float = 0.0,
+                 rate_limit: int = 80,
+                 seed: int = 1):
+
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'throttled': 0, 'failed': 0}
+
+        if fixtures:
+            with open(os.path.join(fixtures, 'deals.json'), 'r', encoding='utf-8') as deals_file:
+                self.recorded_deals = json.load(deals_file)
+            self.deal_count = len(self.recorded_deals)
+            self.metadata = {}
+            for name in ('dealFields', 'pipelines', 'stages'):
+                with open(os.path.join(fixtures, f"{name}.json"), 'r', encoding='utf-8') as metadata_file:
+                    self.metadata[name] = json.load(metadata_file)
+        else:
+            self.recorded_deals = None
+            self.deal_count = deal_count
+            self.metadata = synthetic_metadata()
+
+    def deal(self, index: int) -> dict:
+        return self.recorded_deals[index] if self.recorded_deals is not None else synthetic_deal(index)
+
+    def draw_fault(self) -> 'str | None':
+
+        with self.lock:
+            self.counts['requests'] += 1
+            draw = self.random.random()
+            if draw < self.throttle_rate:
+                self.counts['throttled'] += 1
+                return 'throttle'
+            if draw < self.throttle_rate + self.failure_rate:
+                self.counts['failed'] += 1
+                return 'failure'
+        return None
+
+
+def make_handler(stand_in: StandIn):
+
+    def deals_page(start: int, limit: int, fields: 'tuple | None') -> bytes:
+
+        deals = [stand_in.deal(index) for index in range(start, min(start + limit, stand_in.deal_count))]
+        if fields:
+            deals = [{field: deal.get(field) for field in fields} for deal in deals]
+
+        more_items = start + limit < stand_in.deal_count
+        body = {
+            'success': True,
+            'data': deals or None,
+            'additional_data': {'pagination': {
+                'start': start, 'limit': limit, 'more_items_in_collection': more_items,
+                **({'next_start': start + limit} if more_items else {})
+            }}
+        }
+
+        return json.dumps(body).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def send_body(self, body: bytes, status: int = 200, headers: 'dict | None' = None) -> None:
+
+            if 'gzip' in (self.headers.get('Accept-Encoding') or '') and body:
+                body = gzip.compress(body, compresslevel=5)
+                headers = {**(headers or {}), 'Content-Encoding': 'gzip'}
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('x-ratelimit-limit', str(stand_in.rate_limit))
+            self.send_header('x-ratelimit-remaining', str(stand_in.rate_limit))
+            self.send_header('x-ratelimit-reset', '2')
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+
+            if stand_in.latency:
+                time.sleep(stand_in.latency * (0.5 + stand_in.random.random()))
+
+            fault = stand_in.draw_fault()
+            if fault == 'throttle':
+                self.send_body(b'{"success": false, "error": "Too many requests"}', 429,
+                               {'Retry-After': '1', 'x-ratelimit-remaining': '0'})
+                return
+            if fault == 'failure':
+                self.send_body(b'{"success": false, "error": "Internal error"}', 500)
+                return
+
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            path = url.path.rstrip('/')
+            start = int(query.get('start', ['0'])[0])
+            limit = int(query.get('limit', ['100'])[0])
+
+            selector = re.fullmatch(r'/api/v1/deals:\((.*)\)', path)
+            if path == '/api/v1/deals' or selector:
+                fields = tuple(selector.group(1).split(',')) if selector else None
+                self.send_body(deals_page(start, limit, fields))
+
+            elif path == '/api/v1/deals/summary':
+                self.send_body(json.dumps({'success': True, 'data': {'total_count': stand_in.deal_count}}).encode())
+
+            elif path == '/api/v1/recents':
+                since = query.get('since_timestamp', ['1970-01-01 00:00:00'])[0]
+                changed = [{'item': 'deal', 'id': deal['id'], 'data': deal}
+                           for deal in map(stand_in.deal, range(stand_in.deal_count)) if deal.get('update_time', '') > since]
+                page = changed[start:start + limit]
+                more_items = start + limit < len(changed)
+                body = {'success': True, 'data': page or None, 'additional_data': {'pagination': {
+                    'start': start, 'limit': limit, 'more_items_in_collection': more_items,
+                    **({'next_start': start + limit} if more_items else {})
+                }}}
+                self.send_body(json.dumps(body).encode())
+
+            elif path.rsplit('/', 1)[-1] in stand_in.metadata:
+                body = json.dumps(stand_in.metadata[path.rsplit('/', 1)[-1]]).encode()
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                else:
+                    self.send_body(body, headers={'ETag': etag})
+
+            else:
+                self.send_body(b'{"success": false, "error": "Unknown method"}', 404)
+
+    return Handler
+
+def start_stand_in(stand_in: StandIn, port: int = 0) -> ThreadingHTTPServer:
+    '''
+    Starts the stand-in server in a background thread and returns it. The base URL is
+    `http://127.0.0.1:{server.server_port}`.\n
+    '''
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(stand_in))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deals', type=int, default=10000, help="Number of synthetic deals")
+    parser.add_argument('--fixtures', help="Folder of recorded deals and metadata to replay instead")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on, 0 picks a free port")
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean seconds added to every response")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests answered with 500")
+    args = parser.parse_args()
+
+    stand_in = StandIn(deal_count=args.deals,
+                       fixtures=args.fixtures,
+                       latency=args.latency,
+                       throttle_rate=args.throttle_rate,
+                       failure_rate=args.failure_rate)
+    server = start_stand_in(stand_in, args.port)
+
+    # The first line is read by the fetch benchmark to find the port
+    print(f"http://127.0.0.1:{server.server_port}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"Served {stand_in.counts}")
@@ -0,0 +1,195 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_input.parallel_get import (
+    process_data, PIPEDRIVE_COLUMNS, DEAL_STATUS_KEY, CA_TRACKING_FLAG_KEY,
+    UNIQUE_DATABASE_ID_KEY, OFFER_READY_DATE_KEY, OFFER_READY_SMALL_DATE_KEY
+)
+
+'''
+Benchmarks `process_data` against the row-by-row implementation it replaced.\n
+Pages are read from a folder of recorded `api/v1/deals` response bodies (one JSON file per page)
+or generated. Both implementations must produce the same rows, apart from the order of phones,
+which the old implementation took from a set.\n
+
+Usage:
+    python benchmarks/process_data_benchmark.py --pages 40
+    python benchmarks/process_data_benchmark.py --recorded path/to/pages
+'''
+
+PHONE_COLUMNS = PIPEDRIVE_COLUMNS[4:15]
+
+def legacy_process_data(data: dict, lookups: dict) -> pd.DataFrame:
+
+    deal_status_dict = lookups['deal_status']
+    ca_tracking_flag_dict = lookups['ca_tracking_flag']
+    pipeline_dict = lookups['pipelines']
+    stages_dict = lookups['stages']
+
+    row_data_list = []
+
+    for row in data['data']:
+
+        deal_status_final = None
+        deal_status = row[DEAL_STATUS_KEY]
+        if deal_status is not None:
+            deal_status_list = deal_status.split(',')
+            deal_status_final = ", ".join(deal_status_dict[id] for id in deal_status_list if id in deal_status_dict)
+
+        ca_tracking_final = None
+        ca_tracking = row[CA_TRACKING_FLAG_KEY]
+        if ca_tracking is not None:
+            ca_tracking_list = ca_tracking.split(',')
+            ca_tracking_final = ", ".join(ca_tracking_flag_dict[id] for id in ca_tracking_list if id in ca_tracking_flag_dict)
+
+        person_info = row.get('person_id')
+        if person_info:
+            person_id = row['person_id']['value']
+            contact_person = row['person_id']['name']
+            all_phones = {phone['value'].strip() for phone in row['person_id']['phone']}
+            phone_numbers = ", ".join(all_phones) if all_phones else None
+
+            person_phones = []
+            for idx, phone in enumerate(all_phones):
+                if idx < 10:
+                    person_phones.append(phone)
+            while len(person_phones) < 10:
+                person_phones.append(None)
+        else:
+            person_id = contact_person = phone_numbers = None
+            person_phones = [None] * 10
+
+        row_data = [
+            row['id'],
+            row['title'],
+            person_id,
+            contact_person,
+            phone_numbers,
+            *person_phones,
+            row['user_id']['name'],
+            stages_dict[row['stage_id']],
+            pipeline_dict[row['pipeline_id']],
+            ca_tracking_final,
+            row[UNIQUE_DATABASE_ID_KEY],
+            deal_status_final,
+            row[OFFER_READY_DATE_KEY],
+            row[OFFER_READY_SMALL_DATE_KEY]
+        ]
+
+        row_data_list.append(row_data)
+
+        columns = list(PIPEDRIVE_COLUMNS)
+
+    return pd.DataFrame(row_data_list, columns=columns)
+
+def synthetic_lookups() -> dict:
+
+    return {
+        'deal_status': {**{str(id): f"Status {id}" for id in range(1, 21)}, None: None},
+        'ca_tracking_flag': {**{str(id): f"Flag {id}" for id in range(1, 11)}, None: None},
+        'pipelines': {id: f"Pipeline {id}" for id in range(1, 9)},
+        'stages': {id: f"Stage {id}" for id in range(1, 41)}
+    }
+
+def synthetic_pages(page_count: int, page_size: int = 500, seed: int = 7) -> list:
+
+    rng = random.Random(seed)
+    pages = []
+
+    for page in range(page_count):
+        deals = []
+        for offset in range(page_size):
+            deal_id = page * page_size + offset + 1
+            phones = [{'value': f" {rng.randint(2000000000, 9999999999)} "} for _ in range(rng.choice([0, 1, 1, 2, 3, 12]))]
+            deals.append({
+                'id': deal_id,
+                'title': f"Deal {deal_id}",
+                'person_id': None if rng.random() < 0.05 else {'value': deal_id * 3, 'name': f"Person {deal_id}", 'phone': phones},
+                'user_id': {'name': f"Owner {rng.randint(1, 25)}"},
+                'stage_id': rng.randint(1, 40),
+                'pipeline_id': rng.randint(1, 8),
+                CA_TRACKING_FLAG_KEY: rng.choice([None, '1', '2,3', '11']),
+                UNIQUE_DATABASE_ID_KEY: f"UDB{deal_id}",
+                DEAL_STATUS_KEY: rng.choice([None, '1', '4,5', '2,19,20', '']),
+                OFFER_READY_DATE_KEY: rng.choice([None, '2024-05-01']),
+                OFFER_READY_SMALL_DATE_KEY: rng.choice([None, '2024-06-12'])
+            })
+        pages.append({'success': True, 'data': deals})
+
+    return pages
+
+def recorded_pages(folder: str) -> list:
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(folder, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as page_file:
+            pages.append(json.load(page_file))
+
+    return [page for page in pages if page.get('data')]
+
+def time_run(function, pages: list, lookups: dict, repeat: int) -> 'tuple[float, pd.DataFrame]':
+
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = [function(page, lookups) for page in pages]
+        best = min(best, time.perf_counter() - started)
+
+    return best, pd.concat(chunks, ignore_index=True)
+
+def check_same_rows(legacy_df: pd.DataFrame, new_df: pd.DataFrame) -> None:
+
+    other_columns = [column for column in PIPEDRIVE_COLUMNS if column not in PHONE_COLUMNS]
+    pd.testing.assert_frame_equal(legacy_df[other_columns], new_df[other_columns])
+
+    def phone_sets(df: pd.DataFrame) -> list:
+        return [set((phones or '').split(', ')) for phones in df['phone_number']]
+
+    assert phone_sets(legacy_df) == phone_sets(new_df), "phone_number differs"
+
+    def slot_counts(df: pd.DataFrame) -> list:
+        return df[PHONE_COLUMNS[1:]].notna().sum(axis=1).tolist()
+
+    assert slot_counts(legacy_df) == slot_counts(new_df), "phone slots differ"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=40, help="Number of synthetic 500-deal pages")
+    parser.add_argument('--recorded', help="Folder of recorded deals pages, one JSON body per file")
+    parser.add_argument('--lookups', help="JSON file with deal_status, ca_tracking_flag, pipelines and stages lookups")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.recorded:
+        pages = recorded_pages(args.recorded)
+        with open(args.lookups, 'r', encoding='utf-8') as lookups_file:
+            raw_lookups = json.load(lookups_file)
+        # JSON keys are strings, pipelines and stages are keyed by integer ids in the API
+        lookups = {
+            'deal_status': {**raw_lookups['deal_status'], None: None},
+            'ca_tracking_flag': {**raw_lookups['ca_tracking_flag'], None: None},
+            'pipelines': {int(id): name for id, name in raw_lookups['pipelines'].items()},
+            'stages': {int(id): name for id, name in raw_lookups['stages'].items()}
+        }
+    else:
+        pages = synthetic_pages(args.pages)
+        lookups = synthetic_lookups()
+
+    deal_count = sum(len(page['data']) for page in pages)
+
+    legacy_time, legacy_df = time_run(legacy_process_data, pages, lookups, args.repeat)
+    new_time, new_df = time_run(process_data, pages, lookups, args.repeat)
+    check_same_rows(legacy_df, new_df)
+
+    print(f"{len(pages)} pages, {deal_count} deals")
+    print(f"row by row: {legacy_time:.3f}s ({deal_count / legacy_time:,.0f} deals/s)")
+    print(f"columnar:   {new_time:.3f}s ({deal_count / new_time:,.0f} deals/s)")
+    print(f"speedup:    {legacy_time / new_time:.1f}x")
@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import random
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_input.bottoms_up_db import BottomsUpTable, BOTTOMS_UP_COLUMNS
+from transform.bottoms_up_new_deals import add_serial_group_fields
+
+'''
+Benchmarks `add_serial_group_fields` against the implementation that filtered the whole Bottoms Up
+table for every serial of every phone.\n
+The legacy implementation grows with phones x serials x table rows, so it is timed on a sample of
+the phones and scaled to all of them. Both implementations must give the same rows for the sample.\n
+
+Usage:
+    python benchmarks/serial_group_benchmark.py --phones 1000 10000 100000
+    python benchmarks/serial_group_benchmark.py --phones 10000 --rows 200000 --legacy-sample 500
+'''
+
+def legacy_add_serial_group_fields(bottoms_up_exist: pd.DataFrame, bottoms_up_df: pd.DataFrame) -> pd.DataFrame:
+
+    serials_by_phone = bottoms_up_exist.groupby('phone_number')['serial_number'] \
+        .apply(lambda seq: [s.strip() for s in seq if pd.notna(s) and str(s).strip() != ""]) \
+        .reset_index(name='serials')
+
+    rows = []
+    for _, r in serials_by_phone.iterrows():
+        serials = r['serials']
+
+        ids_seen = []
+        for s in serials:
+            matches_for_serial = bottoms_up_df[bottoms_up_df['serial_number'].astype(str).str.strip() == str(s).strip()]
+            for _id in matches_for_serial['id'].dropna().astype(str).tolist():
+                if _id not in ids_seen:
+                    ids_seen.append(_id)
+
+        if serials:
+            matches_first = bottoms_up_df[bottoms_up_df['serial_number'].astype(str).str.strip() == str(serials[0]).strip()]
+            cg_vals = matches_first['contact_group_id'].dropna().unique().tolist()
+            contact_group_id = (
+                str(int(cg_vals[0])) if cg_vals and isinstance(cg_vals[0], (float, int)) else str(cg_vals[0]) if cg_vals else ""
+            )
+            if matches_first['contact_group_id'].dropna().empty:
+                offers = matches_first['sum_of_all_offers'].sum()
+            else:
+                offers = matches_first.drop_duplicates('contact_group_id')['sum_of_all_offers'].sum()
+        else:
+            contact_group_id = ""
+            offers = 0.0
+
+        rows.append({
+            'phone_number': r['phone_number'],
+            'serial_group_ids': "|".join(ids_seen),
+            'serial_group_contact_group_ids': contact_group_id,
+            'serial_group_sum_of_all_offers': offers
+        })
+
+    return pd.DataFrame(rows)
+
+def synthetic_table(rows: int, rng: random.Random) -> pd.DataFrame:
+
+    # A few rows share each serial number, some serials have padding, no group or no offers
+    serial_count = max(rows // 3, 1)
+    serials = [f"SN{rng.randrange(serial_count):07d}" for _ in range(rows)]
+
+    table_df = pd.DataFrame({column: None for column in BOTTOMS_UP_COLUMNS.values()}, index=range(rows))
+    table_df['id'] = range(1, rows + 1)
+    table_df['serial_number'] = [f" {serial} " if rng.random() < 0.05 else serial for serial in serials]
+    table_df['contact_group_id'] = [rng.choice([None, float(rng.randrange(rows // 5 + 1))]) for _ in range(rows)]
+    table_df['sum_of_all_offers'] = [rng.choice([float('nan'), round(rng.uniform(0, 50000), 2)]) for _ in range(rows)]
+
+    return table_df
+
+def synthetic_exist(phones: int, table_df: pd.DataFrame, rng: random.Random) -> pd.DataFrame:
+
+    # Every matched phone has one to three Bottoms Up rows, some without a serial number
+    table_serials = table_df['serial_number'].str.strip().tolist()
+    phone_numbers, serial_numbers = [], []
+    for phone in range(phones):
+        for _ in range(rng.randint(1, 3)):
+            phone_numbers.append(5550000000 + phone)
+            serial_numbers.append(rng.choice([None, "", rng.choice(table_serials), "SN-UNKNOWN"]) if rng.random() < 0.1
+                                  else rng.choice(table_serials))
+
+    return pd.DataFrame({
+        'phone_number': pd.array(phone_numbers, dtype='Int64'),
+        'serial_number': serial_numbers
+    }).sample(frac=1, random_state=rng.randrange(1 << 30), ignore_index=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--phones', type=int, nargs='+', default=[1000, 10000, 100000], help="Numbers of matched phones")
+    parser.add_argument('--rows', type=int, default=100000, help="Rows of the synthetic Bottoms Up table")
+    parser.add_argument('--legacy-sample', type=int, default=1000, help="Phones the legacy implementation is timed on")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    table_df = synthetic_table(args.rows, rng)
+
+    print(f"{args.rows} Bottoms Up rows")
+    for phones in args.phones:
+        exist_df = synthetic_exist(phones, table_df, rng)
+
+        # The serial index is built once per table, its build is part of the first lookup
+        bottoms_up = BottomsUpTable(rows_df=table_df)
+        started = time.perf_counter()
+        new_df = add_serial_group_fields(exist_df, bottoms_up)
+        new_time = time.perf_counter() - started
+
+        sample_phones = exist_df['phone_number'].drop_duplicates().head(args.legacy_sample)
+        sample_df = exist_df[exist_df['phone_number'].isin(sample_phones)]
+        started = time.perf_counter()
+        legacy_df = legacy_add_serial_group_fields(sample_df, bottoms_up.lookup_df)
+        legacy_time = (time.perf_counter() - started) * phones / len(sample_phones)
+
+        pd.testing.assert_frame_equal(legacy_df, add_serial_group_fields(sample_df, bottoms_up), check_dtype=False)
+
+        estimated = " (estimated)" if len(sample_phones) < phones else ""
+        print(f"{phones} phones, {len(exist_df)} matched rows")
+        print(f"  per serial scan: {legacy_time:.3f}s{estimated}")
+        print(f"  serial index:    {new_time:.3f}s")
+        print(f"  speedup:         {legacy_time / new_time:.1f}x")
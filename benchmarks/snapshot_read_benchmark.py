@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_input.parallel_get import process_data
+from user_input.pipedrive_snapshot import read_pipedrive_snapshot, write_pipedrive_snapshot
+from process_data_benchmark import synthetic_pages, synthetic_lookups
+
+'''
+Compares reading the Pipedrive snapshot as CSV, the old format, and as Parquet, both whole
+and with only the two columns the UI reads.\n
+
+Usage:
+    python benchmarks/snapshot_read_benchmark.py --pages 200
+'''
+
+def measure(read) -> 'tuple[float, float]':
+
+    started = time.perf_counter()
+    read()
+    elapsed = time.perf_counter() - started
+
+    # Memory is traced in a separate run, tracing slows the read down
+    tracemalloc.start()
+    read()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak / 2 ** 20
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=200, help="Number of synthetic 500-deal pages")
+    args = parser.parse_args()
+
+    lookups = synthetic_lookups()
+    pipedrive_df = pd.concat([process_data(page, lookups) for page in synthetic_pages(args.pages)], ignore_index=True)
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, 'pipedrive_data.csv')
+        parquet_path = os.path.join(folder, 'pipedrive_data.parquet')
+        pipedrive_df.to_csv(csv_path, index=False)
+        write_pipedrive_snapshot(pipedrive_df, parquet_path)
+
+        ui_columns = ['Deal - Stage', 'Deal - Pipeline']
+        runs = {
+            'csv, all columns': lambda: pd.read_csv(csv_path, low_memory=False),
+            'parquet, all columns': lambda: read_pipedrive_snapshot(path=parquet_path),
+            'csv, UI columns': lambda: pd.read_csv(csv_path, usecols=ui_columns),
+            'parquet, UI columns': lambda: read_pipedrive_snapshot(columns=ui_columns, path=parquet_path)
+        }
+
+        print(f"{len(pipedrive_df)} deals")
+        print(f"csv file:     {os.path.getsize(csv_path) / 2 ** 20:.1f} MiB")
+        print(f"parquet file: {os.path.getsize(parquet_path) / 2 ** 20:.1f} MiB")
+        for name, read in runs.items():
+            elapsed, peak = measure(read)
+            print(f"{name:<22} {elapsed:.3f}s, peak {peak:.0f} MiB")
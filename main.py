@@ -2,14 +2,21 @@ from transform.bottoms_up_new_deals import create_new_deals_bottoms_up
 from transform.follow_up import create_follow_up, search_ani
 from transform.cm_db_new_deals import create_new_deals_cm
 from transform.no_results import create_no_result
-from misc.parse_config import extract_config_info
+from misc.parse_config import extract_config_info, extract_cm_db_config, extract_snapshot_config
 from misc.sql_queries import *
-from user_input.parallel_get import main as update_pipedrive_data
+from misc.phone_keys import to_phone_keys, to_phone_numbers
+from user_input.parallel_get import ensure_fresh as update_pipedrive_data, read_sync_state
+from user_input.pipedrive_snapshot import PIPEDRIVE_SNAPSHOT_PATH, read_pipedrive_snapshot
+from user_input.phone_index import load_phone_index
+from user_input.cm_mirror import CM_MIRROR_PATH, sync_cm_mirror, read_cm_mirror, mirror_synced_at
+from user_input.snapshot_store import write_snapshot_in_background, wait_for_snapshots, read_snapshot, snapshot_table_path
+from user_input.cm_extract import EXTRACT_WORKERS, extract_cm_tables
+from user_input.bottoms_up_db import BottomsUpTable
 import json
-from sqlalchemy import create_engine
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, text, bindparam
 import pandas as pd
-import numpy as np
-import sqlite3
+import pyarrow.parquet as pq
 import os
 import warnings
 from urllib.parse import quote
@@ -18,8 +25,11 @@ import warnings
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
+# Values bound to a single IN list of a targeted CM Database lookup
+TARGETED_BATCH_SIZE = 1000
+
 # Helper functions
-def get_input_files() -> 'tuple[list, list]':
+def get_input_files() -> list:
     '''
     Iterate through the input data folder and create a list of files to read and transformed.
 
@@ -28,18 +38,15 @@ def get_input_files() -> 'tuple[list, list]':
 
     Return:
         `abandoned_calls_file_list (list)` - List of file names from abandoned calls file folder.\n
-        `pipedrive_file_list (list)` - List of file names from pipedrive data file folder.\n
     '''
 
     # Paths for input data
-    pipedrive_path = 'data/pipedrive'
     abandoned_calls_path = 'data/abandoned_calls'
 
     # Get list of files to be read and transformed
-    pipedrive_file_list = [os.path.join(pipedrive_path, file) for file in os.listdir(pipedrive_path) if file.endswith('.csv')]
     abandoned_calls_file_list = [os.path.join(abandoned_calls_path, file) for file in os.listdir(abandoned_calls_path) if file.endswith('.xlsx')]
 
-    return abandoned_calls_file_list, pipedrive_file_list
+    return abandoned_calls_file_list
 
 
 def get_db_files(path: str) -> str:
@@ -59,7 +66,7 @@ def get_db_files(path: str) -> str:
     return os.path.join(path, db_files[0]) if db_files else None
 
 
-def read_bottoms_up(bottoms_up_db: str) -> pd.DataFrame:
+def read_bottoms_up(bottoms_up_db: str) -> 'BottomsUpTable | None':
     '''
     Read and extract data from Bottoms Up Database.
 
@@ -67,57 +74,59 @@ def read_bottoms_up(bottoms_up_db: str) -> pd.DataFrame:
         `bottoms_up_db` - File name of Bottoms Up Database file.\n
 
     Return:
-        `df (pd.DataFrame)` - Pandas Dataframe that contains all neccessary columns from Bottoms Up Database.\n
+        `bottoms_up (BottomsUpTable | None)` - Lookup columns of every row, other columns are read for matched rows only. `None` if the database could not be read.\n
     '''
 
     try:
-        # Connect to SQLite Database
-        connection = sqlite3.connect(bottoms_up_db)
-
         print(f'Reading Bottoms Up Database.')
 
-        # Execute query and fetch the data into a Pandas Dataframe
-        df = pd.read_sql_query('SELECT * FROM bottoms_up', connection)
-        # df['id'] = df.index
-        df.rename(columns={
-            'Owner': 'owner',
-            'First Name': 'first_name',
-            'Middle Name': 'middle_name',
-            'Last Name': 'last_name',
-            'Input: Address': 'address',
-            'Input: City': 'city',
-            'Input: State': 'state',
-            'Input: Zip Code': 'postal_code',
-            'County': 'target_county',
-            'State': 'target_state',
-            'Contact Type': 'contact_type',
-            'ATTN': 'attn',
-            '# of Interests': 'no_of_interest',
-            'Category': 'category',
-            'PDP Value ($)': 'offer_amount',
-            'Total Value - Low ($)': 'value_low',
-            'Total Value - High ($)': 'value_high',
-            'Address Changed': 'address_changed',
-            'Serial Number': 'serial_number',
-            'md_address': 'address2',
-            'md_city': 'city2',
-            'md_state': 'state2',
-            'md_postalcode': 'postal_code2'
-        }, inplace=True)
-
-        # ✅ Convert phone1–phone5 to Int64 safely
-        for col in ['phone1', 'phone2', 'phone3', 'phone4', 'phone5']:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
-                
-        return df
-    
+        # Read the lookup columns from the read-only, memory-mapped database file
+        bottoms_up = BottomsUpTable(bottoms_up_db)
+
+        # Save a snapshot for offline runs whenever the database file changed, read on the writer thread
+        bottoms_up_stat = os.stat(bottoms_up_db)
+        write_snapshot_in_background('bottoms_up', {'bottoms_up': bottoms_up.all_rows}, {
+            'file': os.path.basename(bottoms_up_db),
+            'size': bottoms_up_stat.st_size,
+            'mtime_ns': bottoms_up_stat.st_mtime_ns,
+            'timestamp': datetime.fromtimestamp(bottoms_up_stat.st_mtime, timezone.utc).isoformat(timespec='seconds')
+        })
+
+        return bottoms_up
+
     except Exception as e:
         print(f'Error occured during reading of database: {e}')
         return None
 
-    finally:
-        connection.close()
+
+def format_cm_phone_numbers(phone_number_df: pd.DataFrame) -> pd.DataFrame:
+
+    # Change data type of phone number to int
+    phone_number_df['phone_number'] = to_phone_numbers(phone_number_df['phone_number'])
+
+    return phone_number_df
+
+
+def save_cm_snapshot(phone_number_df: pd.DataFrame,
+                     email_address_df: pd.DataFrame,
+                     serial_numbers_df: pd.DataFrame,
+                     cm_db_df: pd.DataFrame,
+                     source: dict) -> None:
+    '''
+    Saves the Community Minerals tables as a snapshot for offline runs. The tables are copied on
+    the calling thread, their conversion and write run on the snapshot writer thread.\n
+
+    Parameters:
+        `phone_number_df, email_address_df, serial_numbers_df, cm_db_df` - Tables read from the Community Minerals Database.\n
+        `source (dict)` - How the tables were read and the `timestamp` of the data.\n
+    '''
+
+    write_snapshot_in_background('cm_db', {
+        'phone_number': phone_number_df,
+        'email_address': email_address_df,
+        'serial_numbers': serial_numbers_df,
+        'cm_db': cm_db_df
+    }, source)
 
 
 def read_cm_live_db(host: str,
@@ -126,28 +135,32 @@ def read_cm_live_db(host: str,
                     password: str,
                     name: str) -> 'tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame | None]':
 
+    engine = None
+
     try:
 
-        # Create database engine
-        engine = create_engine(f'mysql+pymysql://{user}:{quote(password)}@{host}:{port}/{name}')
+        # Create database engine, with a connection per extraction worker
+        engine = create_engine(f'mysql+pymysql://{user}:{quote(password)}@{host}:{port}/{name}',
+                               pool_size=EXTRACT_WORKERS,
+                               max_overflow=0)
 
         print(f'Reading Community Minerals Database.')
+        extracted_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
 
-        # Execute query and fetch the data into a Pandas Dataframe
-        phone_number_df = pd.read_sql_query(phone_number_query, engine)
-        emaiL_address_df = pd.read_sql_query(email_address_query, engine)
-        serial_numbers_df = pd.read_sql_query(serial_numbers_query_mysql, engine)
-        cm_db_df = pd.read_sql_query(cm_db_query, engine)
+        # Execute the queries concurrently in contact ID partitions and fetch the data into Pandas Dataframes
+        phone_number_df, emaiL_address_df, serial_numbers_df, cm_db_df = extract_cm_tables(engine, [
+            phone_number_query,
+            email_address_query,
+            serial_numbers_query_mysql,
+            cm_db_query_mysql
+        ])
 
-        # Change data type of phone number to int
-        phone_number_df['phone_number'] = phone_number_df[phone_number_df['phone_number'] \
-                                                          .str.contains(r'^[0-9]+$', na=False)] \
-                                                            ['phone_number'].astype('Int64')
-        
-        phone_number_df.to_csv('./data/database/cm_db/phone_number.csv', index=False)
-        emaiL_address_df.to_csv('./data/database/cm_db/email_address.csv', index=False)
-        serial_numbers_df.to_csv('./data/database/cm_db/serial_number.csv', index=False)
-        cm_db_df.to_csv('./data/database/cm_db/cm_db.csv', index=False)
+        phone_number_df = format_cm_phone_numbers(phone_number_df)
+
+        save_cm_snapshot(phone_number_df, emaiL_address_df, serial_numbers_df, cm_db_df, {
+            'mode': 'live',
+            'timestamp': extracted_at
+        })
 
         return phone_number_df, emaiL_address_df, serial_numbers_df, cm_db_df
 
@@ -155,7 +168,158 @@ def read_cm_live_db(host: str,
         return None,None,None,None
 
     finally:
-        engine.dispose()
+        if engine is not None:
+            engine.dispose()
+
+def read_cm_mirror_db(host: str,
+                      port: str,
+                      user: str,
+                      password: str,
+                      name: str,
+                      full_reload_days: float) -> 'tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame | None]':
+    '''
+    Syncs the local mirror of the Community Minerals Database and reads it. If the sync fails, the
+    mirror from the last successful sync is read instead.\n
+
+    Parameters:
+        `host, port, user, password, name (str)` - Community Minerals Database connection details.\n
+        `full_reload_days (float)` - Days after which the mirror is loaded from scratch.\n
+
+    Return:
+        `phone_number_df, email_address_df, serial_numbers_df, cm_db_df` - Same tables as `read_cm_live_db`, all `None` if there is no usable mirror.\n
+    '''
+
+    engine = None
+
+    try:
+        print(f'Syncing Community Minerals Database mirror.')
+        engine = create_engine(f'mysql+pymysql://{user}:{quote(password)}@{host}:{port}/{name}')
+        sync_cm_mirror(engine, full_reload_days=full_reload_days)
+
+    except Exception as e:
+        print(f'Could not sync Community Minerals Database mirror: {e}')
+        if not os.path.exists(CM_MIRROR_PATH):
+            return None,None,None,None
+        print(f'Using the mirror from the last successful sync.')
+
+    finally:
+        if engine is not None:
+            engine.dispose()
+
+    print(f'Reading Community Minerals Database mirror.')
+    phone_number_df, email_address_df, serial_numbers_df, cm_db_df = read_cm_mirror()
+    phone_number_df = format_cm_phone_numbers(phone_number_df)
+
+    # A mirror that was not synced again was already saved by an earlier run
+    save_cm_snapshot(phone_number_df, email_address_df, serial_numbers_df, cm_db_df, {
+        'mode': 'mirror',
+        'timestamp': datetime.fromtimestamp(mirror_synced_at(), timezone.utc).isoformat(timespec='seconds')
+    })
+
+    return phone_number_df, email_address_df, serial_numbers_df, cm_db_df
+
+def read_sql_in_batches(query: str, connection, param_name: str, values: list) -> pd.DataFrame:
+    '''
+    Runs a query with an `IN :param_name` list once per batch of `values` and concatenates the results.\n
+
+    Parameters:
+        `query (str)` - Query with an expanding `:param_name` parameter.\n
+        `connection` - SQLAlchemy connection of the database.\n
+        `param_name (str)` - Name of the IN list parameter.\n
+        `values (list)` - Values to look up.\n
+
+    Return:
+        `df (pd.DataFrame)` - Rows of every batch.\n
+    '''
+
+    statement = text(query).bindparams(bindparam(param_name, expanding=True))
+
+    # An empty list still runs once, so the result keeps its columns
+    batches = [values[start:start + TARGETED_BATCH_SIZE] for start in range(0, len(values), TARGETED_BATCH_SIZE)] or [[]]
+
+    return pd.concat([pd.read_sql_query(statement, connection, params={param_name: batch}) for batch in batches],
+                     ignore_index=True)
+
+def read_cm_targeted_db(host: str,
+                        port: str,
+                        user: str,
+                        password: str,
+                        name: str,
+                        ani_numbers: pd.Series) -> 'tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame | None]':
+    '''
+    Reads only the contacts of the given ANI Numbers from the Community Minerals Database. Phone numbers
+    are looked up first, then emails, serial numbers and details are read for the matching contacts only.\n
+
+    Parameters:
+        `host, port, user, password, name (str)` - Community Minerals Database connection details.\n
+        `ani_numbers (pd.Series)` - ANI Numbers of the file that are not in Pipedrive.\n
+
+    Return:
+        `phone_number_df, email_address_df, serial_numbers_df, cm_db_df` - Same tables as `read_cm_live_db`, limited to the matching contacts, all `None` if the database could not be read.\n
+    '''
+
+    engine = None
+
+    try:
+
+        # Create database engine
+        engine = create_engine(f'mysql+pymysql://{user}:{quote(password)}@{host}:{port}/{name}')
+
+        # Only numeric ANI Numbers can match a phone number
+        ani_numbers = ani_numbers.astype(str)
+        phone_numbers = ani_numbers[to_phone_keys(ani_numbers)[1]].unique().tolist()
+
+        print(f'Looking up {len(phone_numbers)} ANI Numbers in Community Minerals Database.')
+
+        with engine.connect() as connection:
+            phone_number_df = read_sql_in_batches(targeted_phone_number_query, connection, 'phone_numbers', phone_numbers)
+            contact_ids = phone_number_df['id'].unique().tolist()
+
+            email_address_df = read_sql_in_batches(targeted_email_address_query, connection, 'contact_ids', contact_ids)
+            serial_numbers_df = read_sql_in_batches(targeted_serial_numbers_query_mysql, connection, 'contact_ids', contact_ids)
+            cm_db_df = read_sql_in_batches(targeted_cm_db_query, connection, 'contact_ids', contact_ids)
+
+        return format_cm_phone_numbers(phone_number_df), email_address_df, serial_numbers_df, cm_db_df
+
+    except Exception as e:
+        print(f'Error occured during reading of Community Minerals Database: {e}')
+        return None,None,None,None
+
+    finally:
+        if engine is not None:
+            engine.dispose()
+
+def read_offline_snapshots() -> tuple:
+    '''
+    Reads the newest snapshots of the Bottoms Up Database, the Community Minerals Database and the
+    Pipedrive deals, for a run that does not connect to any remote source.\n
+
+    Return:
+        `bottoms_up, phone_number_df, email_address_df, serial_numbers_df, cm_db_df, pipedrive_df, phone_index` - Reference data of the run, all `None` if a source has no snapshot.\n
+    '''
+
+    bottoms_up_tables, bottoms_up_manifest = read_snapshot('bottoms_up')
+    cm_tables, cm_manifest = read_snapshot('cm_db')
+    pipedrive_tables, pipedrive_manifest = read_snapshot('pipedrive')
+
+    for name, manifest in [('Bottoms Up', bottoms_up_manifest), ('CM Database', cm_manifest), ('Pipedrive', pipedrive_manifest)]:
+        if manifest is None:
+            print(f'No {name} snapshot to run offline with.')
+            return (None,) * 7
+        print(f"Using {name} snapshot {manifest['version']} of data from {manifest['source'].get('timestamp')}.")
+
+    # The phone index is built from the snapshot file itself, so its rows match the deals read here. Each
+    # snapshot version keeps its own index, so offline and online runs do not rebuild each other's index.
+    deals_path = snapshot_table_path(pipedrive_manifest, 'deals')
+    phone_index = load_phone_index(deals_path, os.path.join(os.path.dirname(deals_path), 'phone_index'))
+
+    return (BottomsUpTable(rows_df=bottoms_up_tables['bottoms_up']),
+            cm_tables['phone_number'],
+            cm_tables['email_address'],
+            cm_tables['serial_numbers'],
+            cm_tables['cm_db'],
+            pipedrive_tables['deals'],
+            phone_index)
 
 def read_json_data():
 
@@ -423,9 +587,7 @@ def get_cm_deal_id(
     if final_result_not_exist.empty:
         return fu_df, pd.DataFrame(), pd.DataFrame(columns=columns)
     
-    final_result_not_exist['From'] = final_result_not_exist[final_result_not_exist['From']\
-                                                           .str.contains(r'^[0-9]+$', na=False)]\
-                                                            ['From'].astype('Int64')
+    final_result_not_exist['From'] = to_phone_numbers(final_result_not_exist['From'])
     
     cm_db_ani_entries = final_result_not_exist[~final_result_not_exist['Category'].str.contains('', na=False)][['Contact Time', 'From', 'To', 'Team Member 2', 'Text', 'Category']]
     cm_db_ani_entries = cm_db_ani_entries[(cm_db_ani_entries['From'] != '(blank)') & (cm_db_ani_entries['From']).notnull()]
@@ -459,7 +621,7 @@ def get_cm_deal_id(
     no_deal_id_final = no_deal_id[~no_deal_id['From'].isin(deal_id_exist_final['From'])]
 
     # Modify pipedrive df
-    pipedrive_drop_df = pipedrive_df.drop(columns=['phone_number', 'all_deal_id'], axis=1)
+    pipedrive_drop_df = pipedrive_df.drop(columns=['phone_number', 'all_deal_id'], axis=1, errors='ignore')
 
     # Merge pipedrive data to existing CM Deal ID
     merge_pd_deal_id_df = deal_id_exist_final.merge(pipedrive_drop_df,
@@ -492,21 +654,14 @@ def log_step(step_name, **dfs):
             except Exception:
                 print(f"{name}: {type(df)} (no len available)")
 
-def normalize_phone(phone):
-    if pd.isna(phone): return None
-    phone = str(phone)
-    phone = phone.replace('(', '').replace(')', '').replace('-', '').replace(' ', '')
-    if phone.startswith('1') and len(phone) == 11:
-        phone = phone[1:]
-    return phone.strip()
-
-def main():
+def main(refresh_pipedrive: bool = False, offline: 'bool | None' = None):
     '''
     Main driver function of this tool that will read database files, search if ANI Numbers is existing and export
     excel files with columns based upon specifications.\n
 
     Parameters:
-        `None`
+        `refresh_pipedrive (bool)` - Pull every pipedrive deal again even if it was synced recently.\n
+        `offline (bool | None)` - Run against the newest saved snapshots instead of the databases and Pipedrive. Read from the config file if `None`.\n
 
     Return:
         `None`
@@ -515,55 +670,62 @@ def main():
     try:
         # Define path of database file
         bottoms_up_path = 'data/database/bottoms_up'
-        cm_db_path = 'data/database/cm_db'
         db_host, db_port, db_user, db_password, db_name = extract_config_info()
+        cm_db_mode, cm_mirror_full_reload_days = extract_cm_db_config()
+        offline = extract_snapshot_config() if offline is None else offline
 
         # Read all input files
-        abandoned_calls_file_list, pipedrive_file_list = get_input_files()
+        abandoned_calls_file_list = get_input_files()
 
         # Return error if RC File folder is empty
         if len(abandoned_calls_file_list) == 0:
             return 'rc_empty_main'
 
-        bottoms_up_db, cm_db = get_db_files(bottoms_up_path), get_db_files(cm_db_path) # Read and get database files
-        bottoms_up_df = read_bottoms_up(bottoms_up_db) # Bottoms Up Dataframe
-
-        # Comment out if not for testing
-        # ----------- start here -----------        
-        phone_number_df, email_address_df, serial_numbers_df, cm_db_df = read_cm_live_db(db_host,
-                                                                                            db_port,
-                                                                                            db_user,
-                                                                                            db_password,
-                                                                                            db_name) # Live CM Database 
-        # If database credentials is wrong
-        if phone_number_df is None:
-            return 'db_wrong'
-        # ----------- end here -----------   
-
-        # # Comment out for testing purposes only
-        # # ✅ Skip live CM DB read — use latest saved CSVs
-        # # ----------- start here -----------  
-        # print("Skipping live CM DB read. Loading from saved CSVs instead...")
-
-        # cm_db_path = 'data/database/cm_db'
-
-        # phone_number_df = pd.read_csv(os.path.join(cm_db_path, 'phone_number.csv'), low_memory=False)
-        # email_address_df = pd.read_csv(os.path.join(cm_db_path, 'email_address.csv'), low_memory=False)
-        # serial_numbers_df = pd.read_csv(os.path.join(cm_db_path, 'serial_number.csv'), low_memory=False)
-        # cm_db_df = pd.read_csv(os.path.join(cm_db_path, 'cm_db.csv'), low_memory=False)
-        # # ----------- end here -----------   
+        if offline:
+            print(f'Running offline with the newest snapshots.')
+            bottoms_up, phone_number_df, email_address_df, serial_numbers_df, cm_db_df, pipedrive_df, phone_index = read_offline_snapshots()
 
+            # If a source was never saved
+            if bottoms_up is None:
+                return 'snapshot_missing'
+
+        else:
+            bottoms_up_db = get_db_files(bottoms_up_path) # Read and get database file
+            bottoms_up = read_bottoms_up(bottoms_up_db) # Bottoms Up Database
+
+            if cm_db_mode == 'live':
+                phone_number_df, email_address_df, serial_numbers_df, cm_db_df = read_cm_live_db(db_host,
+                                                                                                    db_port,
+                                                                                                    db_user,
+                                                                                                    db_password,
+                                                                                                    db_name) # Live CM Database 
+            elif cm_db_mode == 'targeted':
+                phone_number_df = pd.DataFrame() # Contacts are read per file, after the Pipedrive search
+            else:
+                phone_number_df, email_address_df, serial_numbers_df, cm_db_df = read_cm_mirror_db(db_host,
+                                                                                                      db_port,
+                                                                                                      db_user,
+                                                                                                      db_password,
+                                                                                                      db_name,
+                                                                                                      cm_mirror_full_reload_days) # Local mirror of CM Database
+            # If database credentials is wrong
+            if phone_number_df is None:
+                return 'db_wrong'
+
+            update_pipedrive_data(force_refresh=refresh_pipedrive)
+
+            # Read pipedrive snapshot and save it for offline runs whenever it was synced again. The deal store
+            # already has the snapshot schema, so its file is read as it is on the writer thread.
+            pipedrive_df = read_pipedrive_snapshot()
+            write_snapshot_in_background('pipedrive', {'deals': lambda: pq.read_table(PIPEDRIVE_SNAPSHOT_PATH)}, {
+                'timestamp': (read_sync_state() or {}).get('synced_at')
+            })
+            phone_index = load_phone_index()
+
+        pipedrive_df['Person - Phone - Work'] = pipedrive_df['phone_number']
         file_count = 1 # Counter for Abandoned Calls File
         user_designation, condition_dict = read_json_data()
 
-        # comment out for testing:
-        update_pipedrive_data()
-
-        # Read single pipedrive file
-        for pipedrive_file in pipedrive_file_list:
-            pipedrive_df = pd.read_csv(pipedrive_file, low_memory=False)
-            pipedrive_df['Person - Phone - Work'] = pipedrive_df['phone_number']
-
         # Iterate through list of abandoned_calls files
         for abandoned_calls_file in abandoned_calls_file_list:
             
@@ -585,9 +747,20 @@ def main():
 
 
             # Create Follow Up output file
-            ani_exist, ani_not_exist, df_exploded = search_ani(abandoned_calls_df, pipedrive_df)
+            ani_exist, ani_not_exist, pipedrive_phones_df = search_ani(abandoned_calls_df, pipedrive_df, phone_index)
             log_step("Checking if PN exists in Pipedrive",
                 **{"PN Exist": ani_exist, "PN Not Exist": ani_not_exist})
+
+            # Read only the contacts of this file's ANI Numbers
+            if cm_db_mode == 'targeted' and not offline:
+                phone_number_df, email_address_df, serial_numbers_df, cm_db_df = read_cm_targeted_db(db_host,
+                                                                                                        db_port,
+                                                                                                        db_user,
+                                                                                                        db_password,
+                                                                                                        db_name,
+                                                                                                        ani_not_exist['From'])
+                if phone_number_df is None:
+                    return 'db_wrong'
             
             # print("ani_not_exist created.")
             # print(ani_not_exist.columns.tolist())
@@ -596,7 +769,7 @@ def main():
             fu_final_df, cm_exist_df, cm_not_exist_df = get_cm_deal_id(ani_exist,
                                                                     ani_not_exist,
                                                                     phone_number_df,
-                                                                    df_exploded,
+                                                                    pipedrive_phones_df,
                                                                     cm_db_df)
                                                                     
             log_step("Get Deal ID from cm database", **{"Deals exist": fu_final_df})
@@ -606,7 +779,7 @@ def main():
             log_step("create_follow_up", **{"Follow-up": rc_df})
 
             bottoms_up_not_exist, bottoms_up_output, bottom_up_final_df = create_new_deals_bottoms_up(ani_not_exist,
-                                                                                                      bottoms_up_df,
+                                                                                                      bottoms_up,
                                                                                                       file_count)
             log_step("New deals found in BUDB", **{"From BUDB": bottoms_up_output})
 
@@ -645,6 +818,10 @@ def main():
     
     except Exception as e:
         print(f"Error occured: {e}")
+
+    finally:
+        # Snapshots still being written in the background are finished before the run ends
+        wait_for_snapshots()
     
 
 if __name__ == '__main__':
@@ -18,5 +18,38 @@ def extract_config_info():
 
     return db_host, db_port, db_user, db_password, db_name
 
+def extract_cm_db_config():
+
+    # Define path to config file
+    file_path = os.path.join('misc', 'database_config.cfg')
+
+    # Parse the config file, the [cm_database] section is optional
+    reader = configparser.ConfigParser()
+    reader.read(file_path)
+    section = reader['cm_database'] if reader.has_section('cm_database') else {}
+
+    # 'mirror' reads the local mirror after syncing it, 'targeted' only asks the database for the
+    # contacts of each file's ANI Numbers, 'live' runs the full queries on every run
+    mode = section.get('mode', 'mirror').strip().lower()
+    full_reload_days = float(section.get('full_reload_days', 7))
+
+    return mode, full_reload_days
+
+def extract_snapshot_config():
+
+    # Define path to config file
+    file_path = os.path.join('misc', 'database_config.cfg')
+
+    # Parse the config file, the [snapshots] section is optional
+    reader = configparser.ConfigParser()
+    reader.read(file_path)
+
+    # An offline run reads the newest saved snapshots and does not connect to any remote source
+    offline = reader.getboolean('snapshots', 'offline', fallback=False)
+
+    return offline
+
 if __name__ == "__main__":
     print(extract_config_info())
+    print(extract_cm_db_config())
+    print(extract_snapshot_config())
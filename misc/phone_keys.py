@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+
+'''
+This module contains the phone number normalization shared by every data source.\n
+A phone number is turned into an int64 key and a validity flag in one vectorized pass, so sources
+are joined on integer keys and no module has to repeat its own string checks.\n
+'''
+
+# Text made of digits only. At most 18 digits, so every key fits in an int64.
+PHONE_DIGITS_PATTERN = r'[0-9]{1,18}'
+
+
+def to_phone_keys(phones: pd.Series, pattern: str = PHONE_DIGITS_PATTERN) -> 'tuple[np.ndarray, np.ndarray]':
+    '''
+    Converts phone numbers written as digits to int64 keys.\n
+
+    Parameters:
+        `phones (pd.Series)` - Phone numbers as text, e.g. ANI Numbers. Values of a text column that are not text are not valid.\n
+        `pattern (str)` - Regular expression a valid phone number matches in full.\n
+
+    Return:
+        `keys (np.ndarray)` - int64 key per phone number, 0 where the phone number is not valid.\n
+        `valid (np.ndarray)` - `True` where the phone number could be converted.\n
+    '''
+
+    # Numbers read from files are compared by their digits
+    if not (pd.api.types.is_object_dtype(phones) or pd.api.types.is_string_dtype(phones)):
+        phones = phones.astype(str)
+
+    valid = phones.str.fullmatch(pattern, na=False).to_numpy(dtype=bool)
+    keys = np.zeros(len(phones), dtype=np.int64)
+    keys[valid] = phones[valid].astype(np.int64).to_numpy()
+
+    return keys, valid
+
+def to_phone_numbers(phones: pd.Series) -> pd.Series:
+    '''
+    Converts phone numbers written as digits to a nullable integer column.\n
+
+    Parameters:
+        `phones (pd.Series)` - Phone numbers as text.\n
+
+    Return:
+        `phone_numbers (pd.Series)` - `Int64` phone numbers, `<NA>` where the value is not made of digits only.\n
+    '''
+
+    keys, valid = to_phone_keys(phones)
+
+    # An Int64 column is stored as the keys plus a mask, so nothing is parsed twice
+    return pd.Series(pd.arrays.IntegerArray(keys, ~valid), index=phones.index, name=phones.name)
+
+def strip_country_code(phones: pd.Series) -> pd.Series:
+    '''
+    Removes the leading country code of 11 character phone numbers.\n
+
+    Parameters:
+        `phones (pd.Series)` - Phone numbers as text.\n
+
+    Return:
+        `phones (pd.Series)` - Phone numbers without the first character where they were 11 characters long.\n
+    '''
+
+    phones = phones.copy()
+    mask = phones.str.len() == 11
+    phones.loc[mask] = phones.loc[mask].str[1:].str.strip()
+
+    return phones
@@ -44,14 +44,102 @@ serial_numbers_query_mysql = '''
     GROUP BY c.id;
 '''
 
+# One row per contact. The first skip traced address and the number of distinct addresses, and the
+# distinct "county|state" targets joined with ";", are aggregated per contact so addresses and
+# targets are not multiplied with each other
 cm_db_query = '''
     SELECT
         c.id, c.first_name, c.middle_name, c.last_name, c.deal_id,
         a.address, a.city, a.state AS state_address, a.postal_code, a.data_source,
-        t.country, t.state
+        (SELECT COUNT(DISTINCT x.address)
+         FROM contact_skip_traced_addresses x
+         WHERE x.contact_id = c.id AND x.deleted_at IS NULL) AS address_count,
+        (SELECT GROUP_CONCAT(target, ';')
+         FROM (SELECT DISTINCT t.country || '|' || t.state AS target
+               FROM contact_targets t
+               WHERE t.contact_id = c.id AND t.deleted_at IS NULL)) AS targets
     FROM contacts c
-    LEFT JOIN contact_skip_traced_addresses a ON c.id = a.contact_id AND a.deleted_at IS NULL
-    LEFT JOIN contact_targets t ON c.id = t.contact_id AND t.deleted_at IS NULL
+    LEFT JOIN contact_skip_traced_addresses a ON a.id = (
+        SELECT MIN(f.id)
+        FROM contact_skip_traced_addresses f
+        WHERE f.contact_id = c.id AND f.deleted_at IS NULL)
     WHERE
         c.deleted_at IS NULL;
-'''
\ No newline at end of file
+'''
+
+cm_db_query_mysql = '''
+    SELECT
+        c.id, c.first_name, c.middle_name, c.last_name, c.deal_id,
+        a.address, a.city, a.state AS state_address, a.postal_code, a.data_source,
+        (SELECT COUNT(DISTINCT x.address)
+         FROM contact_skip_traced_addresses x
+         WHERE x.contact_id = c.id AND x.deleted_at IS NULL) AS address_count,
+        (SELECT GROUP_CONCAT(DISTINCT CONCAT(t.country, '|', t.state) SEPARATOR ';')
+         FROM contact_targets t
+         WHERE t.contact_id = c.id AND t.deleted_at IS NULL) AS targets
+    FROM contacts c
+    LEFT JOIN contact_skip_traced_addresses a ON a.id = (
+        SELECT MIN(f.id)
+        FROM contact_skip_traced_addresses f
+        WHERE f.contact_id = c.id AND f.deleted_at IS NULL)
+    WHERE
+        c.deleted_at IS NULL;
+'''
+
+# Targeted lookups, the IN lists are bound as expanding parameters
+targeted_phone_number_query = '''
+    SELECT
+        c.id,
+        n.phone_number
+    FROM contacts c
+    JOIN contact_phone_numbers n ON c.id = n.contact_id
+    WHERE
+        c.deleted_at IS NULL AND
+        n.deleted_at IS NULL AND
+        n.phone_number IN :phone_numbers;
+'''
+
+targeted_email_address_query = '''
+    SELECT
+        c.id,
+        e.email_address
+    FROM contacts c
+    LEFT JOIN contact_email_addresses e ON c.id = e.contact_id
+    WHERE
+        c.deleted_at IS NULL AND
+        e.deleted_at IS NULL AND
+        c.id IN :contact_ids;
+'''
+
+targeted_serial_numbers_query_mysql = '''
+    SELECT
+        c.id,
+        GROUP_CONCAT(s.serial_number SEPARATOR ' | ') AS serial_numbers
+    FROM contacts c
+    LEFT JOIN contact_serial_numbers s ON c.id = s.contact_id
+    WHERE
+        c.deleted_at IS NULL AND
+        s.deleted_at IS NULL AND
+        c.id IN :contact_ids
+    GROUP BY c.id;
+'''
+
+targeted_cm_db_query = '''
+    SELECT
+        c.id, c.first_name, c.middle_name, c.last_name, c.deal_id,
+        a.address, a.city, a.state AS state_address, a.postal_code, a.data_source,
+        (SELECT COUNT(DISTINCT x.address)
+         FROM contact_skip_traced_addresses x
+         WHERE x.contact_id = c.id AND x.deleted_at IS NULL) AS address_count,
+        (SELECT GROUP_CONCAT(DISTINCT CONCAT(t.country, '|', t.state) SEPARATOR ';')
+         FROM contact_targets t
+         WHERE t.contact_id = c.id AND t.deleted_at IS NULL) AS targets
+    FROM contacts c
+    LEFT JOIN contact_skip_traced_addresses a ON a.id = (
+        SELECT MIN(f.id)
+        FROM contact_skip_traced_addresses f
+        WHERE f.contact_id = c.id AND f.deleted_at IS NULL)
+    WHERE
+        c.deleted_at IS NULL AND
+        c.id IN :contact_ids;
+'''
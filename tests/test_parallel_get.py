@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.pipedrive_stand_in import StandIn, start_stand_in
+from user_input.parallel_get import ensure_fresh, PIPEDRIVE_SYNC_STATE_PATH
+from user_input.pipedrive_snapshot import PIPEDRIVE_SNAPSHOT_PATH, read_pipedrive_snapshot
+
+
+def read_sync_mode() -> str:
+
+    with open(PIPEDRIVE_SYNC_STATE_PATH, 'r', encoding='utf-8') as sync_state_file:
+        return json.load(sync_state_file)['mode']
+
+def test_forced_refresh_does_a_full_pull(tmp_path, monkeypatch):
+
+    stand_in = StandIn(deal_count=40)
+    server = start_stand_in(stand_in)
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(PIPEDRIVE_SNAPSHOT_PATH))
+    monkeypatch.setenv('API_KEY', 'test')
+    monkeypatch.setenv('PIPEDRIVE_BASE_URL', f"http://127.0.0.1:{server.server_port}")
+
+    try:
+        assert ensure_fresh()
+        assert read_sync_mode() == 'full'
+
+        # A recent snapshot is used as it is
+        assert not ensure_fresh()
+
+        # Deals that are gone from Pipedrive, or from the filter, are only dropped by a full pull
+        stand_in.deal_count = 25
+        assert ensure_fresh(force_refresh=True)
+        assert read_sync_mode() == 'full'
+        assert len(read_pipedrive_snapshot(columns=['Deal - ID'])) == 25
+
+    finally:
+        server.shutdown()
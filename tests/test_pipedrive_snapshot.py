@@ -0,0 +1,33 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_input.pipedrive_snapshot import PIPEDRIVE_COLUMNS, PIPEDRIVE_SNAPSHOT_PATH, LEGACY_SNAPSHOT_PATH, read_pipedrive_snapshot
+
+
+def test_upgraded_install_with_only_csv_snapshot(tmp_path, monkeypatch):
+
+    # An install of an older version only has the CSV snapshot
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(LEGACY_SNAPSHOT_PATH))
+    pd.DataFrame({
+        'Deal - ID': [1, 2],
+        'Person - ID': [10, None],
+        'phone_number': ['5551234567', '0123'],
+        'Deal - Stage': ['Contacted', 'Offer Ready'],
+        'Deal - Pipeline': ['Sales Pipeline', 'Junior Sales Team Pipeline']
+    }).to_csv(LEGACY_SNAPSHOT_PATH, index=False)
+
+    pipedrive_df = read_pipedrive_snapshot(columns=['Deal - Stage', 'Deal - Pipeline'])
+
+    assert pipedrive_df['Deal - Stage'].tolist() == ['Contacted', 'Offer Ready']
+    assert os.path.exists(PIPEDRIVE_SNAPSHOT_PATH)
+
+    # The migrated snapshot keeps integer IDs, text phones and every snapshot column
+    pipedrive_df = read_pipedrive_snapshot()
+    assert pipedrive_df.columns.tolist() == PIPEDRIVE_COLUMNS
+    assert pipedrive_df['Deal - ID'].tolist() == [1, 2]
+    assert pipedrive_df['Person - ID'].isna().tolist() == [False, True]
+    assert pipedrive_df['phone_number'].tolist() == ['5551234567', '0123']
@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
 from tabulate import tabulate
+from misc.phone_keys import to_phone_numbers
+from user_input.bottoms_up_db import BottomsUpTable
+from transform.column_builders import activity_note_column, marketing_medium_column, email_columns
 
 
 '''
@@ -10,13 +13,13 @@ and ANI Numbers that is not existing in Bottoms Up Database.\n
 '''
 
 
-def search_ani_bottoms_up(final_result_not_exist: pd.DataFrame, bottoms_up_df: pd.DataFrame) -> 'tuple[pd.DataFrame, pd.DataFrame]':
+def search_ani_bottoms_up(final_result_not_exist: pd.DataFrame, bottoms_up: BottomsUpTable) -> 'tuple[pd.DataFrame, pd.DataFrame]':
     '''
     Searches From Numbers if it is existing in Bottoms Up Database and outputs a Dataframe of existing records and non existing records.\n
 
     Parameters:
         `final_result_not_exist (pd.DataFrame)` - Dataframe that contains From Numbers that is not existing in Pipedrive Data.\n
-        `bottoms_up_df (pd.DataFrame)` - Pandas Dataframe equivalent of Bottoms Up Database.\n
+        `bottoms_up (BottomsUpTable)` - Bottoms Up Database.\n
 
     Return:
         `bottoms_up_exist (pd.DataFrame)` - This contains From Numbers that is existing in Bottoms Up Database.\n
@@ -32,14 +35,13 @@ def search_ani_bottoms_up(final_result_not_exist: pd.DataFrame, bottoms_up_df: p
 
     # print(from_to_dict)
 
-    ANI_not_number = final_result_not_exist[~final_result_not_exist['From'].str.contains(r'^[0-9]+$', na=False)][['Contact Time', 'From', 'To', 'Text', 'Category', 'Deal ID', 'Team Member 2', 'Data Source', 'Team']]
+    ani_numbers = to_phone_numbers(final_result_not_exist['From'])
+    ANI_not_number = final_result_not_exist[ani_numbers.isna()][['Contact Time', 'From', 'To', 'Text', 'Category', 'Deal ID', 'Team Member 2', 'Data Source', 'Team']]
 
     # print("final_result_not_exist table")
     # print(final_result_not_exist.columns.tolist())
     # Filter From Numbers where it only contains numbers and change data type to Int64
-    final_result_not_exist['From'] = final_result_not_exist[final_result_not_exist['From']\
-                                                           .str.contains(r'^[0-9]+$', na=False)]\
-                                                            ['From'].astype('Int64')
+    final_result_not_exist['From'] = ani_numbers
     
     
     # Filter entries where it is in Bottoms Up
@@ -47,25 +49,19 @@ def search_ani_bottoms_up(final_result_not_exist: pd.DataFrame, bottoms_up_df: p
     
     # print("bottoms_up_ani_entries table")
     # print(bottoms_up_ani_entries.columns.tolist())    
-    # Get columns phone1 to phone6 from Bottoms Up Database
-    bottoms_up_phone_columns = [f'phone{i}' for i in range(1, 6)]
-
-    # Melt phone numbers per id
-    bottoms_up_melted = pd.melt(bottoms_up_df,
-                                id_vars=['id'],
-                                value_vars=bottoms_up_phone_columns,
-                                var_name='phone_type',
-                                value_name='phone_number')
+    # Look up the phone1 to phone5 entries of Bottoms Up Database holding these From Numbers
+    bottoms_up_phones = bottoms_up.find_phones(bottoms_up_ani_entries['From'])
 
     # Check existing From in bottoms_up
-    bottoms_up_check_ani = bottoms_up_ani_entries.merge(bottoms_up_melted,
+    bottoms_up_check_ani = bottoms_up_ani_entries.merge(bottoms_up_phones,
                                                 left_on='From',
                                                 right_on='phone_number',
                                                 how='left')
     bottoms_up_check_ani.drop_duplicates(subset=['id', 'From'], inplace=True) # Only unique From Number to be checked
 
-    # Add bottoms_up details per id
-    bottoms_up_check_ani = bottoms_up_check_ani.merge(bottoms_up_df,
+    # Add bottoms_up details per id, only the matched rows are read from the database
+    matched_rows_df = bottoms_up.rows(bottoms_up_check_ani['id'].dropna().unique())
+    bottoms_up_check_ani = bottoms_up_check_ani.merge(matched_rows_df,
                                                     on='id',
                                                     how='left')
     bottoms_up_exist = bottoms_up_check_ani[bottoms_up_check_ani['phone_number'].notnull()]
@@ -98,35 +94,8 @@ def add_email_columns(bottoms_up_exist: pd.DataFrame) -> pd.DataFrame:
     bottoms_email_melted.drop_duplicates(subset=['phone_number', 'email'], inplace=True)
     bottoms_email_melted = bottoms_email_melted[(bottoms_email_melted['email'] != '')]
 
-    # Create Email 1 to Email 17 Columns
-    bottoms_up_final_column = [
-        'Person - Phone',
-    ] + [f'Person - Email {i}' for i in range(1, 18)]
-
-    # Create Final Output Dataframe
-    bottoms_up_final_df = pd.DataFrame(columns=bottoms_up_final_column)
-
-    # Group by phone_number and get the grouped emails
-    grouped = bottoms_email_melted.groupby('phone_number')['email'].apply(list).reset_index()
-
-    # Flatten the emails for easier processing
-    emails_flat = []
-    for _, row in grouped.iterrows():
-        phone_number = row['phone_number']
-        emails = row['email'][:17]  # Take only the first 17 emails
-        emails_flat.append((phone_number, emails))
-
-    # Fill bottoms_up_final_df with the flattened email data
-    rows_to_add = []
-    for phone_number, emails in emails_flat:
-        # Create a dictionary for the row data
-        row_data = {'Person - Phone': phone_number}
-        row_data.update({f'Person - Email {i+1}': email for i, email in enumerate(emails)})
-        rows_to_add.append(row_data)
-
-    # Append rows to bottoms_up_final_df using pd.concat
-    bottoms_up_final_df = pd.concat([bottoms_up_final_df, pd.DataFrame(rows_to_add)], ignore_index=True).drop_duplicates()
-    
+    # Pivot the emails of every phone into Email 1 to Email 17 columns
+    bottoms_up_final_df = email_columns(bottoms_email_melted['phone_number'], bottoms_email_melted['email'], 'Person - Phone')
 
     return bottoms_up_final_df
 
@@ -159,70 +128,51 @@ def add_serial_number(bottoms_up_exist: pd.DataFrame, bottoms_up_final_df: pd.Da
     return bottoms_up_final_df
 
 #JULIA
-def add_serial_group_fields(bottoms_up_exist: pd.DataFrame, bottoms_up_df: pd.DataFrame) -> pd.DataFrame:
+def add_serial_group_fields(bottoms_up_exist: pd.DataFrame, bottoms_up: BottomsUpTable) -> pd.DataFrame:
     """
     For each phone_number in bottoms_up_exist:
       - serial_group_ids: concatenate ALL 'id' values for ALL serials found for that phone (in serial order),
         unique (no duplicates), joined by "|".
       - serial_group_contact_group_ids: use the contact_group_id from the FIRST serial only (first non-null).
       - serial_group_sum_of_all_offers: computed for the FIRST serial only (distinct contact_group_id sums to avoid double-counting).
+    Serials are looked up in the serial index of bottoms_up.
     Returns one row per phone_number.
     """
-    # Normalize serial strings coming from bottoms_up_exist (preserve order, remove blanks)
-    serials_by_phone = bottoms_up_exist.groupby('phone_number')['serial_number'] \
-        .apply(lambda seq: [s.strip() for s in seq if pd.notna(s) and str(s).strip() != ""]) \
-        .reset_index(name='serials')
-
-    rows = []
-    for _, r in serials_by_phone.iterrows():
-        phone = r['phone_number']
-        serials = r['serials']  # ordered unique-ish list from bottoms_up_exist order
-
-        # --- Part A: collect ids per serial preserving serial order and avoid duplicates
-        ids_seen = []
-        per_serial_ids = []  # for debug
-        for s in serials:
-            # match using trimmed string to be robust to whitespace
-            matches_for_serial = bottoms_up_df[bottoms_up_df['serial_number'].astype(str).str.strip() == str(s).strip()]
-            ids_for_s = matches_for_serial['id'].dropna().astype(str).tolist()
-            # keep order, avoid duplicates across serials
-            new_ids = []
-            for _id in ids_for_s:
-                if _id not in ids_seen:
-                    ids_seen.append(_id)
-                    new_ids.append(_id)
-            per_serial_ids.append((s, ids_for_s))
-        serial_group_ids = "|".join(ids_seen) if ids_seen else ""
-
-        # --- Part B: first serial only for contact_group_id and offers
-        if serials:
-            first_serial = serials[0]
-            matches_first = bottoms_up_df[bottoms_up_df['serial_number'].astype(str).str.strip() == str(first_serial).strip()]
-
-            # contact_group_id: take FIRST non-null unique value (as string)
-            cg_vals = matches_first['contact_group_id'].dropna().unique().tolist()
-            serial_group_contact_group_ids = (
-                str(int(cg_vals[0])) if cg_vals and isinstance(cg_vals[0], (float, int)) else str(cg_vals[0]) if cg_vals else ""
-            )
-            # offers (first serial only): same logic as before
-            if matches_first['contact_group_id'].dropna().empty:
-                serial_group_sum_of_all_offers = matches_first['sum_of_all_offers'].sum()
-            else:
-                serial_group_sum_of_all_offers = matches_first.drop_duplicates('contact_group_id')['sum_of_all_offers'].sum()
-        else:
-            serial_group_contact_group_ids = ""
-            serial_group_sum_of_all_offers = 0.0
-
-        rows.append({
-            'phone_number': phone,
-            'serial_group_ids': serial_group_ids,
-            'serial_group_contact_group_ids': serial_group_contact_group_ids,
-            'serial_group_sum_of_all_offers': serial_group_sum_of_all_offers
-        })
+    serial_ids_df, serial_groups_df = bottoms_up.serial_index()
 
-    serial_group_df = pd.DataFrame(rows)
+    serial_group_df = pd.DataFrame({'phone_number': bottoms_up_exist['phone_number'].dropna().drop_duplicates().sort_values()})
 
-    return serial_group_df
+    # Normalize serial strings coming from bottoms_up_exist (preserve order, remove blanks)
+    phone_serials_df = pd.DataFrame({
+        'phone_number': bottoms_up_exist['phone_number'].reset_index(drop=True),
+        'serial_number': bottoms_up_exist['serial_number'].reset_index(drop=True)
+    }).dropna()
+    phone_serials_df['serial_key'] = phone_serials_df['serial_number'].astype(str).str.strip()
+    phone_serials_df = phone_serials_df.loc[phone_serials_df['serial_key'] != "", ['phone_number', 'serial_key']].reset_index(drop=True)
+
+    # --- Part A: ids of all serials, in serial order then row order, without duplicates
+    phone_ids_df = phone_serials_df.reset_index(names='serial_position') \
+        .merge(serial_ids_df.reset_index(names='row_position'), on='serial_key') \
+        .sort_values(['phone_number', 'serial_position', 'row_position']) \
+        .drop_duplicates(['phone_number', 'id'])
+
+    # The ids of a phone are next to each other, so they are joined as slices of one list
+    ids = phone_ids_df['id'].tolist()
+    first_rows = np.flatnonzero(~phone_ids_df['phone_number'].duplicated().to_numpy())
+    ends = np.append(first_rows[1:], len(ids))
+    serial_ids = pd.Series(["|".join(ids[start:end]) for start, end in zip(first_rows, ends)],
+                           index=phone_ids_df['phone_number'].iloc[first_rows])
+
+    # --- Part B: first serial only for contact_group_id and offers
+    first_serials = phone_serials_df.drop_duplicates('phone_number') \
+        .merge(serial_groups_df, left_on='serial_key', right_index=True, how='left') \
+        .set_index('phone_number')
+
+    serial_group_df['serial_group_ids'] = serial_group_df['phone_number'].map(serial_ids).fillna("")
+    serial_group_df['serial_group_contact_group_ids'] = serial_group_df['phone_number'].map(first_serials['contact_group_id']).fillna("")
+    serial_group_df['serial_group_sum_of_all_offers'] = serial_group_df['phone_number'].map(first_serials['sum_of_all_offers']).fillna(0.0)
+
+    return serial_group_df.reset_index(drop=True)
 
 def add_deal_title(bottoms_up_exist: pd.DataFrame, bottoms_up_final_df: pd.DataFrame) -> pd.DataFrame:
     '''
@@ -496,20 +446,7 @@ def add_constant_columns(bottoms_up_final_df: pd.DataFrame) -> pd.DataFrame:
     bottoms_up_final_df['Person - Phone 1 - Data Source'] = 'Mineral Owner'
     bottoms_up_final_df['Person - Mailing Address - Data Source'] = 'MineralHolders - Bottoms Up'
 
-    def marketing_medium(row):
-        team = row.get('Team')
-
-        if team in ('Ringless Voicemail - LG', 'RVM - LG'):
-            return 'RVM'
-        elif team == 'Call Center':
-            return 'Direct Mail'
-        elif team in ('Lead Generation', 'LG'):
-            return 'Cold Call'
-        else:
-            return 'Direct Mail'
-
-    # Apply pandas function and assign to column
-    bottoms_up_final_df['Deal - Marketing Medium'] = bottoms_up_final_df.apply(marketing_medium, axis=1)
+    bottoms_up_final_df['Deal - Marketing Medium'] = marketing_medium_column(bottoms_up_final_df)
     
     bottoms_up_final_df['Deal - Deal Status'] = ''
     bottoms_up_final_df['Deal - Deal creation date'] = bottoms_up_final_df['Contact Time']
@@ -520,33 +457,7 @@ def add_constant_columns(bottoms_up_final_df: pd.DataFrame) -> pd.DataFrame:
     bottoms_up_final_df['Done'] = 'To do'
     bottoms_up_final_df['Type'] = 'Call'
 
-    def build_activity_note(row):
-        data_source = row.get('Data Source')
-        from_number = row.get('phone_number')
-        contact_time = row.get('Contact Time')
-
-        if data_source == 'JC Call':
-            return f"JC abandoned call from {from_number} on {contact_time}"
-
-        if data_source == 'RC Call':
-            return f"RC abandoned call from {from_number} on {contact_time}"
-
-        # fallback (existing behavior)
-        if pd.notna(row.get('Text')):
-            return (
-                f"{data_source}\n\n{row.get('Text')}\n\n"
-                f"Date and Time: {contact_time}\n\n"
-                f"Team Member (Recipient): {row.get('Team Member 2')}"
-            )
-
-        return (
-            "Note: the content of this text is empty\n\n"
-            f"Date and Time: {contact_time}\n\n"
-            f"Team Member (Recipient): {row.get('Team Member 2')}"
-        )
-
-
-    bottoms_up_final_df['Activity note'] = bottoms_up_final_df.apply(build_activity_note, axis=1)
+    bottoms_up_final_df['Activity note'] = activity_note_column(bottoms_up_final_df, 'phone_number')
     bottoms_up_final_df.drop_duplicates(subset=['phone_number'], inplace=True)
 
 
@@ -572,14 +483,14 @@ def filter_multiple_entries(bottoms_up_final_df, bottoms_up_not_exist):
 
     return single_entries_df, bottoms_up_not_exist_final
 
-def create_new_deals_bottoms_up(ani_not_exist: pd.DataFrame, bottoms_up_df: pd.DataFrame, file_count: int) -> 'tuple[pd.DataFrame, pd.DataFrame | None]':
+def create_new_deals_bottoms_up(ani_not_exist: pd.DataFrame, bottoms_up: BottomsUpTable, file_count: int) -> 'tuple[pd.DataFrame, pd.DataFrame | None]':
     '''
     This is the main driver function of this module.\n
     Creates Pandas Dataframe of ANI Entries that is existing and not existing in Bottoms Up Database.\n
 
     Parameters:
         `ani_not_exist (pd.DataFrame)` - Entries where ANI Number is not existing in Pipedrive Data.\n
-        `bottoms_up_df (pd.DataFrame)` - Pandas Dataframe equivalent of Bottoms Up Database.\n
+        `bottoms_up (BottomsUpTable)` - Bottoms Up Database.\n
         `file_count (int)` - Counter of abandoned call files being processed.\n
 
     Return:
@@ -648,7 +559,7 @@ def create_new_deals_bottoms_up(ani_not_exist: pd.DataFrame, bottoms_up_df: pd.D
     # print("ani_not_exist table")
     # print(ani_not_exist.columns.tolist())
 
-    bottoms_up_exist, bottoms_up_not_exist = search_ani_bottoms_up(ani_not_exist, bottoms_up_df)
+    bottoms_up_exist, bottoms_up_not_exist = search_ani_bottoms_up(ani_not_exist, bottoms_up)
 
     if bottoms_up_exist.empty:
         return bottoms_up_not_exist, pd.DataFrame(), pd.DataFrame() # Return empty dataframe if bottoms_up_exist is empty
@@ -660,7 +571,7 @@ def create_new_deals_bottoms_up(ani_not_exist: pd.DataFrame, bottoms_up_df: pd.D
         added_serial_df = add_serial_number(bottoms_up_exist, bottoms_up_final_df)
 
         # Get the serial group fields per phone_number
-        serial_group_df = add_serial_group_fields(bottoms_up_exist, bottoms_up_df)
+        serial_group_df = add_serial_group_fields(bottoms_up_exist, bottoms_up)
 
         # Merge them safely on phone_number
         added_serial_df = added_serial_df.merge(
@@ -1,4 +1,5 @@
 import pandas as pd
+from transform.column_builders import activity_note_column, marketing_medium_column, assigned_user_column, email_columns
 
 def search_ani(bottoms_up_not_exist: pd.DataFrame, phone_number_df: pd.DataFrame) -> 'tuple[pd.DataFrame, pd.DataFrame]':
     '''
@@ -56,35 +57,11 @@ def add_email_columns(cm_db_exist: pd.DataFrame, email_address_df: pd.DataFrame)
         `cm_db_final_df (pd.DataFrame)` - Final dataframe that contains all emails per ANI Number and will be added more columns based on specification.\n
     '''
 
-    # Create Email 1 to Email 17 Columns
-    email_cols = [
-        'Deal - Unique Database ID',
-    ] + [f'Person - Email {i}' for i in range(1, 18)]
-    cm_db_email_columns = pd.DataFrame(columns=email_cols)
-
     # Filter Email Address Dataframe from Community Minerals Database
     filter_email_address_df = email_address_df[email_address_df['id'].isin(cm_db_exist['id'])]
 
-    # Group by phone_number and get the grouped emails
-    grouped = filter_email_address_df.groupby('id')['email_address'].apply(list).reset_index()
-
-    # Flatten the emails for easier processing
-    emails_flat = []
-    for _, row in grouped.iterrows():
-        id = row['id']
-        emails = row['email_address'][:17]  # Take only the first 17 emails
-        emails_flat.append((id, emails))
-
-    # Fill bottoms_up_final_df with the flattened email data
-    rows_to_add = []
-    for id, emails in emails_flat:
-        # Create a dictionary for the row data
-        row_data = {'Deal - Unique Database ID': id}
-        row_data.update({f'Person - Email {i+1}': email for i, email in enumerate(emails)})
-        rows_to_add.append(row_data)
-
-    # Append rows to bottoms_up_final_df using pd.concat
-    email_address_final_df = pd.concat([cm_db_email_columns, pd.DataFrame(rows_to_add)], ignore_index=True).drop_duplicates()
+    # Pivot the emails of every id into Email 1 to Email 17 columns
+    email_address_final_df = email_columns(filter_email_address_df['id'], filter_email_address_df['email_address'], 'Deal - Unique Database ID')
 
     # Add email address dataframe to the final dataframe
     cm_db_final_df = cm_db_exist.merge(email_address_final_df,
@@ -136,6 +113,26 @@ def add_cm_db_details(cm_db_final_df: pd.DataFrame, cm_db_df: pd.DataFrame) -> p
     return cm_db_final_df
 
 
+def explode_targets(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Splits the targets of every contact into one row per county and state.\n
+
+    Parameters:
+        `cm_db_final_df (pd.DataFrame)` - Reference variable of a Pandas DataFrame with added CM Database details.\n
+
+    Return:
+        `targets_df (pd.DataFrame)` - `phone_number`, `country` and `state` of every distinct target.\n
+    '''
+
+    # Targets come as "county|state" pairs joined with ";", one row per contact
+    targets = cm_db_final_df[['phone_number', 'targets']].dropna(subset=['targets'])
+    targets = targets.assign(targets=targets['targets'].str.split(';')).explode('targets')
+    targets[['country', 'state']] = targets['targets'].str.split('|', n=1, expand=True).reindex(columns=[0, 1])
+
+    # Kept as text even without any target, so the string methods of the callers still apply
+    return targets[['phone_number', 'country', 'state']].astype({'country': object, 'state': object})
+
+
 def add_new_database_id(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
     '''
     Adds `Deal - Unique Database ID` column to the final dataframe.\n
@@ -183,7 +180,7 @@ def add_deal_title(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
         (row['first_name'].title() + ' ' + row['last_name'].title()) if pd.notna(row['first_name']) and pd.notna(row['last_name']) else 
         '', axis=1)
 
-    grouped = cm_db_final_df.groupby(['phone_number', 'state'])['country'].apply(list).reset_index()
+    grouped = explode_targets(cm_db_final_df).groupby(['phone_number', 'state'])['country'].apply(list).reset_index()
 
     # Function to format the county names
     def format_counties(counties):
@@ -199,9 +196,8 @@ def add_deal_title(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
     # Apply the formatting function to the grouped data
     grouped['formatted'] = grouped['country'].apply(format_counties)
 
-    aggregated = grouped.groupby('phone_number').apply(
-        lambda x: ' and '.join([f"{row['formatted']}, {row['state'].upper()}" for _, row in x.iterrows()])
-    ).reset_index(name='formatted_result')
+    grouped['formatted'] = grouped['formatted'] + ', ' + grouped['state'].str.upper()
+    aggregated = grouped.groupby('phone_number')['formatted'].agg(' and '.join).reset_index(name='formatted_result')
     final_result = cm_db_final_df[['phone_number', 'first_last']].drop_duplicates().merge(aggregated, on='phone_number', how='left')
     final_result['Deal - Title'] = final_result.apply(lambda row: f"{row['first_last']} {row['formatted_result']}", axis=1)
     cm_db_final_df = cm_db_final_df.merge(final_result[['phone_number', 'Deal - Title']], on='phone_number', how='left')
@@ -220,24 +216,15 @@ def add_deal_county(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
         `cm_db_final_df (pd.DataFrame)` - Reference variable of a Pandas DataFrame with added `Deal - County` column.\n
     '''
 
-    # Define pandas function that will create deal county column
-    def add_county(group):
-
-        country_list = group['country'].tolist()
-        state_list = group['state'].tolist()
+    # Format every (county, state) pair and join the unique pairs of each phone number
+    targets_df = explode_targets(cm_db_final_df)
+    targets_df['county'] = targets_df['country'].str.title() + ' County, ' + targets_df['state']
 
-        # Create a set of unique (country, state) pairs
-        unique_combinations = set((country.title(), state) for country, state in zip(country_list, state_list))
-
-        # Join the unique combinations into a formatted string
-        result = '|'.join([f"{country} County, {state}" for country, state in unique_combinations])
-
-        return result
-
-    # Create the "Deal - County" for unique phone numbers
-    unique_deals = cm_db_final_df.groupby('phone_number').apply(add_county).reset_index()
+    # Create the "Deal - County" for unique phone numbers, contacts without targets get no county
+    unique_deals = targets_df.groupby('phone_number')['county'].agg(lambda counties: '|'.join(set(counties))).reset_index()
     unique_deals.columns = ['phone_number', 'Deal - County']
     cm_db_final_df = cm_db_final_df.merge(unique_deals, on='phone_number', how='left')
+    cm_db_final_df['Deal - County'] = cm_db_final_df['Deal - County'].fillna('')
 
     return cm_db_final_df
 
@@ -260,17 +247,18 @@ def add_mailing_address(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
                 return ""
             return str(val).strip()
 
-        if row['address'].nunique() == 0:
+        # The row holds the first address of the contact and how many distinct addresses it has
+        if pd.isna(row['address_count']) or row['address_count'] == 0:
             return None
-        elif row['address'].nunique() == 1:
-            address = clean(row['address'].iloc[0])
+        elif row['address_count'] == 1:
+            address = clean(row['address'])
 
             if not address:
                 return None
 
-            city = clean(row['city'].iloc[0])
-            state = clean(row['state_address'].iloc[0])
-            postal_code = clean(row['postal_code'].iloc[0])
+            city = clean(row['city'])
+            state = clean(row['state_address'])
+            postal_code = clean(row['postal_code'])
 
             parts = [address, city, state, postal_code, "USA"]
             parts = [p for p in parts if p]
@@ -280,9 +268,7 @@ def add_mailing_address(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
             return "Multiple address entries"
     
     # Apply pandas function and assign to a column
-    mailing_address = cm_db_final_df.groupby('phone_number').apply(add_mailing_address).reset_index()
-    mailing_address.columns = ['phone_number', 'Person - Mailing Address']
-    cm_db_final_df = cm_db_final_df.merge(mailing_address, on='phone_number', how='left')
+    cm_db_final_df['Person - Mailing Address'] = cm_db_final_df.apply(add_mailing_address, axis=1)
 
     return cm_db_final_df
 
@@ -360,23 +346,7 @@ def add_marketing_medium(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
         `cm_db_final_df (pd.DataFrame)` - Dataframe with added `Deal - Marketing Medium` column.\n
     '''
 
-    # Apply pandas function and assign to column
-
-
-    def marketing_medium(row):
-        team = row.get('Team')
-
-        if team in ('Ringless Voicemail - LG', 'RVM - LG'):
-            return 'RVM'
-        elif team == 'Call Center':
-            return 'Direct Mail'
-        elif team in ('Lead Generation', 'LG'):
-            return 'Cold Call'
-        else:
-            return 'Direct Mail'
-
-    # Apply pandas function and assign to column
-    cm_db_final_df['Deal - Marketing Medium'] = cm_db_final_df.apply(marketing_medium, axis=1)
+    cm_db_final_df['Deal - Marketing Medium'] = marketing_medium_column(cm_db_final_df)
 
     return cm_db_final_df
 
@@ -411,43 +381,11 @@ def add_constant_columns(cm_db_final_df: pd.DataFrame) -> pd.DataFrame:
     cm_db_final_df['Deal - Owner'] = 'Stephanie'
     cm_db_final_df['Deal - Deal Status'] = ''
     cm_db_final_df['Person - Timezone'] = ''
-    cm_db_final_df['Assigned to user'] = cm_db_final_df.apply(
-        lambda x: 'Jannin' if x['Team Member 2'] in ['Anna Grace Tayag', 'Jude Gella', 'Marketing Team', 'Your Number'] 
-        or pd.isna(x['Team Member 2']) 
-        else x['Team Member 2'], 
-        axis=1
-    )
-    cm_db_final_df.loc[cm_db_final_df['Assigned to user'].str.contains('keena', case=False, na=False), 'Assigned to user'] = 'Jannin'
+    cm_db_final_df['Assigned to user'] = assigned_user_column(cm_db_final_df)
     cm_db_final_df['Done'] = 'To do'
     cm_db_final_df['Type'] = 'Call'
 
-    def build_activity_note(row):
-        data_source = row.get('Data Source')
-        from_number = row.get('From')
-        contact_time = row.get('Contact Time')
-
-        if data_source == 'JC Call':
-            return f"JC abandoned call from {from_number} on {contact_time}"
-
-        if data_source == 'RC Call':
-            return f"RC abandoned call from {from_number} on {contact_time}"
-
-        # fallback (existing behavior)
-        if pd.notna(row.get('Text')):
-            return (
-                f"{data_source}\n\n{row.get('Text')}\n\n"
-                f"Date and Time: {contact_time}\n\n"
-                f"Team Member (Recipient): {row.get('Team Member 2')}"
-            )
-
-        return (
-            "Note: the content of this text is empty\n\n"
-            f"Date and Time: {contact_time}\n\n"
-            f"Team Member (Recipient): {row.get('Team Member 2')}"
-        )
-
-
-    cm_db_final_df['Activity note'] = cm_db_final_df.apply(build_activity_note, axis=1)
+    cm_db_final_df['Activity note'] = activity_note_column(cm_db_final_df, 'From')
     cm_db_final_df.drop_duplicates(subset=['From'], inplace=True) # Remove duplicated ANI Numbers
 
 
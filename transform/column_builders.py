@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+
+'''
+This module contains the builders of the columns that every output file shares: the activity note,
+the marketing medium, the assigned user and the email columns.\n
+Each builder works on whole columns at once, with the same text a row by row function would write.\n
+'''
+
+# Marketing medium per Team, every other team is Direct Mail
+MARKETING_MEDIUMS = {
+    'Ringless Voicemail - LG': 'RVM',
+    'RVM - LG': 'RVM',
+    'Call Center': 'Direct Mail',
+    'Lead Generation': 'Cold Call',
+    'LG': 'Cold Call'
+}
+DEFAULT_MARKETING_MEDIUM = 'Direct Mail'
+
+# Calls to these team members, or to no team member, are assigned to the default user
+DEFAULT_USER = 'Jannin'
+DEFAULT_USER_TEAM_MEMBERS = ['Anna Grace Tayag', 'Jude Gella', 'Marketing Team', 'Your Number']
+
+# Emails kept per contact, in `Person - Email 1` to `Person - Email 17`
+EMAIL_COUNT = 17
+
+
+def _column(df: pd.DataFrame, column: str) -> pd.Series:
+
+    # A missing column reads as None, like `row.get`
+    if column not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+
+    return df[column]
+
+def _text(df: pd.DataFrame, column: str) -> pd.Series:
+
+    values = _column(df, column)
+
+    # Times to the second are written like `str` writes a Timestamp, without formatting them one by one
+    if pd.api.types.is_datetime64_dtype(values) and ((values.dt.floor('s') == values) | values.isna()).all():
+        text = pd.Series(np.datetime_as_string(values.to_numpy(), unit='s'), index=df.index, dtype=object)
+        return text.str.replace('T', ' ', regex=False).where(values.notna(), 'NaT')
+
+    # Text is kept as it is, every other value is formatted on its own, the way an f-string formats it
+    if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+        return values.astype(object)
+
+    return values.astype(object).map(str)
+
+def activity_note_column(df: pd.DataFrame, from_column: str = 'From') -> pd.Series:
+    '''
+    Builds the `Activity note` of every row. JC and RC calls get a one line note of the abandoned
+    call, other sources get the text of the message with the date and the recipient.\n
+
+    Parameters:
+        `df (pd.DataFrame)` - Rows with `Data Source`, `Contact Time`, `Text` and `Team Member 2` columns.\n
+        `from_column (str)` - Column of the ANI Number, e.g. `From` or `phone_number`.\n
+
+    Return:
+        `activity_note (pd.Series)` - Activity note of every row.\n
+    '''
+
+    data_source = _column(df, 'Data Source')
+    is_jc_call = (data_source == 'JC Call').to_numpy()
+    is_rc_call = (data_source == 'RC Call').to_numpy()
+    is_call = is_jc_call | is_rc_call
+    has_text = ~is_call & _column(df, 'Text').notna().to_numpy()
+    no_text = ~is_call & ~has_text
+
+    contact_time = _text(df, 'Contact Time').to_numpy()
+    activity_note = np.empty(len(df), dtype=object)
+
+    # Each kind of note is only written for its own rows
+    activity_note[is_call] = (np.where(is_jc_call[is_call], 'JC', 'RC').astype(object) + ' abandoned call from '
+                              + _text(df, from_column).to_numpy()[is_call] + ' on ' + contact_time[is_call])
+
+    recipient = _text(df, 'Team Member 2').to_numpy()
+    activity_note[has_text] = (_text(df, 'Data Source').to_numpy()[has_text] + '\n\n' + _text(df, 'Text').to_numpy()[has_text]
+                               + '\n\nDate and Time: ' + contact_time[has_text]
+                               + '\n\nTeam Member (Recipient): ' + recipient[has_text])
+    activity_note[no_text] = ('Note: the content of this text is empty\n\nDate and Time: ' + contact_time[no_text]
+                              + '\n\nTeam Member (Recipient): ' + recipient[no_text])
+
+    return pd.Series(activity_note, index=df.index, dtype=object)
+
+def marketing_medium_column(df: pd.DataFrame) -> pd.Series:
+    '''
+    Builds the `Deal - Marketing Medium` of every row from its `Team`.\n
+
+    Parameters:
+        `df (pd.DataFrame)` - Rows with a `Team` column.\n
+
+    Return:
+        `marketing_medium (pd.Series)` - Marketing medium of every row.\n
+    '''
+
+    return _column(df, 'Team').map(MARKETING_MEDIUMS).fillna(DEFAULT_MARKETING_MEDIUM).astype(object).rename(None)
+
+def assigned_user_column(df: pd.DataFrame) -> pd.Series:
+    '''
+    Builds the `Assigned to user` of every row: the `Team Member 2` that received the call, or the
+    default user for shared numbers, calls without a team member and calls to Keena.\n
+
+    Parameters:
+        `df (pd.DataFrame)` - Rows with a `Team Member 2` column.\n
+
+    Return:
+        `assigned_user (pd.Series)` - Assigned user of every row.\n
+    '''
+
+    team_member = df['Team Member 2']
+    assigned_user = team_member.astype(object).rename(None).where(~(team_member.isin(DEFAULT_USER_TEAM_MEMBERS) | team_member.isna()), DEFAULT_USER)
+    assigned_user[assigned_user.str.contains('keena', case=False, na=False).to_numpy()] = DEFAULT_USER
+
+    return assigned_user
+
+def email_columns(keys: pd.Series, emails: pd.Series, key_column: str) -> pd.DataFrame:
+    '''
+    Pivots long email rows into one row per key with `Person - Email 1` to `Person - Email 17` columns.
+    Emails keep the order of their rows, emails past the 17th of a key are left out.\n
+
+    Parameters:
+        `keys (pd.Series)` - Key of every email row, e.g. the phone number or the database id.\n
+        `emails (pd.Series)` - Email of every row, aligned with `keys`.\n
+        `key_column (str)` - Name of the key column, e.g. `Person - Phone`.\n
+
+    Return:
+        `email_columns_df (pd.DataFrame)` - One row per key, sorted by key, rows without a key are left out.\n
+    '''
+
+    # Keys are numbered in sorted order and every email gets its rank within its key
+    codes, unique_keys = pd.factorize(keys, sort=True)
+    ranks = pd.Series(codes).groupby(codes, sort=False).cumcount().to_numpy()
+    kept = (codes >= 0) & (ranks < EMAIL_COUNT)
+
+    # A single keys x 17 grid holds every email, empty slots are NaN
+    grid = np.full((len(unique_keys), EMAIL_COUNT), np.nan, dtype=object)
+    grid[codes[kept], ranks[kept]] = emails.to_numpy(dtype=object)[kept]
+
+    email_columns_df = pd.DataFrame(grid, columns=[f'Person - Email {i}' for i in range(1, EMAIL_COUNT + 1)])
+    email_columns_df.insert(0, key_column, np.asarray(unique_keys, dtype=object))
+
+    return email_columns_df
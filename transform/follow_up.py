@@ -4,10 +4,23 @@ from datetime import datetime
 # This line will enable us to import python scripts from other folders
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import numpy as np
 import pandas as pd
+from user_input.phone_index import PhoneIndex
+from misc.phone_keys import strip_country_code
+from transform.column_builders import activity_note_column
 
 
-def search_ani(abandoned_df: pd.DataFrame, pipedrive_df: pd.DataFrame) -> 'tuple[pd.DataFrame, pd.DataFrame]':
+# Values of assigned users that are read from a column of the deal
+ASSIGNED_USER_COLUMNS = {
+    'Deal Owner': 'Deal - Owner',
+    'CA Tracking Flag': 'Deal - CA Tracking Flag'
+}
+
+
+def search_ani(abandoned_df: pd.DataFrame,
+               pipedrive_df: pd.DataFrame,
+               phone_index: PhoneIndex) -> 'tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]':
     '''
     Search ANI Number from Abandoned Calls Dataframe if it is exisitng in Pipedrive Dataframe.
     This function will return ONLY EXISTING entries.\n
@@ -15,61 +28,48 @@ def search_ani(abandoned_df: pd.DataFrame, pipedrive_df: pd.DataFrame) -> 'tuple
     Parameters:
         `abandoned_df` - Reference variable for abandoned_calls Pandas Dataframe\n
         `pipedrive_df` - Reference variable for pipedrive Pandas Dataframe\n
+        `phone_index` - Phone number index of the pipedrive snapshot `pipedrive_df` was read from\n
 
     Return:
         `final_result` - Reference variable for Pandas Dataframe of entries of ANI that is existing in
         pipedrive dataframe.\n
         `final_result_not_exist` - Reference variable for Pandas Dataframe of entries of ANI that is NOT existing in
         pipedrive dataframe.\n
+        `pipedrive_phones_df` - Reference variable for Pandas Dataframe of pipedrive deals that have a phone number.\n
     '''
 
-    # # Create list of phone number columns that will be used for searching ANI
-    # phone_columns = [f'Person - Phone {i}' for i in range(1, 11)]
-    # phone_columns.extend(['Person - Phone - Other', 'Person - Phone - Home', 'Person - Phone - Mobile'])
     pd.options.mode.chained_assignment = None
 
-    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].fillna('')
-    pipedrive_df = pipedrive_df[pipedrive_df['phone_number'].str.strip() != '']
-    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].str.split(',')
-    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].apply(lambda x: sorted(set(x), key=x.index))
-    df_exploded = pipedrive_df.explode('phone_number').reset_index(drop=True)
-
     # Select columns needed
-    # pipedrive_selected_cols = pipedrive_df # [['Deal - ID', 'Deal - Owner', 'Deal - Pipeline', 'Deal - Stage', 'Deal - CA Tracking Flag']]
     abandoned_df_selected_cols = abandoned_df[abandoned_df['Deal ID'].isna()][['Contact Time', 'From', 'To', 'Text', 'Deal ID', 'Team Member 2', 'Category', 'Data Source', 'Team']]
     
-    # # Add pipedrive details per deal id
-    # pipedrive_final_data = pipedrive_melted.merge(pipedrive_selected_cols,
-    #                                             on='Deal - ID',
-    #                                             how='left')
-    # pipedrive_final_data = pipedrive_final_data.drop_duplicates(subset=['Deal - ID', 'phone_number'])
+    # Search existing ANI numbers in pipedrive final data
+    abandoned_df_selected_cols['From'] = strip_country_code(abandoned_df_selected_cols['From'].astype(str))
+    abandoned_df_selected_cols['To'] = strip_country_code(abandoned_df_selected_cols['To'].astype(str))
 
-    # Group by 'phone_number' and aggregate 'Deal - ID' into a single string with unique IDs
-    deal_ids = df_exploded.groupby('phone_number')['Deal - ID']\
-        .agg(lambda x: " | ".join(map(str, pd.unique(x))))
+    # Look up every ANI in the phone index, matches come back in call order and snapshot order per call
+    call_positions, deal_rows = phone_index.match(abandoned_df_selected_cols['From'])
 
-    # Map the aggregated deal IDs back to the original DataFrame
-    df_exploded['all_deal_id'] = df_exploded['phone_number'].map(deal_ids)
+    # Left join the calls to the deals, a call without a deal is kept once with empty pipedrive columns
+    match_counts = np.bincount(call_positions, minlength=len(abandoned_df_selected_cols))
+    call_rows = np.repeat(np.arange(len(abandoned_df_selected_cols)), np.maximum(match_counts, 1))
+    is_match = match_counts[call_rows] > 0
+    pipedrive_rows = np.full(len(call_rows), -1)
+    pipedrive_rows[is_match] = deal_rows
 
-    
-    # Search existing ANI numbers in pipedrive final data
-    abandoned_df_selected_cols['From'] = abandoned_df_selected_cols['From'].astype(str)
-    mask = abandoned_df_selected_cols['From'].str.len() == 11
-    abandoned_df_selected_cols.loc[mask, 'From'] = abandoned_df_selected_cols.loc[mask, 'From'].str[1:].str.strip()
-    abandoned_df_selected_cols['To'] = abandoned_df_selected_cols['To'].astype(str)
-    mask = abandoned_df_selected_cols['To'].str.len() == 11
-    abandoned_df_selected_cols.loc[mask, 'To'] = abandoned_df_selected_cols.loc[mask, 'To'].str[1:].str.strip()
-    merged_calls_pipedrive = abandoned_df_selected_cols.merge(df_exploded,
-                                                    left_on='From',
-                                                    right_on='phone_number',
-                                                    how='left')
+    merged_calls = abandoned_df_selected_cols.iloc[call_rows].reset_index(drop=True)
+    merged_deals = pipedrive_df.reset_index(drop=True).reindex(pipedrive_rows).reset_index(drop=True)
+    merged_deals['phone_number'] = merged_calls['From'].where(is_match)
+    merged_deals['all_deal_id'] = phone_index.lookup_deal_ids(merged_deals['phone_number'])
+    merged_calls_pipedrive = pd.concat([merged_calls, merged_deals], axis=1)
 
     # Select existing ANI and non-existing and assign to variables
     final_result = merged_calls_pipedrive[(merged_calls_pipedrive['phone_number'].notnull()) & (merged_calls_pipedrive['phone_number'] != 'Anonymous')]
     final_result_not_exist = merged_calls_pipedrive[(merged_calls_pipedrive['phone_number'].isna()) | (merged_calls_pipedrive['phone_number'] == 'Anonymous')]
-    
 
-    return final_result, final_result_not_exist, df_exploded
+    pipedrive_phones_df = pipedrive_df.iloc[phone_index.indexed_rows()]
+
+    return final_result, final_result_not_exist, pipedrive_phones_df
 
 
 def add_activity_note_column(deal_id_search_result: pd.DataFrame) -> pd.DataFrame:
@@ -88,35 +88,8 @@ def add_activity_note_column(deal_id_search_result: pd.DataFrame) -> pd.DataFram
     # deal_id_search_result['Activity note'] = deal_id_search_result.apply(
     #     lambda row: f"Text from {row['From']} to {row['To']} {row['Text']} Date and Time: {row['Contact Time']}" if pd.notna(row['Text']) else f"Text from {row['From']} to {row['To']} Note: the content of this text is empty Date and Time: {row['Contact Time']}",
     #     axis = 1)
-    
-    
-    def build_activity_note(row):
-        data_source = row.get('Data Source')
-        from_number = row.get('From')
-        contact_time = row.get('Contact Time')
 
-        if data_source == 'JC Call':
-            return f"JC abandoned call from {from_number} on {contact_time}"
-
-        if data_source == 'RC Call':
-            return f"RC abandoned call from {from_number} on {contact_time}"
-
-        # fallback (existing behavior)
-        if pd.notna(row.get('Text')):
-            return (
-                f"{data_source}\n\n{row.get('Text')}\n\n"
-                f"Date and Time: {contact_time}\n\n"
-                f"Team Member (Recipient): {row.get('Team Member 2')}"
-            )
-
-        return (
-            "Note: the content of this text is empty\n\n"
-            f"Date and Time: {contact_time}\n\n"
-            f"Team Member (Recipient): {row.get('Team Member 2')}"
-        )
-
-
-    deal_id_search_result['Activity note'] = deal_id_search_result.apply(build_activity_note, axis=1)
+    deal_id_search_result['Activity note'] = activity_note_column(deal_id_search_result, 'From')
     
     return deal_id_search_result
 
@@ -136,93 +109,205 @@ def add_subject_column(deal_id_search_result: pd.DataFrame) -> pd.DataFrame:
 
     return deal_id_search_result
 
-def new_add_subject_column(deal_id_search_result: pd.DataFrame, user_designation: dict, conditions_dict: dict) -> pd.DataFrame:
+def compile_follow_up_rules(user_designation: dict, conditions_dict: dict) -> dict:
     '''
-    Adds `Subject` column to the final dataframe that contains the follow up type of the phone number.\n
+    Compiles the follow up settings into a rule plan, so the settings are read once instead of once per row.\n
 
     Parameters:
-        `deal_id_search_result (pd.DataFrame)` - Reference variable of a Pandas DataFrame with added `Activity Note` column.\n
         `user_designation (dict)` - Dictionary of designated follow up and user per pipeline.\n
         `conditions_dict (dict)` - Dictionary of conditions per pipeline.\n
 
     Return:
-        `deal_id_search_result (pd.DataFrame)` - Reference variable of a Pandas DataFrame with added `Subject` column.\n
+        `rule_plan (dict)` - Pipeline names in the order they are checked, and the defaults and conditions of every pipeline.\n
     '''
 
-    # Dictionary that will contain converted Deal - Pipeline to int counterpart
+    # Pipeline name as key and int counter part as value, the first name of a pipeline keeps its place
     pipeline_conversion = {}
-
-    # Date today for offer ready conditions
-    date_today = datetime.today()
-
-    # Assign pipeline name as key and int counter part as value
     for key, value in user_designation.items():
         pipeline_conversion[value[0]] = key
 
-    def format_date(row):
-
-        date_object = datetime.strptime(row, '%Y-%m-%d')
-
-        return date_object
-
-    def check_deal_pipeline(key, pipeline_value):
-        if 'sales' in key.lower():
-            return f"{key.lower()} pipeline" == pipeline_value.lower()
-        else:
-            return key.lower() in pipeline_value.lower()
+    rules = {}
+    for value in pipeline_conversion.values():
+        conditions = []
+        for condition_group in conditions_dict.get(value, []):
+            for condition, list_values in condition_group.items():
+
+                # `offer ready > 30` applies to rows whose column is `offer ready`, and hits if `Deal - Offer Ready Date` is more than 30 days ago
+                date_checks = []
+                for operator in ['>', '<']:
+                    if f' {operator} ' in condition:
+                        parts = condition.split(f' {operator} ')
+                        date_checks.append({
+                            'operator': operator,
+                            'state': parts[0].lower(),
+                            'date_column': f"Deal - {parts[0].title()} Date",
+                            'days': parts[1]
+                        })
+
+                conditions.append({
+                    'column': list_values[0],
+                    'date_checks': date_checks,
+                    'state': condition.lower(),
+                    'subject': list_values[1],
+                    'assigned_user': list_values[2]
+                })
+
+        rules[value] = {
+            'subject': user_designation[value][1] if user_designation[value][1] != 'None' else None,
+            'assigned_user': user_designation[value][2],
+            'conditions': conditions
+        }
+
+    return {
+        'pipelines': [(key.lower(), 'sales' in key.lower(), value) for key, value in pipeline_conversion.items()],
+        'rules': rules
+    }
+
+def assign_follow_up_rules(deal_id_search_result: pd.DataFrame, rule_plan: dict) -> 'tuple[pd.Series, pd.Series]':
+    '''
+    Finds the follow up type and the assigned user of every row in one pass over the columns.
+    The first condition of a pipeline whose date check hits wins, then the last condition equal
+    to its column, then the default of the pipeline. Rows of a pipeline that is not in the tool get none.\n
 
-    # Pandas function that will execute dynamic input setting
-    def assign_subject(row):
-        for key in pipeline_conversion:
-            if check_deal_pipeline(key, row['Deal - Pipeline']):
-                value = pipeline_conversion[key] # number equivalent of pipeline
+    Parameters:
+        `deal_id_search_result (pd.DataFrame)` - Reference variable of a Pandas DataFrame with `Deal - Pipeline` and the condition columns.\n
+        `rule_plan (dict)` - Compiled follow up settings from `compile_follow_up_rules`.\n
 
-                if len(conditions_dict[value]) > 0: # if there are conditions
+    Return:
+        `subject (pd.Series)` - Follow up type of every row.\n
+        `assigned_user (pd.Series)` - Assigned user of every row.\n
+    '''
 
-                    found_value = False # Set initial condition
-                    initial_value = ''
+    # Date today for offer ready conditions
+    date_today = pd.Timestamp(datetime.today())
+
+    # Every distinct pipeline value is matched once, the first pipeline of the tool that matches wins
+    pipeline_values = {}
+    for pipeline_value in deal_id_search_result['Deal - Pipeline'].dropna().unique():
+        pipeline_lower = str(pipeline_value).lower()
+        for key, is_sales, value in rule_plan['pipelines']:
+            if (f"{key} pipeline" == pipeline_lower) if is_sales else (key in pipeline_lower):
+                pipeline_values[pipeline_value] = value
+                break
+    pipelines = deal_id_search_result['Deal - Pipeline'].map(pipeline_values)
+
+    subject = np.full(len(deal_id_search_result), None, dtype=object)
+    assigned_user = np.full(len(deal_id_search_result), None, dtype=object)
+
+    # Lower case values of each condition column as codes, so every condition compares integers
+    column_codes = {}
+
+    def lower_codes(column):
+        if column not in column_codes:
+            codes, uniques = pd.factorize(deal_id_search_result[column])
+            lower_codes_of_uniques, lower_uniques = pd.factorize(pd.Series(uniques, dtype=object).str.lower())
+            codes = np.where(codes >= 0, np.append(lower_codes_of_uniques, -1)[codes], -1)
+            column_codes[column] = (codes, {state: code for code, state in enumerate(lower_uniques)})
+        return column_codes[column]
+
+    def equals_state(column, state):
+        codes, states = lower_codes(column)
+        return codes == states.get(state, -2)
+
+    # Days since each date column, parsed only for the columns a condition needs
+    days_since = {}
+
+    def days_since_date(date_column, rows):
+        if date_column not in days_since:
+            dates = deal_id_search_result[date_column]
+            has_date = (dates.notna() & (dates != '')).to_numpy()
+            parsed = pd.to_datetime(dates.where(has_date), format='%Y-%m-%d', errors='coerce')
+            days_since[date_column] = (has_date, (date_today - parsed).dt.days.to_numpy())
+
+        has_date, days = days_since[date_column]
+
+        # Dates that are not in %Y-%m-%d format can not be compared
+        not_parsed = rows & has_date & np.isnan(days)
+        if not_parsed.any():
+            raise ValueError(f"{date_column} {deal_id_search_result[date_column].to_numpy()[not_parsed][0]!r} does not match format '%Y-%m-%d'")
+
+        return days
+
+    def user_value(user, rows):
+        if user in ASSIGNED_USER_COLUMNS:
+            return deal_id_search_result[ASSIGNED_USER_COLUMNS[user]].to_numpy()[rows]
+        return user if user != 'None' else None # Type in name by the user
+
+    for value, rule in rule_plan['rules'].items():
+        in_pipeline = (pipelines == value).to_numpy()
+        if not in_pipeline.any():
+            continue
+
+        date_hit = np.zeros(len(deal_id_search_result), dtype=bool)
+        equal_hit = np.zeros(len(deal_id_search_result), dtype=bool)
+
+        for condition in rule['conditions']:
+            undecided = in_pipeline.copy()
+
+            # A row is only checked against the first part of the condition that applies to it
+            for date_check in condition['date_checks']:
+                applies = undecided & equals_state(condition['column'], date_check['state'])
+                undecided &= ~applies
+                if not applies.any():
+                    continue
+
+                days = days_since_date(date_check['date_column'], applies)
+                days_count = int(date_check['days'])
+                with np.errstate(invalid='ignore'):
+                    passed = days > days_count if date_check['operator'] == '>' else days < days_count
+                hits = applies & passed & ~date_hit
+
+                subject[hits] = condition['subject']
+                assigned_user[hits] = user_value(condition['assigned_user'], hits)
+                date_hit |= hits
+
+            # if column is equal to condition, the last equal condition is kept
+            equals = undecided & equals_state(condition['column'], condition['state']) & ~date_hit
+            subject[equals] = condition['subject']
+            assigned_user[equals] = user_value(condition['assigned_user'], equals)
+            equal_hit |= equals
+
+        # if all conditions are not satisfied, return default setting value
+        defaults = in_pipeline & ~date_hit & ~equal_hit
+        subject[defaults] = rule['subject']
+        assigned_user[defaults] = user_value(rule['assigned_user'], defaults)
+
+    return (pd.Series(subject, index=deal_id_search_result.index),
+            pd.Series(assigned_user, index=deal_id_search_result.index))
+
+def add_subject_and_assigned_user(deal_id_search_result: pd.DataFrame, user_designation: dict, conditions_dict: dict) -> pd.DataFrame:
+    '''
+    Adds `Subject` and `Assigned to user` columns to the final dataframe from one pass of the compiled follow up settings.\n
 
-                    for conditions in conditions_dict[value]: # find the conditions for specific pipeline
-                        for condition, list_values in conditions.items(): # iterate through all pipeline conditions list
-                            if ' > ' in condition and condition.split(' > ')[0].lower() == row[list_values[0]].lower():
+    Parameters:
+        `deal_id_search_result (pd.DataFrame)` - Reference variable of a Pandas DataFrame with added `Activity Note` column.\n
+        `user_designation (dict)` - Dictionary of designated follow up and user per pipeline.\n
+        `conditions_dict (dict)` - Dictionary of conditions per pipeline.\n
 
-                                column_name = condition.split(' > ')[0].title()
-                                days_count = condition.split(' > ')[1]
+    Return:
+        `deal_id_search_result (pd.DataFrame)` - Reference variable of a Pandas DataFrame with added `Subject` and `Assigned to user` columns.\n
+    '''
 
-                                if pd.notna(row[f"Deal - {column_name} Date"]) and row[f"Deal - {column_name} Date"] != '':
-                                    if (date_today - format_date(row[f"Deal - {column_name} Date"])).days > int(days_count):
-                                        found_value = True
-                                        return list_values[1]
+    rule_plan = compile_follow_up_rules(user_designation, conditions_dict)
+    deal_id_search_result['Subject'], deal_id_search_result['Assigned to user'] = assign_follow_up_rules(deal_id_search_result, rule_plan)
 
-                            elif ' < ' in condition and condition.split(' < ')[0].lower() == row[list_values[0]].lower():
+    return deal_id_search_result
 
-                                column_name = condition.split(' < ')[0].title()
-                                days_count = condition.split(' < ')[1]
+def new_add_subject_column(deal_id_search_result: pd.DataFrame, user_designation: dict, conditions_dict: dict) -> pd.DataFrame:
+    '''
+    Adds `Subject` column to the final dataframe that contains the follow up type of the phone number.\n
 
-                                if pd.notna(row[f"Deal - {column_name} Date"]) and row[f"Deal - {column_name} Date"] != '':
-                                    if (date_today - format_date(row[f"Deal - {column_name} Date"])).days < int(days_count):
-                                        found_value = True
-                                        return list_values[1]
+    Parameters:
+        `deal_id_search_result (pd.DataFrame)` - Reference variable of a Pandas DataFrame with added `Activity Note` column.\n
+        `user_designation (dict)` - Dictionary of designated follow up and user per pipeline.\n
+        `conditions_dict (dict)` - Dictionary of conditions per pipeline.\n
 
-                            elif row[list_values[0]].lower() == condition.lower(): # if column is equal to condition
+    Return:
+        `deal_id_search_result (pd.DataFrame)` - Reference variable of a Pandas DataFrame with added `Subject` column.\n
+    '''
 
-                                found_value = True
-                                initial_value = list_values[1]
-                                continue
-                                
-                    if not found_value:
-                        # if all conditions are not satisfied, return default setting value
-                        return user_designation[value][1] if user_designation[value][1] != 'None' else None # follow up
-                    else:
-                        return initial_value
-                
-                else: # if there are no conditions for pipeline, return default setting value
-                    return user_designation[value][1] if user_designation[value][1] != 'None' else None # follow up
-            
-        return None # If pipeline was not in tool, return Blank
-         
-                    
-    deal_id_search_result['Subject'] = deal_id_search_result.apply(assign_subject, axis=1)
+    rule_plan = compile_follow_up_rules(user_designation, conditions_dict)
+    deal_id_search_result['Subject'] = assign_follow_up_rules(deal_id_search_result, rule_plan)[0]
 
     return deal_id_search_result
 
@@ -257,91 +342,8 @@ def new_add_assigned_user(deal_id_search_result: pd.DataFrame, user_designation:
         `deal_id_search_result (pd.DataFrame)` - Reference Variable of a Pandas Dataframe with added `Assigned to user` column.\n
     '''
 
-    # Dictionary that will contain converted Deal - Pipeline to int counterpart
-    pipeline_conversion = {}
-
-    # Date today for offer ready conditions
-    date_today = datetime.today()
-
-    # Assign pipeline name as key and int counter part as value
-    for key, value in user_designation.items():
-        pipeline_conversion[value[0]] = key
-
-    # Helper function
-    def assigned_user_default_value(values, row):
-        if values == 'Deal Owner':
-            return row['Deal - Owner']
-        elif values == 'CA Tracking Flag':
-            return row['Deal - CA Tracking Flag']
-        else:
-            return values if values != 'None' else None # Type in name by the user
-        
-    def format_date(row):
-
-        date_object = datetime.strptime(row, '%Y-%m-%d')
-
-        return date_object
-    
-    def check_deal_pipeline(key, pipeline_value):
-        if 'sales' in key.lower():
-            return f"{key.lower()} pipeline" == pipeline_value.lower()
-        else:
-            return key.lower() in pipeline_value.lower()
-
-
-    # Pandas function that will execute dynamic input setting
-    def assign_user(row):
-        for key in pipeline_conversion:
-            if check_deal_pipeline(key, row['Deal - Pipeline']):
-                value = pipeline_conversion[key] # number equivalent of pipeline
-
-                if len(conditions_dict[value]) > 0: # if there are conditions
-
-                    found_value = False # Set initial condition
-                    initial_value = ''
-
-                    for conditions in conditions_dict[value]: # find the conditions for specific pipeline
-                        for condition, list_values in conditions.items(): # iterate through all pipeline conditions list
-                            if ' > ' in condition and condition.split(' > ')[0].lower() == row[list_values[0]].lower():
-
-                                column_name = condition.split(' > ')[0].title()
-                                days_count = condition.split(' > ')[1]
-
-                                if pd.notna(row[f"Deal - {column_name} Date"]) and row[f"Deal - {column_name} Date"] != '':
-                                    if (date_today - format_date(row[f"Deal - {column_name} Date"])).days > int(days_count):
-                                        found_value = True
-                                        return assigned_user_default_value(list_values[2], row)
-
-                            elif ' < ' in condition and condition.split(' < ')[0].lower() == row[list_values[0]].lower():
-
-                                column_name = condition.split(' < ')[0].title()
-                                days_count = condition.split(' < ')[1]
-
-                                if pd.notna(row[f"Deal - {column_name} Date"]) and row[f"Deal - {column_name} Date"] != '':
-                                    if (date_today - format_date(row[f"Deal - {column_name} Date"])).days < int(days_count):
-                                        found_value = True
-                                        return assigned_user_default_value(list_values[2], row)
-
-                            elif row[list_values[0]].lower() == condition.lower(): # if column is equal to condition
-
-                                found_value = True
-                                initial_value = assigned_user_default_value(list_values[2], row)
-                                continue
-                                
-                    if not found_value:
-                        # if all conditions are not satisfied, return default
-                        return assigned_user_default_value(user_designation[value][2], row)
-                    else:
-                        return initial_value
-
-                
-                else: # if there are no conditions for pipeline, return default setting value
-                    return assigned_user_default_value(user_designation[value][2], row)
-
-        return None
-         
-                    
-    deal_id_search_result['Assigned to user'] = deal_id_search_result.apply(assign_user, axis=1)
+    rule_plan = compile_follow_up_rules(user_designation, conditions_dict)
+    deal_id_search_result['Assigned to user'] = assign_follow_up_rules(deal_id_search_result, rule_plan)[1]
 
     return deal_id_search_result
 
@@ -474,9 +476,8 @@ def create_follow_up(search_result: pd.DataFrame,
     # Add columns based on the specification
     added_activity_note = add_activity_note_column(search_result)
     # added_subject = add_subject_column(added_activity_note)
-    added_subject = new_add_subject_column(added_activity_note, user_designation, condition_dict)
     # added_assigned_user = add_assigned_user(added_subject)
-    added_assigned_user = new_add_assigned_user(added_subject, user_designation, condition_dict)
+    added_assigned_user = add_subject_and_assigned_user(added_activity_note, user_designation, condition_dict)
     added_constant_column = add_constant_column(added_assigned_user)
 
     # Add columns to RC Data
@@ -1,47 +1,21 @@
 import pandas as pd
 import os
 import warnings
-from user_input.parallel_get import main as update_pipedrive_data
+from user_input.parallel_get import ensure_fresh as update_pipedrive_data
+from user_input.phone_index import PhoneIndex, load_phone_index
+from misc.phone_keys import strip_country_code
 
 warnings.simplefilter(action='ignore', category=pd.errors.SettingWithCopyWarning)
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
-def assign_deal_id(df: pd.DataFrame, phone_to_deal_dict: dict, file_name: str) -> pd.DataFrame:
+def assign_deal_id(df: pd.DataFrame, phone_index: PhoneIndex, file_name: str) -> pd.DataFrame:
     mask = df['Deal ID'].isna()
-    df.loc[mask, 'Deal ID'] = df.loc[mask, 'phone_number'].map(phone_to_deal_dict)
-    df.loc[mask & df['phone_number'].isin(phone_to_deal_dict), 'Resolved By'] = 'Joyce Marie Gempesaw'
+    deal_ids = phone_index.lookup_deal_ids(df.loc[mask, 'phone_number'])
+    df.loc[mask, 'Deal ID'] = deal_ids
+    df.loc[deal_ids[deal_ids.notna()].index, 'Resolved By'] = 'Joyce Marie Gempesaw'
     df.drop(columns=['phone_number'], axis=1, inplace=True)
     df.to_excel(f'output/new_deals_deal_id/(Lookup Output) {file_name}', index=False)
 
-def format_pipedrive_data(pipedrive_df: pd.DataFrame) -> dict:
-    print("Formatting Pipedrive data")
-
-    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].fillna('').astype(str)
-    pipedrive_df = pipedrive_df[pipedrive_df['phone_number'].str.strip() != '']
-    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].str.split(',')
-    pipedrive_df['phone_number'] = pipedrive_df['phone_number'].apply(
-        lambda x: sorted(set(x), key=x.index)
-    )
-
-    pipedrive_final_data = pipedrive_df.explode('phone_number').reset_index(drop=True)
-    pipedrive_final_data['phone_number'] = pipedrive_final_data['phone_number'].str.replace(r'\D', '', regex=True)
-    pipedrive_final_data = pipedrive_final_data[pipedrive_final_data['phone_number'] != '']
-
-    grouped_df = (
-        pipedrive_final_data.groupby('phone_number')['Deal - ID']
-        .agg(lambda row: " | ".join(row.astype(str).unique()))
-        .reset_index()
-    )
-    phone_to_deal = grouped_df.set_index('phone_number')['Deal - ID'].to_dict()
-    return phone_to_deal
-
-def read_pipedrive(path):
-
-    pipedrive_file = os.listdir(path)
-    pipedrive_df = pd.read_csv(os.path.join(path, pipedrive_file[0]), low_memory=False)
-    
-    return pipedrive_df
-
 def read_rc_data(path, file):
 
     if file.endswith('.csv'):
@@ -53,9 +27,9 @@ def read_rc_data(path, file):
     else:
         return None
     
-def main():
+def main(refresh_pipedrive: bool = False):
 
-    update_pipedrive_data()
+    update_pipedrive_data(force_refresh=refresh_pipedrive)
 
     warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -67,17 +41,15 @@ def main():
     if len(abandoned_calls_files) == 0:
         return 'rc_empty_grab'
 
+    phone_index = load_phone_index()
+
     # Iterate through RC Input Files
     for file in abandoned_calls_files:
-        pipedrive_df = read_pipedrive('data/pipedrive')
-        deal_id_dict = format_pipedrive_data(pipedrive_df)
         rc_df = read_rc_data(abandoned_calls_path, file)
         print("Looking up Deal IDs")
-        rc_df.loc[:, 'phone_number'] = rc_df['ANI'].astype(str)
-        mask_phone = rc_df['phone_number'].astype(str).str.len() == 11
-        rc_df.loc[mask_phone, 'phone_number'] = rc_df.loc[mask_phone, 'phone_number'].astype(str).str[1:].str.strip()
+        rc_df.loc[:, 'phone_number'] = strip_country_code(rc_df['ANI'].astype(str))
         if not rc_df.empty:
-            assign_deal_id(rc_df, deal_id_dict, file)
+            assign_deal_id(rc_df, phone_index, file)
 
     print("Process Complete")
 
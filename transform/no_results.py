@@ -1,4 +1,6 @@
 import pandas as pd
+from misc.phone_keys import to_phone_numbers
+from transform.column_builders import activity_note_column, marketing_medium_column, assigned_user_column
 
 
 def add_deal_title(no_result_final_df: pd.DataFrame) -> pd.DataFrame:
@@ -71,22 +73,7 @@ def add_marketing_medium(no_result_final_df: pd.DataFrame) -> pd.DataFrame:
         `no_result_final_df (pd.DataFrame)` - Reference variable for a Pandas DataFrame with added `Deal - Marketing Medium` column.\n
     '''
 
-    # Apply pandas function and assign to column
-
-    def marketing_medium(row):
-        team = row.get('Team')
-
-        if team in ('Ringless Voicemail - LG', 'RVM - LG'):
-            return 'RVM'
-        elif team == 'Call Center':
-            return 'Direct Mail'
-        elif team in ('Lead Generation', 'LG'):
-            return 'Cold Call'
-        else:
-            return 'Direct Mail'
-
-    # Apply pandas function and assign to column
-    no_result_final_df['Deal - Marketing Medium'] = no_result_final_df.apply(marketing_medium, axis=1)
+    no_result_final_df['Deal - Marketing Medium'] = marketing_medium_column(no_result_final_df)
 
     return no_result_final_df
 
@@ -156,43 +143,11 @@ def add_constant_columns(no_result_final_df: pd.DataFrame) -> pd.DataFrame:
     no_result_final_df['Person - Phone 1'] = no_result_final_df['phone_number']
     no_result_final_df['Person - Phone 1 - Data Source'] = 'Mineral Owner'
     no_result_final_df['Person - Timezone'] = ''
-    no_result_final_df['Assigned to user'] = no_result_final_df.apply(
-        lambda x: 'Jannin' if x['Team Member 2'] in ['Anna Grace Tayag', 'Jude Gella', 'Marketing Team', 'Your Number'] 
-        or pd.isna(x['Team Member 2']) 
-        else x['Team Member 2'], 
-        axis=1
-    )
-    no_result_final_df.loc[no_result_final_df['Assigned to user'].str.contains('keena', case=False, na=False), 'Assigned to user'] = 'Jannin'
+    no_result_final_df['Assigned to user'] = assigned_user_column(no_result_final_df)
     no_result_final_df['Done'] = 'To do'
     no_result_final_df['Type'] = 'Call'
 
-    def build_activity_note(row):
-        data_source = row.get('Data Source')
-        from_number = row.get('phone_number')
-        contact_time = row.get('Contact Time')
-
-        if data_source == 'JC Call':
-            return f"JC abandoned call from {from_number} on {contact_time}"
-
-        if data_source == 'RC Call':
-            return f"RC abandoned call from {from_number} on {contact_time}"
-
-        # fallback (existing behavior)
-        if pd.notna(row.get('Text')):
-            return (
-                f"{data_source}\n\n{row.get('Text')}\n\n"
-                f"Date and Time: {contact_time}\n\n"
-                f"Team Member (Recipient): {row.get('Team Member 2')}"
-            )
-
-        return (
-            "Note: the content of this text is empty\n\n"
-            f"Date and Time: {contact_time}\n\n"
-            f"Team Member (Recipient): {row.get('Team Member 2')}"
-        )
-
-
-    no_result_final_df['Activity note'] = no_result_final_df.apply(build_activity_note, axis=1)
+    no_result_final_df['Activity note'] = activity_note_column(no_result_final_df, 'phone_number')
     # no_result_final_df['Activity note'] = no_result_final_df.apply(
     #     lambda row: f"{row['Text']}\n\nDate and Time: {row['Contact Time']}\n\nTeam Member (Recipient): {row['Team Member 2']}" if pd.notna(row['Text']) else f"Note: the content of this text is empty\n\nDate and Time: {row['Contact Time']}\n\nTeam Member (Recipient): {row['Team Member 2']}",
     #     axis = 1)
@@ -299,7 +254,7 @@ def create_no_result(cm_db_no_result: pd.DataFrame,
 
     # For 'From' column
     mask_from = select_cols_df['From'].astype(str).str.len() == 11
-    select_cols_df.loc[mask_from, 'From'] = select_cols_df.loc[mask_from, 'From'].astype(str).str[1:].astype('Int64')
+    select_cols_df.loc[mask_from, 'From'] = to_phone_numbers(select_cols_df.loc[mask_from, 'From'].astype(str).str[1:])
     merged_df = no_result_final_df.merge(select_cols_df, left_on='phone_number', right_on='From', how='left')
 
     added_deal_title_df = add_deal_title(merged_df)
@@ -0,0 +1,578 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+'''
+This module contains the read path of the Bottoms Up Database.\n
+The database file is opened read-only and memory-mapped. Only the columns the enrichment uses are
+selected, with fixed types. Every run reads the few lookup columns of all rows, and reads the rest
+of a row only for the IDs that matched an ANI Number.\n
+The columns are compiled once into an Arrow file next to the database file, which later runs
+memory-map instead of reading SQLite, so concurrent runs share its pages. Every build writes a new
+Arrow file, so a file another run still maps is never replaced. Phone numbers are looked up
+in a phone index kept next to the database file as well. Both files are built again only when the
+database file changed. Serial numbers are looked up in a serial index built once from
+the lookup columns of each table.\n
+'''
+
+BOTTOMS_UP_TABLE = 'bottoms_up'
+
+# Columns of the database used by the enrichment and their names in the enrichment
+BOTTOMS_UP_COLUMNS = {
+    'id': 'id',
+    'First Name': 'first_name',
+    'Middle Name': 'middle_name',
+    'Last Name': 'last_name',
+    'Input: Address': 'address',
+    'Input: City': 'city',
+    'Input: State': 'state',
+    'Input: Zip Code': 'postal_code',
+    'County': 'target_county',
+    'State': 'target_state',
+    'Serial Number': 'serial_number',
+    'contact_group_id': 'contact_group_id',
+    'sum_of_all_offers': 'sum_of_all_offers',
+    **{f'email{slot}': f'email{slot}' for slot in range(1, 6)},
+    **{f'phone{slot}': f'phone{slot}' for slot in range(1, 6)}
+}
+
+PHONE_COLUMNS = [f'phone{slot}' for slot in range(1, 6)]
+
+# Columns read for every row, to group serial numbers
+LOOKUP_COLUMNS = ['id', 'serial_number', 'contact_group_id', 'sum_of_all_offers']
+
+# Phone index and columns cache state of a database file, in files next to it. The state names the
+# Arrow file of the current build.
+PHONE_INDEX_SUFFIX = '.phone_index.sqlite'
+COLUMNS_CACHE_SUFFIX = '.columns.json'
+
+# Bytes of the database file SQLite reads through a memory map instead of read calls
+BOTTOMS_UP_MMAP_SIZE = 1 << 30
+
+# IDs or phone numbers bound to one query, below SQLite's limit of bound parameters
+ROWS_BATCH_SIZE = 900
+
+
+def connect_read_only(path: str) -> sqlite3.Connection:
+    '''
+    Opens the Bottoms Up Database read-only, with the file memory-mapped.\n
+
+    Parameters:
+        `path (str)` - Path of the database file.\n
+
+    Return:
+        `connection (sqlite3.Connection)` - Read-only connection to the database.\n
+    '''
+
+    connection = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    connection.execute(f"PRAGMA mmap_size = {BOTTOMS_UP_MMAP_SIZE}")
+
+    return connection
+
+def _cast_columns(df: pd.DataFrame) -> pd.DataFrame:
+
+    # Phone numbers are compared as integers, values that are not numbers never match
+    for column in df.columns.intersection(PHONE_COLUMNS):
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+
+    if 'sum_of_all_offers' in df.columns:
+        df['sum_of_all_offers'] = pd.to_numeric(df['sum_of_all_offers'], errors='coerce').astype('float64')
+
+    return df
+
+def read_bottoms_up_columns(connection: sqlite3.Connection, columns: list, ids: 'list | None' = None) -> pd.DataFrame:
+    '''
+    Reads columns of the Bottoms Up Database, by their names in the enrichment.\n
+
+    Parameters:
+        `connection (sqlite3.Connection)` - Connection to the database.\n
+        `columns (list)` - Columns to read, e.g. `LOOKUP_COLUMNS`. Columns the database does not have are read as empty.\n
+        `ids (list | None)` - IDs of the rows to read. Every row is read if `None`.\n
+
+    Return:
+        `df (pd.DataFrame)` - Rows of the database with the requested columns.\n
+    '''
+
+    database_columns = {name: column for column, name in BOTTOMS_UP_COLUMNS.items()}
+    existing_columns = {row[1] for row in connection.execute(f'PRAGMA table_info("{BOTTOMS_UP_TABLE}")')}
+    select_list = ', '.join(f'"{database_columns[name]}" AS "{name}"' if database_columns[name] in existing_columns
+                            else f'NULL AS "{name}"'
+                            for name in columns)
+    query = f'SELECT {select_list} FROM "{BOTTOMS_UP_TABLE}"'
+
+    if ids is None:
+        return _cast_columns(pd.read_sql_query(query, connection))
+
+    # One query per batch of IDs, an empty list still runs once so the result keeps its columns
+    ids = [int(row_id) for row_id in ids]
+    batches = [ids[start:start + ROWS_BATCH_SIZE] for start in range(0, len(ids), ROWS_BATCH_SIZE)] or [[]]
+    df = pd.concat([pd.read_sql_query(f"{query} WHERE id IN ({', '.join('?' * len(batch))})", connection, params=batch)
+                    for batch in batches],
+                   ignore_index=True)
+
+    return _cast_columns(df)
+
+def _file_checksum(path: str) -> str:
+
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as database_file:
+        for block in iter(lambda: database_file.read(1 << 20), b''):
+            checksum.update(block)
+
+    return checksum.hexdigest()
+
+def database_fingerprint(path: str, state: dict) -> 'tuple[dict, str]':
+    '''
+    Compares a database file with the fingerprint a file built from it was stored with. The checksum
+    is only computed when the size or modification time differ.\n
+
+    Parameters:
+        `path (str)` - Path of the database file.\n
+        `state (dict)` - Stored `size`, `mtime_ns` and `sha256`, empty if there is none.\n
+
+    Return:
+        `fingerprint (dict)` - Size, modification time and checksum of the database file.\n
+        `status (str)` - `same` if the file is unchanged, `touched` if only its size or time changed, `changed` otherwise.\n
+    '''
+
+    database_stat = os.stat(path)
+    fingerprint = {'size': database_stat.st_size, 'mtime_ns': database_stat.st_mtime_ns}
+
+    if state and all(state.get(key) == value for key, value in fingerprint.items()) and 'sha256' in state:
+        return {**fingerprint, 'sha256': state['sha256']}, 'same'
+
+    fingerprint['sha256'] = _file_checksum(path)
+
+    return fingerprint, 'touched' if state.get('sha256') == fingerprint['sha256'] else 'changed'
+
+def _read_index_state(index_path: str) -> dict:
+
+    try:
+        connection = connect_read_only(index_path)
+        try:
+            return {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM index_state")}
+        finally:
+            connection.close()
+
+    except sqlite3.Error:
+        return {}
+
+def build_phone_index(path: str, fingerprint: dict, index_path: 'str | None' = None) -> None:
+    '''
+    Builds the phone index of a Bottoms Up Database: one row per phone number slot that holds a number.
+    The index is written next to the old one and moved over it when complete.\n
+
+    Parameters:
+        `path (str)` - Path of the database file.\n
+        `fingerprint (dict)` - Size, modification time and checksum of the database file.\n
+        `index_path (str | None)` - Path of the index file, next to the database file if `None`.\n
+    '''
+
+    index_path = index_path or f"{path}{PHONE_INDEX_SUFFIX}"
+
+    connection = connect_read_only(path)
+    try:
+        phones_df = read_bottoms_up_columns(connection, ['id'] + PHONE_COLUMNS)
+    finally:
+        connection.close()
+
+    # Slot and position keep the order of the phone columns and rows, the order matches were found in
+    phones_df['position'] = range(len(phones_df))
+    melted = phones_df.melt(id_vars=['id', 'position'], value_vars=PHONE_COLUMNS, var_name='slot', value_name='phone')
+    melted = melted[melted['phone'].notna()]
+    melted['slot'] = melted['slot'].str.removeprefix('phone').astype('int64')
+
+    temp_path = f"{index_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    index_connection = sqlite3.connect(temp_path)
+    try:
+        index_connection.execute("CREATE TABLE bottoms_up_phones (phone INTEGER NOT NULL, slot INTEGER, position INTEGER, id INTEGER)")
+        index_connection.executemany("INSERT INTO bottoms_up_phones VALUES (?, ?, ?, ?)",
+                                     zip(melted['phone'].astype('int64').tolist(),
+                                         melted['slot'].tolist(),
+                                         melted['position'].tolist(),
+                                         melted['id'].tolist()))
+        index_connection.execute("CREATE INDEX bottoms_up_phones_phone ON bottoms_up_phones (phone)")
+        index_connection.execute("CREATE TABLE index_state (key TEXT PRIMARY KEY, value TEXT)")
+        index_connection.executemany("INSERT INTO index_state VALUES (?, ?)",
+                                     [(key, json.dumps(value)) for key, value in fingerprint.items()])
+        index_connection.commit()
+    finally:
+        index_connection.close()
+
+    os.replace(temp_path, index_path)
+
+def ensure_phone_index(path: str, index_path: 'str | None' = None) -> str:
+    '''
+    Makes sure the phone index matches the Bottoms Up Database. A database file with the size and
+    modification time of the index is used as it is. Otherwise its checksum is compared, and the
+    index is only built again if the content changed.\n
+
+    Parameters:
+        `path (str)` - Path of the database file.\n
+        `index_path (str | None)` - Path of the index file, next to the database file if `None`.\n
+
+    Return:
+        `index_path (str)` - Path of the up to date index file.\n
+    '''
+
+    index_path = index_path or f"{path}{PHONE_INDEX_SUFFIX}"
+    state = _read_index_state(index_path) if os.path.exists(index_path) else {}
+    fingerprint, status = database_fingerprint(path, state)
+
+    if status == 'same':
+        return index_path
+
+    if status == 'touched':
+        # Same content, e.g. a copied file, only the stored size and time are updated
+        connection = sqlite3.connect(index_path)
+        try:
+            connection.executemany("INSERT OR REPLACE INTO index_state VALUES (?, ?)",
+                                   [(key, json.dumps(value)) for key, value in fingerprint.items()])
+            connection.commit()
+        finally:
+            connection.close()
+
+        return index_path
+
+    print('Building Bottoms Up phone index.')
+    build_phone_index(path, fingerprint, index_path)
+
+    return index_path
+
+def find_phones(index_path: str, phones: pd.Series) -> pd.DataFrame:
+    '''
+    Looks up phone numbers in a phone index.\n
+
+    Parameters:
+        `index_path (str)` - Path of the index file.\n
+        `phones (pd.Series)` - `Int64` phone numbers.\n
+
+    Return:
+        `matches_df (pd.DataFrame)` - `id`, `phone_type` and `phone_number` of every slot holding one of the numbers, in phone column then row order.\n
+    '''
+
+    phone_numbers = [int(phone) for phone in phones.dropna().unique()]
+    batches = [phone_numbers[start:start + ROWS_BATCH_SIZE] for start in range(0, len(phone_numbers), ROWS_BATCH_SIZE)] or [[]]
+
+    connection = connect_read_only(index_path)
+    try:
+        matches_df = pd.concat([pd.read_sql_query(f"SELECT id, slot, position, phone FROM bottoms_up_phones "
+                                                  f"WHERE phone IN ({', '.join('?' * len(batch))})",
+                                                  connection,
+                                                  params=batch)
+                                for batch in batches],
+                               ignore_index=True)
+    finally:
+        connection.close()
+
+    matches_df = matches_df.sort_values(['slot', 'position'], kind='stable', ignore_index=True)
+
+    return pd.DataFrame({
+        'id': matches_df['id'].astype('int64'),
+        'phone_type': 'phone' + matches_df['slot'].astype(str),
+        'phone_number': matches_df['phone'].astype('Int64')
+    })
+
+
+def _columns_cache_file(cache_path: str, name: str) -> str:
+
+    return os.path.join(os.path.dirname(cache_path), name)
+
+def _read_columns_cache_state(cache_path: str) -> dict:
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as state_file:
+            state = json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
+    # A state whose Arrow file is gone is compiled again
+    if not isinstance(state, dict) or not os.path.exists(_columns_cache_file(cache_path, state.get('file', ''))):
+        return {}
+
+    return state
+
+def _write_columns_cache_state(cache_path: str, state: dict) -> None:
+
+    # The state file is never mapped, so it can always be replaced
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as state_file:
+        json.dump(state, state_file)
+    os.replace(temp_path, cache_path)
+
+def _remove_old_columns_caches(cache_path: str, keep: set) -> None:
+
+    prefix = os.path.basename(cache_path).removesuffix('.json') + '.'
+    for name in os.listdir(os.path.dirname(cache_path) or '.'):
+        if name.startswith(prefix) and name.endswith('.arrow') and name not in keep:
+            try:
+                os.remove(_columns_cache_file(cache_path, name))
+            except OSError:
+                # Still mapped by a running lookup on Windows, removed by a later build
+                pass
+
+def _map_columns_cache(cache_path: str, state: dict) -> pa.Table:
+
+    return pa.ipc.open_file(pa.memory_map(_columns_cache_file(cache_path, state['file']))).read_all()
+
+def build_columns_cache(path: str, fingerprint: dict, cache_path: 'str | None' = None) -> 'dict | None':
+    '''
+    Compiles the columns the enrichment uses, renamed and typed, into a new Arrow file next to the
+    Bottoms Up Database and switches the state file to it. A file that may still be mapped is never
+    replaced: the previous file is kept until the next build, older files are removed.\n
+
+    Parameters:
+        `path (str)` - Path of the database file.\n
+        `fingerprint (dict)` - Size, modification time and checksum of the database file.\n
+        `cache_path (str | None)` - Path of the state file, next to the database file if `None`.\n
+
+    Return:
+        `state (dict | None)` - Fingerprint and Arrow file of the cache, `None` if a column holds values Arrow can not store.\n
+    '''
+
+    cache_path = cache_path or f"{path}{COLUMNS_CACHE_SUFFIX}"
+
+    connection = connect_read_only(path)
+    try:
+        rows_df = read_bottoms_up_columns(connection, list(BOTTOMS_UP_COLUMNS.values()))
+    finally:
+        connection.close()
+
+    try:
+        table = pa.Table.from_pandas(rows_df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # Columns of mixed types would change when stored, those databases are read from SQLite
+        print(f"Bottoms Up columns are not cached: {e}")
+        return None
+
+    # Each build gets a file of its own, so the name of a mapped file is never written to
+    name = f"{os.path.basename(cache_path).removesuffix('.json')}.{fingerprint['sha256'][:16]}.{time.time_ns()}.arrow"
+    cache_file = _columns_cache_file(cache_path, name)
+    temp_path = f"{cache_file}.{os.getpid()}.tmp"
+
+    # Uncompressed, so the columns can be used straight from the memory map
+    try:
+        with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temp_path, cache_file)
+
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    previous_file = _read_columns_cache_state(cache_path).get('file')
+    state = {**fingerprint, 'file': name}
+    _write_columns_cache_state(cache_path, state)
+    _remove_old_columns_caches(cache_path, {name, previous_file})
+
+    return state
+
+def open_columns_cache(path: str, cache_path: 'str | None' = None) -> 'pa.Table | None':
+    '''
+    Memory-maps the columns cache of a Bottoms Up Database, compiling it first if it does not match
+    the database file. A database file with the size and modification time of the cache is used as
+    it is, otherwise the cache is only compiled again if the checksum changed.\n
+
+    Parameters:
+        `path (str)` - Path of the database file.\n
+        `cache_path (str | None)` - Path of the state file, next to the database file if `None`.\n
+
+    Return:
+        `table (pa.Table | None)` - Columns of every row, `None` if the database can not be cached.\n
+    '''
+
+    cache_path = cache_path or f"{path}{COLUMNS_CACHE_SUFFIX}"
+    state = _read_columns_cache_state(cache_path)
+    fingerprint, status = database_fingerprint(path, state)
+
+    try:
+        if status == 'touched':
+            # Same content, e.g. a copied file, only the stored size and time are updated
+            state = {**fingerprint, 'file': state['file']}
+            _write_columns_cache_state(cache_path, state)
+
+        elif status == 'changed':
+            print('Compiling Bottoms Up columns cache.')
+            state = build_columns_cache(path, fingerprint, cache_path)
+            if state is None:
+                return None
+
+    except OSError as e:
+        print(f"Could not update Bottoms Up columns cache: {e}")
+        if status != 'touched':
+            print('Reading Bottoms Up columns from the database file.')
+            return None
+
+    try:
+        return _map_columns_cache(cache_path, state)
+
+    except (pa.ArrowInvalid, OSError) as e:
+        print(f"Could not read Bottoms Up columns cache, reading the database file instead: {e}")
+        return None
+
+def _format_contact_group_id(value) -> str:
+
+    if pd.isna(value):
+        return ""
+
+    return str(int(value)) if isinstance(value, (float, int)) else str(value)
+
+def build_serial_index(lookup_df: pd.DataFrame) -> 'tuple[pd.DataFrame, pd.DataFrame]':
+    '''
+    Groups the rows of the Bottoms Up Database by serial number. Serial numbers are compared as
+    trimmed strings.\n
+
+    Parameters:
+        `lookup_df (pd.DataFrame)` - `LOOKUP_COLUMNS` of every row.\n
+
+    Return:
+        `serial_ids_df (pd.DataFrame)` - `serial_key` and `id` as a string of every row with an ID, in row order.\n
+        `serial_groups_df (pd.DataFrame)` - First `contact_group_id` and `sum_of_all_offers` of every serial, indexed by `serial_key`.
+        Offers are summed once per contact group, or over all rows if the serial has no contact group.\n
+    '''
+
+    serial_keys = lookup_df['serial_number'].astype(str).str.strip()
+
+    has_id = lookup_df['id'].notna()
+    serial_ids_df = pd.DataFrame({
+        'serial_key': serial_keys[has_id],
+        'id': lookup_df.loc[has_id, 'id'].astype(str)
+    }).reset_index(drop=True)
+
+    keyed_df = pd.DataFrame({
+        'serial_key': serial_keys,
+        'contact_group_id': lookup_df['contact_group_id'],
+        'sum_of_all_offers': lookup_df['sum_of_all_offers']
+    })
+    serials = keyed_df.groupby('serial_key', sort=False)
+
+    # Rows without a contact group count as one more group
+    group_offers = keyed_df.drop_duplicates(['serial_key', 'contact_group_id']) \
+        .groupby('serial_key', sort=False)['sum_of_all_offers'].sum()
+    all_offers = serials['sum_of_all_offers'].sum()
+    has_group = serials['contact_group_id'].count() > 0
+
+    serial_groups_df = pd.DataFrame({
+        'contact_group_id': serials['contact_group_id'].first().map(_format_contact_group_id),
+        'sum_of_all_offers': group_offers.where(has_group, all_offers)
+    })
+
+    return serial_ids_df, serial_groups_df
+
+class BottomsUpTable:
+    '''
+    Bottoms Up rows used by the enrichment. The lookup columns of every row are held in memory, phone
+    numbers are looked up in the phone index, and the other columns are read from the columns cache,
+    the database file or a snapshot for the matched IDs only.\n
+    '''
+
+    def __init__(self, path: 'str | None' = None, rows_df: 'pd.DataFrame | None' = None):
+
+        self.path = path
+        self._rows_df = rows_df
+        self._columns = None
+        self._serial_index = None
+
+        if rows_df is not None:
+            self.lookup_df = rows_df[LOOKUP_COLUMNS]
+            return
+
+        self.phone_index_path = ensure_phone_index(path)
+        self._columns = open_columns_cache(path)
+
+        if self._columns is not None:
+            self.lookup_df = self._columns.select(LOOKUP_COLUMNS).to_pandas()
+        else:
+            connection = connect_read_only(path)
+            try:
+                self.lookup_df = read_bottoms_up_columns(connection, LOOKUP_COLUMNS)
+            finally:
+                connection.close()
+
+    def find_phones(self, phones: pd.Series) -> pd.DataFrame:
+        '''
+        Finds the rows holding the given phone numbers in one of their phone columns.\n
+
+        Parameters:
+            `phones (pd.Series)` - `Int64` phone numbers, e.g. ANI Numbers.\n
+
+        Return:
+            `matches_df (pd.DataFrame)` - `id`, `phone_type` and `phone_number` of every match, in phone column then row order.\n
+        '''
+
+        if self._rows_df is None:
+            return find_phones(self.phone_index_path, phones)
+
+        # A snapshot has no phone index, its phone columns are searched directly
+        melted = pd.melt(self._rows_df, id_vars=['id'], value_vars=PHONE_COLUMNS, var_name='phone_type', value_name='phone_number')
+
+        return melted[melted['phone_number'].isin(phones.dropna())].reset_index(drop=True)
+
+    def serial_index(self) -> 'tuple[pd.DataFrame, pd.DataFrame]':
+        '''
+        Returns the serial index of the table, built on first use.\n
+
+        Return:
+            `serial_ids_df (pd.DataFrame)` - `serial_key` and `id` of every row, see `build_serial_index`.\n
+            `serial_groups_df (pd.DataFrame)` - Contact group and offers of every serial, see `build_serial_index`.\n
+        '''
+
+        if self._serial_index is None:
+            self._serial_index = build_serial_index(self.lookup_df)
+
+        return self._serial_index
+
+    def rows(self, ids) -> pd.DataFrame:
+        '''
+        Reads every column the enrichment uses for rows of the given IDs.\n
+
+        Parameters:
+            `ids` - IDs of the rows.\n
+
+        Return:
+            `rows_df (pd.DataFrame)` - Rows with the `BOTTOMS_UP_COLUMNS` columns.\n
+        '''
+
+        if self._rows_df is not None:
+            return self._rows_df[self._rows_df['id'].isin(ids)]
+
+        if self._columns is not None:
+            ids = pa.array([int(row_id) for row_id in ids], type=pa.int64()).cast(self._columns.schema.field('id').type)
+            return self._columns.filter(pc.is_in(self._columns['id'], value_set=ids)).to_pandas()
+
+        connection = connect_read_only(self.path)
+        try:
+            return read_bottoms_up_columns(connection, list(BOTTOMS_UP_COLUMNS.values()), ids)
+        finally:
+            connection.close()
+
+    def all_rows(self) -> pd.DataFrame:
+        '''
+        Reads every column the enrichment uses for all rows, e.g. to save a snapshot.\n
+
+        Return:
+            `rows_df (pd.DataFrame)` - Rows with the `BOTTOMS_UP_COLUMNS` columns.\n
+        '''
+
+        if self._rows_df is not None:
+            return self._rows_df
+
+        if self._columns is not None:
+            return self._columns.to_pandas()
+
+        connection = connect_read_only(self.path)
+        try:
+            return read_bottoms_up_columns(connection, list(BOTTOMS_UP_COLUMNS.values()))
+        finally:
+            connection.close()
@@ -0,0 +1,109 @@
+import math
+import warnings
+import concurrent.futures
+import pandas as pd
+from sqlalchemy import text
+
+
+'''
+This module contains the parallel extraction of the Community Minerals Database queries.\n
+Every query is split into partitions of contact ID ranges. The partitions of all queries are read
+concurrently over the engine's connection pool, each with a server-side cursor that hands the rows
+over in chunks, so no partition is ever buffered whole on the client before it becomes a DataFrame.\n
+'''
+
+# Contact IDs per partition and partitions read at the same time
+PARTITION_SIZE = 100000
+EXTRACT_WORKERS = 4
+
+# Rows per chunk read from a server-side cursor
+EXTRACT_CHUNK_SIZE = 20000
+
+CONTACT_ID_BOUNDS_QUERY = 'SELECT MIN(id) AS id_low, MAX(id) AS id_high FROM contacts WHERE deleted_at IS NULL;'
+
+
+def add_id_range(query: str) -> str:
+    '''
+    Limits a contacts query to the contact IDs between `:id_low` and `:id_high`.\n
+
+    Parameters:
+        `query (str)` - Query on `contacts c` that filters `c.deleted_at IS NULL` once.\n
+
+    Return:
+        `query (str)` - Query with the ID range added next to the contacts filter.\n
+    '''
+
+    # Subqueries have WHERE clauses of their own, the range goes next to the filter of the outer contacts
+    if query.count('c.deleted_at IS NULL') != 1:
+        raise ValueError("Only queries that filter c.deleted_at once can be partitioned")
+
+    return query.replace('c.deleted_at IS NULL', 'c.id BETWEEN :id_low AND :id_high AND\n        c.deleted_at IS NULL', 1)
+
+def id_partitions(engine, partition_size: int = PARTITION_SIZE) -> list:
+    '''
+    Splits the contact IDs into ranges of `partition_size` IDs.\n
+
+    Parameters:
+        `engine` - SQLAlchemy engine of the Community Minerals Database.\n
+        `partition_size (int)` - Contact IDs per range.\n
+
+    Return:
+        `partitions (list)` - `(id_low, id_high)` of each range, in ID order.\n
+    '''
+
+    with engine.connect() as connection:
+        id_low, id_high = connection.execute(text(CONTACT_ID_BOUNDS_QUERY)).one()
+
+    if id_low is None:
+        return [(0, 0)]
+
+    partition_count = math.ceil((id_high - id_low + 1) / partition_size)
+
+    return [(id_low + index * partition_size, min(id_low + (index + 1) * partition_size - 1, id_high))
+            for index in range(partition_count)]
+
+def _read_partition(engine, query: str, id_low: int, id_high: int) -> pd.DataFrame:
+
+    with engine.connect().execution_options(stream_results=True) as connection:
+        chunks = list(pd.read_sql_query(text(query),
+                                        connection,
+                                        params={'id_low': id_low, 'id_high': id_high},
+                                        chunksize=EXTRACT_CHUNK_SIZE))
+
+    return pd.concat(chunks, ignore_index=True)
+
+def _join_partitions(partition_dfs: list) -> pd.DataFrame:
+
+    # Empty partitions are left out, their untyped columns would turn e.g. deal_id into objects
+    non_empty_dfs = [partition_df for partition_df in partition_dfs if not partition_df.empty] or partition_dfs[:1]
+
+    # A partition whose values are all NULL in a column still reads it as objects, type the joined column again
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        return pd.concat(non_empty_dfs, ignore_index=True).infer_objects()
+
+def extract_cm_tables(engine,
+                      queries: list,
+                      workers: int = EXTRACT_WORKERS,
+                      partition_size: int = PARTITION_SIZE) -> list:
+    '''
+    Runs the Community Minerals Database queries concurrently, each split into contact ID ranges.\n
+
+    Parameters:
+        `engine` - SQLAlchemy engine of the Community Minerals Database, with a pool of at least `workers` connections.\n
+        `queries (list)` - Queries on `contacts c` that filter `c.deleted_at IS NULL` once.\n
+        `workers (int)` - Partitions read at the same time.\n
+        `partition_size (int)` - Contact IDs per partition.\n
+
+    Return:
+        `dfs (list)` - One DataFrame per query, with the partitions in contact ID order.\n
+    '''
+
+    partitions = id_partitions(engine, partition_size)
+    partitioned_queries = [add_id_range(query) for query in queries]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [[executor.submit(_read_partition, engine, query, id_low, id_high) for id_low, id_high in partitions]
+                   for query in partitioned_queries]
+
+        return [_join_partitions([future.result() for future in query_futures]) for query_futures in futures]
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from misc.sql_queries import phone_number_query, email_address_query, serial_numbers_query, cm_db_query
+
+
+'''
+This module contains the local mirror of the Community Minerals database tables the tool reads.\n
+The first sync copies every table into a SQLite file. Later syncs only copy rows whose `updated_at`
+is at most `MIRROR_WATERMARK_OVERLAP_SECONDS` before the newest `updated_at` already mirrored and
+upsert them by `id`. Soft deleted rows come along with their `deleted_at`, so the usual queries (which
+filter on `deleted_at`) can run against the mirror unchanged. Rows removed outright in MySQL are only
+dropped by the periodic full reload.\n
+Every sync also stores the results of the Community Minerals queries in tables of the mirror, so a
+run reads finished tables instead of aggregating every contact again.\n
+'''
+
+CM_MIRROR_PATH = './data/database/cm_db/cm_mirror.sqlite'
+
+# Rows copied from MySQL per round trip
+MIRROR_CHUNK_SIZE = 50000
+
+# Rows committed late with an earlier `updated_at`, e.g. by long transactions or app servers whose clocks
+# differ, are read again if they are at most this far behind the watermark
+MIRROR_WATERMARK_OVERLAP_SECONDS = 600
+
+# Mirrored tables and their columns. Every table has an `id` primary key and `updated_at`/`deleted_at` timestamps.
+MIRROR_TABLES = {
+    'contacts': ['first_name', 'middle_name', 'last_name', 'deal_id'],
+    'contact_phone_numbers': ['contact_id', 'phone_number'],
+    'contact_email_addresses': ['contact_id', 'email_address'],
+    'contact_serial_numbers': ['contact_id', 'serial_number'],
+    'contact_skip_traced_addresses': ['contact_id', 'address', 'city', 'state', 'postal_code', 'data_source'],
+    'contact_targets': ['contact_id', 'country', 'state']
+}
+
+# Tables of the mirror holding the result of each Community Minerals query
+MIRROR_RESULTS = {
+    'result_phone_numbers': phone_number_query,
+    'result_email_addresses': email_address_query,
+    'result_serial_numbers': serial_numbers_query,
+    'result_cm_db': cm_db_query
+}
+
+
+def _mirror_columns(table: str) -> list:
+    return ['id'] + MIRROR_TABLES[table] + ['updated_at', 'deleted_at']
+
+def _create_tables(connection: sqlite3.Connection) -> None:
+
+    for table in MIRROR_TABLES:
+        columns = ', '.join(_mirror_columns(table)[1:])
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {columns})")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_updated_at ON {table} (updated_at)")
+        if 'contact_id' in MIRROR_TABLES[table]:
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_contact_id ON {table} (contact_id)")
+
+    connection.execute("CREATE TABLE IF NOT EXISTS mirror_state (key TEXT PRIMARY KEY, value TEXT)")
+
+def _read_state(connection: sqlite3.Connection) -> dict:
+
+    return {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM mirror_state")}
+
+def _save_state(connection: sqlite3.Connection, key: str, value) -> None:
+    connection.execute("INSERT OR REPLACE INTO mirror_state (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+def _to_rows(chunk_df: pd.DataFrame) -> list:
+
+    # SQLite takes text timestamps and None for missing values
+    for column in ('updated_at', 'deleted_at'):
+        chunk_df[column] = chunk_df[column].astype(str).where(chunk_df[column].notna(), None)
+
+    return list(chunk_df.astype(object).where(chunk_df.notna(), None).itertuples(index=False, name=None))
+
+def _copy_table(engine, connection: sqlite3.Connection, table: str, watermark: 'str | None') -> 'tuple[int, str | None]':
+    '''
+    Copies the rows of one table that changed at or after `watermark`, every row if `None`.\n
+    '''
+
+    columns = _mirror_columns(table)
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    params = {}
+    if watermark:
+        # Rows are upserted by id, so reading rows again from before the watermark is safe
+        since = pd.Timestamp(watermark) - pd.Timedelta(seconds=MIRROR_WATERMARK_OVERLAP_SECONDS)
+        query += " WHERE updated_at >= :since"
+        params['since'] = since.strftime('%Y-%m-%d %H:%M:%S')
+
+    upsert = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    row_count = 0
+
+    # Stream the result in chunks instead of loading the whole table on the client
+    with engine.connect().execution_options(stream_results=True) as mysql_connection:
+        for chunk_df in pd.read_sql_query(text(query),
+                                          mysql_connection,
+                                          params=params,
+                                          chunksize=MIRROR_CHUNK_SIZE):
+            connection.executemany(upsert, _to_rows(chunk_df))
+            row_count += len(chunk_df)
+
+    newest = connection.execute(f"SELECT MAX(updated_at) FROM {table}").fetchone()[0]
+
+    return row_count, newest or watermark
+
+def _materialize_results(connection: sqlite3.Connection) -> None:
+
+    for result_table, query in MIRROR_RESULTS.items():
+        connection.execute(f"DROP TABLE IF EXISTS {result_table}")
+        connection.execute(f"CREATE TABLE {result_table} AS {query.strip().rstrip(';')}")
+
+def sync_cm_mirror(engine, path: str = CM_MIRROR_PATH, full_reload_days: float = 7) -> None:
+    '''
+    Brings the local mirror up to date with the Community Minerals database. The mirror is loaded
+    from scratch if it does not exist yet or its last full load is older than `full_reload_days`.\n
+
+    Parameters:
+        `engine` - SQLAlchemy engine of the Community Minerals database.\n
+        `path (str)` - Path of the mirror file.\n
+        `full_reload_days (float)` - Days after which the mirror is loaded from scratch, to drop rows deleted outright.\n
+    '''
+
+    state = {}
+    if os.path.exists(path):
+        connection = sqlite3.connect(path)
+        try:
+            _create_tables(connection)
+            state = _read_state(connection)
+        finally:
+            connection.close()
+
+    full_reload = time.time() - state.get('full_load_at', 0) >= full_reload_days * 86400
+
+    # A full load is written next to the mirror and moved over it when complete, so readers keep
+    # the old mirror until then
+    target_path = f"{path}.tmp" if full_reload else path
+    if full_reload and os.path.exists(target_path):
+        os.remove(target_path)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(target_path)
+
+    try:
+        _create_tables(connection)
+        watermarks = {} if full_reload else state.get('watermarks', {})
+
+        for table in MIRROR_TABLES:
+            row_count, watermarks[table] = _copy_table(engine, connection, table, watermarks.get(table))
+            print(f"Mirrored {row_count} {'' if full_reload else 'changed '}rows of {table}")
+
+        _materialize_results(connection)
+
+        _save_state(connection, 'watermarks', watermarks)
+        _save_state(connection, 'full_load_at', time.time() if full_reload else state['full_load_at'])
+        _save_state(connection, 'synced_at', time.time())
+
+        # Each sync is one transaction, an interrupted sync leaves the previous state untouched
+        connection.commit()
+
+    finally:
+        connection.close()
+
+    if full_reload:
+        os.replace(target_path, path)
+
+def mirror_synced_at(path: str = CM_MIRROR_PATH) -> 'float | None':
+    '''
+    Returns when the local mirror was last synced.\n
+
+    Parameters:
+        `path (str)` - Path of the mirror file.\n
+
+    Return:
+        `synced_at (float | None)` - Unix time of the last successful sync, `None` if there is no mirror.\n
+    '''
+
+    if not os.path.exists(path):
+        return None
+
+    connection = sqlite3.connect(path)
+    try:
+        _create_tables(connection)
+        return _read_state(connection).get('synced_at')
+    finally:
+        connection.close()
+
+def read_cm_mirror(path: str = CM_MIRROR_PATH) -> 'tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]':
+    '''
+    Reads the results of the Community Minerals queries stored in the local mirror by the last sync.
+    A mirror synced by an older version, without those tables, runs the queries instead.\n
+
+    Parameters:
+        `path (str)` - Path of the mirror file.\n
+
+    Return:
+        `phone_number_df (pd.DataFrame)` - Phone numbers of every contact.\n
+        `email_address_df (pd.DataFrame)` - Email addresses of every contact.\n
+        `serial_numbers_df (pd.DataFrame)` - Serial numbers of every contact joined with " | ".\n
+        `cm_db_df (pd.DataFrame)` - Names, deal ID, first address, address count and targets of every contact, one row each.\n
+    '''
+
+    connection = sqlite3.connect(path)
+
+    try:
+        stored = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        phone_number_df, email_address_df, serial_numbers_df, cm_db_df = [
+            pd.read_sql_query(f"SELECT * FROM {result_table}" if result_table in stored else query, connection)
+            for result_table, query in MIRROR_RESULTS.items()
+        ]
+    finally:
+        connection.close()
+
+    return phone_number_df, email_address_df, serial_numbers_df, cm_db_df
@@ -1,23 +1,157 @@
 import os
 import sys
+import json
+import time
+import queue
+import operator
+import itertools
+import threading
 import concurrent.futures
+from datetime import datetime, timezone
 import requests
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from user_input.pipedrive_client import PipedriveClient, DEFAULT_BASE_URL, PAGE_SIZE
+from user_input.pipedrive_snapshot import (PIPEDRIVE_SNAPSHOT_PATH, LEGACY_SNAPSHOT_PATH, PIPEDRIVE_SCHEMA,
+                                           PIPEDRIVE_COLUMNS, SNAPSHOT_COMPRESSION, to_snapshot_table,
+                                           read_pipedrive_snapshot, write_pipedrive_snapshot)
+from user_input.phone_index import build_phone_index
+
 load_dotenv('misc/.env')
-PIPEDRIVE_API = os.environ['API_KEY']
 
-def get_deal_fields(endpoint):
+# Saved Pipedrive filter that limits full pulls to the relevant pipelines, all deals if not set
+PIPEDRIVE_FILTER_ID = os.environ.get('PIPEDRIVE_FILTER_ID') or None
 
-    url = f"https://communityminerals-f099fc.pipedrive.com/{endpoint}?api_token={PIPEDRIVE_API}"
-    params = {'start': 0, 'limit': 500}
+# Watermark of the local deal store used for incremental syncs
+PIPEDRIVE_SYNC_STATE_PATH = './data/pipedrive_sync/sync_state.json'
+
+# Checkpoint of an interrupted full pull and the snapshot parts it resumes from
+PIPEDRIVE_CHECKPOINT_PATH = './data/pipedrive_sync/full_pull_checkpoint.json'
+PIPEDRIVE_PARTS_PATH = './data/pipedrive_sync/parts'
+
+# Cached dealFields, pipelines and stages lookups, revalidated once they are older than the TTL
+PIPEDRIVE_METADATA_CACHE_PATH = './data/pipedrive_sync/metadata_cache.json'
+METADATA_ENDPOINTS = ['api/v1/dealFields', 'api/v1/pipelines', 'api/v1/stages']
+METADATA_TTL_SECONDS = float(os.environ.get('PIPEDRIVE_METADATA_TTL_HOURS', 24)) * 3600
+PIPEDRIVE_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# A snapshot synced less than this long ago is used without contacting Pipedrive
+PIPEDRIVE_MAX_AGE_SECONDS = float(os.environ.get('PIPEDRIVE_MAX_AGE_MINUTES', 30)) * 60
+
+# Only one sync runs at a time, e.g. the UI prefetch and a tool run started while it is still going
+SYNC_LOCK = threading.Lock()
+
+# Bounds of the queues between the fetch, parse and write stages of a full pull
+PAGE_QUEUE_SIZE = 8
+CHUNK_QUEUE_SIZE = 8
+
+# Deals buffered before a snapshot part is written and the pull is checkpointed
+PART_ROWS = 50000
+
+# Hash keys of the custom deal fields that end up in the snapshot
+DEAL_STATUS_KEY = 'a8b479cb304320c246021ded79cb84243dd67b6f'
+CA_TRACKING_FLAG_KEY = '1ed94338f4ab22269018b9b3f37b0967172c0c20'
+UNIQUE_DATABASE_ID_KEY = 'cf55ab58ba9377b340fe91a7886591cac6cafabd'
+OFFER_READY_DATE_KEY = '9303acb9715bc55f1641f24266d13133b05f8c5d'
+OFFER_READY_SMALL_DATE_KEY = 'de5b9ae6977eac029ca827c10722948055d982e3'
+
+# Plain deal fields, pulled out of each deal in a single call
+DEAL_FIELD_GETTER = operator.itemgetter('id', 'title', 'user_id', 'stage_id', 'pipeline_id', CA_TRACKING_FLAG_KEY,
+                                        UNIQUE_DATABASE_ID_KEY, DEAL_STATUS_KEY, OFFER_READY_DATE_KEY,
+                                        OFFER_READY_SMALL_DATE_KEY)
+PHONE_VALUE_GETTER = operator.itemgetter('value')
+
+# Full pulls only ask for the fields process_data reads instead of whole deal objects
+DEAL_FIELDS = ['id', 'title', 'person_id', 'user_id', 'stage_id', 'pipeline_id', CA_TRACKING_FLAG_KEY,
+               UNIQUE_DATABASE_ID_KEY, DEAL_STATUS_KEY, OFFER_READY_DATE_KEY, OFFER_READY_SMALL_DATE_KEY]
+DEALS_ENDPOINT = f"api/v1/deals:({','.join(DEAL_FIELDS)})"
+
+# Position of 'Person - Phone 1' in the snapshot columns
+PHONE_SLOTS_START = PIPEDRIVE_COLUMNS.index('Person - Phone 1')
+
+
+def pipedrive_connection() -> 'tuple[str, str]':
+    '''
+    Reads the Pipedrive API key and base URL when a sync starts rather than at import, so the module
+    can be imported without credentials and pointed at another host, e.g. a local stand-in server.\n
+
+    Return:
+        `api_key (str)` - Value of `API_KEY`.\n
+        `base_url (str)` - Value of `PIPEDRIVE_BASE_URL`, the public Pipedrive API if not set.\n
+    '''
+
+    api_key = os.environ.get('API_KEY')
+    if not api_key:
+        raise RuntimeError("API_KEY is not set, add it to misc/.env")
+
+    return api_key, os.environ.get('PIPEDRIVE_BASE_URL') or DEFAULT_BASE_URL
 
-    response = requests.get(url=url, params=params)
-    if response.status_code == 200:
-        dict = response.json()
+def read_metadata(client: PipedriveClient, max_age: float = METADATA_TTL_SECONDS) -> dict:
+    '''
+    Returns the dealFields, pipelines and stages lookups from the on-disk metadata cache.\n
+    Entries younger than `max_age` are used as they are. Older entries are revalidated with a
+    conditional request and only downloaded again if they changed. All lookups that need a request
+    are sent concurrently, so a cold cache costs one round trip instead of three.\n
+
+    Parameters:
+        `client (PipedriveClient)` - Client used to request the metadata endpoints.\n
+        `max_age (float)` - Age in seconds after which a cached lookup is revalidated.\n
+
+    Return:
+        `metadata (dict)` - Decoded response body per endpoint, `None` if an endpoint could not be read.\n
+    '''
+
+    try:
+        with open(PIPEDRIVE_METADATA_CACHE_PATH, 'r', encoding='utf-8') as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        cache = {}
+
+    now = time.time()
+    params = {'start': 0, 'limit': 500}
+    stale_endpoints = [endpoint for endpoint in METADATA_ENDPOINTS
+                       if now - cache.get(endpoint, {}).get('fetched_at', 0) >= max_age]
+
+    def revalidate(endpoint: str) -> 'dict | None':
+        entry = cache.get(endpoint, {})
+        body, etag, last_modified = client.get_conditional(endpoint,
+                                                           params,
+                                                           etag=entry.get('etag'),
+                                                           last_modified=entry.get('last_modified'))
+        return {
+            'fetched_at': now,
+            'etag': etag,
+            'last_modified': last_modified,
+            'body': body if body is not None else entry.get('body')
+        }
+
+    if stale_endpoints:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(stale_endpoints)) as executor:
+            futures = {endpoint: executor.submit(revalidate, endpoint) for endpoint in stale_endpoints}
+
+        for endpoint, future in futures.items():
+            try:
+                cache[endpoint] = future.result()
+            except requests.RequestException as e:
+                # Fall back to the expired copy rather than failing the whole sync
+                print(f"Could not refresh {endpoint}: {e}")
+
+        os.makedirs(os.path.dirname(PIPEDRIVE_METADATA_CACHE_PATH), exist_ok=True)
+        temp_path = f"{PIPEDRIVE_METADATA_CACHE_PATH}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temp_path, PIPEDRIVE_METADATA_CACHE_PATH)
+
+    return {endpoint: cache.get(endpoint, {}).get('body') for endpoint in METADATA_ENDPOINTS}
+
+def get_deal_fields(dict):
+
+    if dict is not None:
         ca_tracking_flag_dict = {}
         deal_status_dict = {}
 
@@ -40,14 +174,9 @@ def get_deal_fields(endpoint):
 
         return None, None
     
-def get_pipelines(endpoint):
-
-    url = f"https://communityminerals-f099fc.pipedrive.com/{endpoint}?api_token={PIPEDRIVE_API}"
-    params = {'start': 0, 'limit': 500}
+def get_pipelines(dict):
 
-    response = requests.get(url=url, params=params)
-    if response.status_code == 200:
-        dict = response.json()
+    if dict is not None:
         pipeline_dict = {}
 
         for pipeline in dict['data']:
@@ -60,14 +189,9 @@ def get_pipelines(endpoint):
 
         return None
     
-def get_deal_stages(endpoint):
+def get_deal_stages(dict):
 
-    url = f"https://communityminerals-f099fc.pipedrive.com/{endpoint}?api_token={PIPEDRIVE_API}"
-    params = {'start': 0, 'limit': 500}
-
-    response = requests.get(url=url, params=params)
-    if response.status_code == 200:
-        dict = response.json()
+    if dict is not None:
         stages_dict = {}
 
         for stage in dict['data']:
@@ -80,149 +204,567 @@ def get_deal_stages(endpoint):
 
         return None
 
-def process_data(data):
-
-    row_data_list = []
-
-    for row in data['data']:
-
-        deal_status_final = None
-        deal_status = row['a8b479cb304320c246021ded79cb84243dd67b6f']
-        if deal_status is not None:
-            deal_status_list = deal_status.split(',')
-            deal_status_final = ", ".join(deal_status_dict[id] for id in deal_status_list if id in deal_status_dict)
-
-        ca_tracking_final = None
-        ca_tracking = row['1ed94338f4ab22269018b9b3f37b0967172c0c20']
-        if ca_tracking is not None:
-            ca_tracking_list = ca_tracking.split(',')
-            ca_tracking_final = ", ".join(ca_tracking_flag_dict[id] for id in ca_tracking_list if id in ca_tracking_flag_dict)
-        
-        person_info = row.get('person_id')
-        if person_info:
-            person_id = row['person_id']['value']
-            contact_person = row['person_id']['name']
-            all_phones = {phone['value'].strip() for phone in row['person_id']['phone']}
-            phone_numbers = ", ".join(all_phones) if all_phones else None
-
-            # Create up to 10 individual phone number columns
-            person_phones = []
-            for idx, phone in enumerate(all_phones):
-                if idx < 10:
-                    person_phones.append(phone)
-            # Fill up to 10 slots (pad with None if less than 10)
-            while len(person_phones) < 10:
-                person_phones.append(None)
-        else:
-            person_id = contact_person = phone_numbers = None
-            person_phones = [None] * 10  # 10 empty phone slots if no person_info
-
-        # Create the row data
-        row_data = [
-            row['id'],
-            row['title'],
-            person_id,
-            contact_person,
-            phone_numbers,
-            *person_phones,
-            row['user_id']['name'],
-            stages_dict[row['stage_id']],
-            pipeline_dict[row['pipeline_id']],
-            ca_tracking_final,
-            row['cf55ab58ba9377b340fe91a7886591cac6cafabd'],
-            deal_status_final,
-            row['9303acb9715bc55f1641f24266d13133b05f8c5d'],
-            row['de5b9ae6977eac029ca827c10722948055d982e3']
-        ]
-
-        row_data_list.append(row_data)
-
-        columns = [
-            'Deal - ID',
-            'Deal - Title',
-            'Person - ID',
-            'Deal - Contact person',
-            'phone_number',
-            'Person - Phone 1',
-            'Person - Phone 2',
-            'Person - Phone 3',
-            'Person - Phone 4',
-            'Person - Phone 5',
-            'Person - Phone 6',
-            'Person - Phone 7',
-            'Person - Phone 8',
-            'Person - Phone 9',
-            'Person - Phone 10',
-            'Deal - Owner',
-            'Deal - Stage',
-            'Deal - Pipeline',
-            'Deal - CA Tracking Flag',
-            'Deal - Unique Database ID',
-            'Deal - Deal Status',
-            'Deal - Offer Ready Date',
-            'Deal - Offer Ready - Small Date'
-        ]
-
-    pipedrive_df = pd.DataFrame(row_data_list, columns=columns)
+def _decode_options(values: tuple, labels: dict) -> np.ndarray:
+    '''
+    Decodes a comma separated multi-option custom field into its option labels.\n
+    Each distinct combination of option ids is decoded once and the result is spread back over
+    the rows, so the cost depends on the number of distinct combinations rather than the number of deals.\n
+
+    Parameters:
+        `values (tuple)` - Raw field value per deal, `None` if the field is empty.\n
+        `labels (dict)` - Option id to label lookup.\n
+
+    Return:
+        `decoded (np.ndarray)` - Labels joined with ", " per deal, `None` where the field is empty.\n
+    '''
+
+    codes, uniques = pd.factorize(np.array(values, dtype=object))
+    decoded_uniques = [", ".join(labels[id] for id in value.split(',') if id in labels) for value in uniques]
+
+    # factorize marks missing values with -1, which picks the trailing None
+    decoded = np.array(decoded_uniques + [None], dtype=object)
+
+    return decoded[codes]
+
+def _slim_person(person: 'dict | None') -> 'dict | None':
+
+    if not person:
+        return None
+
+    return {
+        'name': person.get('name'),
+        'value': person.get('value'),
+        'phone': [{'value': phone['value']} for phone in person.get('phone') or []]
+    }
+
+def slim_deals_page(result: dict) -> dict:
+    '''
+    Trims the persons and owners of a decoded deals page down to the values `process_data` reads.
+    The field selector already drops unused deal fields, but persons and owners still come back as
+    nested objects with emails, pictures and counters, which would otherwise stay in memory until
+    the page is converted.\n
+
+    Parameters:
+        `result (dict)` - Decoded response body of a deals page.\n
+
+    Return:
+        `result (dict)` - The same body with trimmed deals.\n
+    '''
+
+    for deal in result.get('data') or []:
+        deal['person_id'] = _slim_person(deal.get('person_id'))
+        deal['user_id'] = {'name': (deal.get('user_id') or {}).get('name')}
+
+    return result
+
+def process_data(data: dict, lookups: dict) -> pd.DataFrame:
+    '''
+    Converts one page of deals into rows of the Pipedrive snapshot. Each field is pulled out of
+    the page into its own column once, every lookup is applied to a whole column and the phone
+    slots are filled with a single scatter. All lookups are passed in, so pages can be converted
+    in any thread without shared state.\n
+
+    Parameters:
+        `data (dict)` - Decoded response body of a deals page.\n
+        `lookups (dict)` - Label lookups for `deal_status`, `ca_tracking_flag`, `pipelines` and `stages`.\n
+
+    Return:
+        `pipedrive_df (pd.DataFrame)` - One row per deal with the `PIPEDRIVE_COLUMNS` columns.\n
+    '''
+
+    deals = data['data']
+    deal_count = len(deals)
+    if not deal_count:
+        return pd.DataFrame(columns=PIPEDRIVE_COLUMNS)
+
+    # One pass over the page pulls every plain field out, then the rows are transposed into columns
+    (deal_ids, titles, owners, stage_ids, pipeline_ids, ca_tracking_flags, unique_database_ids,
+     deal_statuses, offer_ready_dates, offer_ready_small_dates) = zip(*map(DEAL_FIELD_GETTER, deals))
+    persons = [deal.get('person_id') or None for deal in deals]
+
+    # Phones keep their first-seen order, with duplicates removed
+    all_phones = [list(dict.fromkeys(map(str.strip, map(PHONE_VALUE_GETTER, person['phone'])))) if person else []
+                  for person in persons]
+
+    columns = np.full((deal_count, len(PIPEDRIVE_COLUMNS)), None, dtype=object)
+
+    # Scatter the first 10 phones of every deal into the phone slots, the rest of the slots stay None
+    phone_counts = np.fromiter(map(len, all_phones), dtype=np.int64, count=deal_count)
+    flat_phones = np.fromiter(itertools.chain.from_iterable(all_phones), dtype=object, count=int(phone_counts.sum()))
+    phone_rows = np.repeat(np.arange(deal_count), phone_counts)
+    phone_ranks = np.arange(len(flat_phones)) - np.repeat(np.cumsum(phone_counts) - phone_counts, phone_counts)
+    in_slots = phone_ranks < 10
+    columns[phone_rows[in_slots], PHONE_SLOTS_START + phone_ranks[in_slots]] = flat_phones[in_slots]
+
+    columns[:, 0] = deal_ids
+    columns[:, 1] = titles
+    columns[:, 2] = [person['value'] if person else None for person in persons]
+    columns[:, 3] = [person['name'] if person else None for person in persons]
+    columns[:, 4] = [", ".join(phones) if phones else None for phones in all_phones]
+    columns[:, 15] = [owner['name'] for owner in owners]
+    columns[:, 16] = list(map(lookups['stages'].get, stage_ids))
+    columns[:, 17] = list(map(lookups['pipelines'].get, pipeline_ids))
+    columns[:, 18] = _decode_options(ca_tracking_flags, lookups['ca_tracking_flag'])
+    columns[:, 19] = unique_database_ids
+    columns[:, 20] = _decode_options(deal_statuses, lookups['deal_status'])
+    columns[:, 21] = offer_ready_dates
+    columns[:, 22] = offer_ready_small_dates
+
+    # Let pandas type the ID columns the same way it did for the old row lists
+    pipedrive_df = pd.DataFrame(columns, columns=PIPEDRIVE_COLUMNS).infer_objects()
 
     return pipedrive_df
 
-def fetch_data_from_api(next_start=0):
+def read_sync_state() -> 'dict | None':
+    '''
+    Reads the watermark of the last successful Pipedrive sync.\n
+
+    Return:
+        `sync_state (dict | None)` - Saved sync state, or `None` if there is no usable local deal store.\n
+    '''
+
+    if not (os.path.exists(PIPEDRIVE_SYNC_STATE_PATH) and os.path.exists(PIPEDRIVE_SNAPSHOT_PATH)):
+        return None
+
     try:
-        all_deals_endpoint =  "api/v1/deals"
-        url = f"https://communityminerals-f099fc.pipedrive.com/{all_deals_endpoint}?api_token={PIPEDRIVE_API}"
-        params = {'start': next_start, 'limit': 500}
-        
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        return response.json()  # Assuming the response is in JSON format
-    except requests.RequestException as e:
-        print(f"Request failed for start {next_start}: {e}")
+        with open(PIPEDRIVE_SYNC_STATE_PATH, 'r', encoding='utf-8') as sync_state_file:
+            sync_state = json.load(sync_state_file)
+    except (OSError, ValueError):
         return None
 
-def gather_paginated_data_parallel_batch(batch_size=5):
-    data = []
-    more_items = True
-    step = 500
-    next_start = 0
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        while more_items:
-            futures = []
-            # Fetch 'batch_size' pages concurrently
-            for _ in range(batch_size):
-                futures.append(executor.submit(fetch_data_from_api, next_start))
-                next_start += step
-
-            # Wait for all the current batch of requests to complete
-            results = [future.result() for future in futures]
-
-            for result in results:
-                if result:
-                    data.append(process_data(result))
-                    more_items = result['additional_data']['pagination']['more_items_in_collection']
-                    if not more_items:
-                        break
-                else:
-                    more_items = False  # Stop if the request fails
-    
-    # Combine all the data into a single DataFrame
-    if data:
-        df = pd.concat(data, ignore_index=True)
-        return df        
+    # Deals outside a new filter would otherwise stay in the local deal store
+    if sync_state.get('filter_id') != PIPEDRIVE_FILTER_ID:
+        return None
+
+    return sync_state if sync_state.get('watermark') else None
+
+def save_sync_state(watermark: 'str | None', mode: str, deal_count: int) -> None:
+    '''
+    Saves the watermark of a successful Pipedrive sync.\n
+
+    Parameters:
+        `watermark (str | None)` - Pipedrive server time at the start of the sync. Deals changed after it
+        are fetched by the next incremental sync.\n
+        `mode (str)` - `full` or `incremental`.\n
+        `deal_count (int)` - Number of deals in the local deal store after the sync.\n
+    '''
+
+    os.makedirs(os.path.dirname(PIPEDRIVE_SYNC_STATE_PATH), exist_ok=True)
+    sync_state = {
+        'watermark': watermark,
+        'mode': mode,
+        'deal_count': deal_count,
+        'filter_id': PIPEDRIVE_FILTER_ID,
+        'synced_at': datetime.now(timezone.utc).strftime(PIPEDRIVE_TIMESTAMP_FORMAT)
+    }
+
+    # Write to a temporary file first so an interrupted run never leaves a broken state file
+    temp_path = f"{PIPEDRIVE_SYNC_STATE_PATH}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as sync_state_file:
+        json.dump(sync_state, sync_state_file)
+    os.replace(temp_path, PIPEDRIVE_SYNC_STATE_PATH)
+
+def fetch_changed_deals(client: PipedriveClient, since_timestamp: str) -> list:
+    '''
+    Fetches every deal that was added, updated or deleted since the given timestamp.\n
+
+    Parameters:
+        `client (PipedriveClient)` - Client used to request the recents endpoint.\n
+        `since_timestamp (str)` - Watermark of the last sync in `YYYY-MM-DD HH:MM:SS` (UTC) format.\n
+
+    Return:
+        `changed_deals (list)` - Raw deal objects, including deleted ones.\n
+    '''
+
+    changed_deals = []
+    params = {'since_timestamp': since_timestamp, 'items': 'deal'}
+
+    for result in client.iter_pages('api/v1/recents', params):
+        changed_deals.extend(item['data'] for item in (result.get('data') or []) if item.get('item') == 'deal')
+
+    return changed_deals
+
+def merge_changed_deals(changed_deals: list, lookups: dict) -> int:
+    '''
+    Merges changed deals into the local deal store. Updated deals replace their old rows,
+    new deals are appended and deleted deals are removed.\n
+
+    Parameters:
+        `changed_deals (list)` - Raw deal objects returned by `fetch_changed_deals`.\n
+        `lookups (dict)` - Label lookups passed to `process_data`.\n
+
+    Return:
+        `deal_count (int)` - Number of deals in the local deal store after the merge.\n
+    '''
+
+    pipedrive_df = read_pipedrive_snapshot()
+
+    # Keep only the latest version of each deal in case it changed more than once
+    latest_deals = {deal['id']: deal for deal in changed_deals if deal}
+    deleted_ids = {deal_id for deal_id, deal in latest_deals.items() if deal.get('deleted')}
+    updated_deals = [deal for deal_id, deal in latest_deals.items() if deal_id not in deleted_ids]
+
+    pipedrive_df = pipedrive_df[~pipedrive_df['Deal - ID'].isin(list(latest_deals))]
+
+    if updated_deals:
+        pipedrive_df = pd.concat([pipedrive_df, process_data({'data': updated_deals}, lookups)], ignore_index=True)
+
+    pipedrive_df = pipedrive_df.sort_values(by='Deal - ID', kind='stable')
+    write_pipedrive_snapshot(pipedrive_df)
+
+    print(f"Merged {len(updated_deals)} updated and {len(deleted_ids)} deleted deals")
+
+    return len(pipedrive_df)
+
+def read_checkpoint() -> 'dict | None':
+    '''
+    Reads the checkpoint of an interrupted full pull.\n
+
+    Return:
+        `checkpoint (dict | None)` - Next page offset and the snapshot parts written so far, or `None` if there is nothing to resume.\n
+    '''
 
-def main():
+    if not os.path.exists(PIPEDRIVE_CHECKPOINT_PATH):
+        return None
+
+    try:
+        with open(PIPEDRIVE_CHECKPOINT_PATH, 'r', encoding='utf-8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+
+    # A checkpoint from a different page size cannot be resumed page by page
+    if checkpoint.get('page_size') != PAGE_SIZE or 'parts' not in checkpoint:
+        return None
+
+    # Offsets only line up with the filter the pull was started with
+    if checkpoint.get('filter_id') != PIPEDRIVE_FILTER_ID:
+        return None
+
+    # Every part the checkpoint counts must still be there
+    if not all(os.path.exists(os.path.join(PIPEDRIVE_PARTS_PATH, part)) for part in checkpoint['parts']):
+        return None
+
+    return checkpoint
+
+def save_checkpoint(checkpoint: dict) -> None:
+    '''
+    Saves the checkpoint of a full pull after a snapshot part was written.\n
+
+    Parameters:
+        `checkpoint (dict)` - Next page offset, deals and parts written so far, and the sync watermark.\n
+    '''
+
+    temp_path = f"{PIPEDRIVE_CHECKPOINT_PATH}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temp_path, PIPEDRIVE_CHECKPOINT_PATH)
+
+def clear_checkpoint(keep_parts: 'list | None' = None) -> None:
+    '''
+    Removes the checkpoint and every snapshot part it does not list.\n
+
+    Parameters:
+        `keep_parts (list | None)` - Part file names to keep. Every part is removed if `None`.\n
+    '''
+
+    if keep_parts is None and os.path.exists(PIPEDRIVE_CHECKPOINT_PATH):
+        os.remove(PIPEDRIVE_CHECKPOINT_PATH)
+
+    if os.path.isdir(PIPEDRIVE_PARTS_PATH):
+        for part in os.listdir(PIPEDRIVE_PARTS_PATH):
+            if part not in (keep_parts or []):
+                os.remove(os.path.join(PIPEDRIVE_PARTS_PATH, part))
+
+_END_OF_STREAM = object()
+
+def _put_until_stopped(target_queue: queue.Queue, item, stop_event: threading.Event) -> bool:
+
+    # Block while the next stage is busy, but give up as soon as the pipeline is stopped
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+def _get_until_stopped(source_queue: queue.Queue, stop_event: threading.Event):
+
+    while not stop_event.is_set():
+        try:
+            return source_queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+
+    return _END_OF_STREAM
+
+def _fetch_stage(client: PipedriveClient,
+                 start: int,
+                 page_queue: queue.Queue,
+                 stop_event: threading.Event) -> None:
+
+    params = {'filter_id': PIPEDRIVE_FILTER_ID} if PIPEDRIVE_FILTER_ID else {}
+
+    try:
+        total_items = client.count_deals(params)
+        for page_start, result in client.iter_numbered_pages(DEALS_ENDPOINT,
+                                                             params,
+                                                             total_items=total_items,
+                                                             start=start,
+                                                             page_hook=slim_deals_page):
+            if not _put_until_stopped(page_queue, (page_start, result), stop_event):
+                return
+        _put_until_stopped(page_queue, _END_OF_STREAM, stop_event)
+
+    except Exception as e:
+        _put_until_stopped(page_queue, e, stop_event)
+
+def _parse_stage(page_queue: queue.Queue, chunk_queue: queue.Queue, lookups: dict, stop_event: threading.Event) -> None:
+
+    while True:
+        page = _get_until_stopped(page_queue, stop_event)
+
+        if page is _END_OF_STREAM or isinstance(page, Exception):
+            _put_until_stopped(chunk_queue, page, stop_event)
+            return
+
+        try:
+            page_start, result = page
+            chunk_df = process_data(result, lookups) if result.get('data') else None
+
+            # Pages past the end still advance the checkpoint, they just carry no rows
+            if not _put_until_stopped(chunk_queue, (page_start, chunk_df), stop_event):
+                return
+        except Exception as e:
+            _put_until_stopped(chunk_queue, e, stop_event)
+            return
+
+        # Release the raw page as soon as it is converted
+        del page, result
+
+def _write_part(checkpoint: dict, chunks: list, next_start: int) -> None:
+    '''
+    Writes buffered chunks as the next snapshot part and checkpoints the pull up to `next_start`.\n
+    '''
+
+    part = f"part-{len(checkpoint['parts']):05d}.parquet"
+    part_path = os.path.join(PIPEDRIVE_PARTS_PATH, part)
+    part_df = pd.concat(chunks, ignore_index=True)
+
+    pq.write_table(to_snapshot_table(part_df), f"{part_path}.tmp", compression=SNAPSHOT_COMPRESSION)
+    os.replace(f"{part_path}.tmp", part_path)
+
+    checkpoint['parts'].append(part)
+    checkpoint['deal_count'] += len(part_df)
+    checkpoint['next_start'] = next_start
+    save_checkpoint(checkpoint)
+
+def stream_deals_to_snapshot(client: PipedriveClient,
+                             snapshot_path: str,
+                             watermark: 'str | None',
+                             lookups: dict) -> 'tuple[int, str | None]':
+    '''
+    Pulls every deal and writes the snapshot in a streaming pipeline. A fetch thread downloads
+    pages, a parse thread turns each page into a column chunk, and this thread collects the chunks
+    into snapshot parts of `PART_ROWS` deals. Bounded queues between the stages keep memory flat
+    regardless of the number of deals.\n
+
+    Parts are written in page order, and the offset after the last part written is checkpointed.
+    If the pull fails, the next pull resumes from that offset instead of starting again from
+    offset 0. The parts are only joined into the snapshot once every page was written.\n
+
+    Parameters:
+        `client (PipedriveClient)` - Client used to request the deals endpoint.\n
+        `snapshot_path (str)` - Path of the snapshot file to write.\n
+        `watermark (str | None)` - Pipedrive server time at the start of this pull.\n
+        `lookups (dict)` - Label lookups passed to `process_data`.\n
+
+    Return:
+        `deal_count (int)` - Number of deals written.\n
+        `watermark (str | None)` - Watermark of the pull. A resumed pull keeps the watermark of the pull it resumes.\n
+    '''
+
+    os.makedirs(PIPEDRIVE_PARTS_PATH, exist_ok=True)
+
+    checkpoint = read_checkpoint()
+    if checkpoint:
+        print(f"Resuming Pipedrive extraction from offset {checkpoint['next_start']}")
+
+        # Drop anything written after the last checkpoint, e.g. a half written part
+        clear_checkpoint(keep_parts=checkpoint['parts'])
+    else:
+        clear_checkpoint()
+        checkpoint = {
+            'page_size': PAGE_SIZE,
+            'next_start': 0,
+            'deal_count': 0,
+            'parts': [],
+            'filter_id': PIPEDRIVE_FILTER_ID,
+            'watermark': watermark
+        }
+        save_checkpoint(checkpoint)
+
+    page_queue = queue.Queue(maxsize=PAGE_QUEUE_SIZE)
+    chunk_queue = queue.Queue(maxsize=CHUNK_QUEUE_SIZE)
+    stop_event = threading.Event()
+
+    stages = [
+        threading.Thread(target=_fetch_stage,
+                         args=(client, checkpoint['next_start'], page_queue, stop_event),
+                         daemon=True),
+        threading.Thread(target=_parse_stage, args=(page_queue, chunk_queue, lookups, stop_event), daemon=True)
+    ]
+    for stage in stages:
+        stage.start()
+
+    try:
+        buffered_chunks = []
+        buffered_rows = 0
+        next_start = checkpoint['next_start']
+
+        while True:
+            chunk = chunk_queue.get()
+
+            if chunk is _END_OF_STREAM:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+
+            # Pages past the end still advance the offset, they just carry no rows
+            page_start, chunk_df = chunk
+            next_start = page_start + PAGE_SIZE
+            if chunk_df is not None:
+                buffered_chunks.append(chunk_df)
+                buffered_rows += len(chunk_df)
+
+            if buffered_rows >= PART_ROWS:
+                _write_part(checkpoint, buffered_chunks, next_start)
+                buffered_chunks, buffered_rows = [], 0
+
+        if buffered_chunks:
+            _write_part(checkpoint, buffered_chunks, next_start)
+
+        # Join the parts one at a time, so only one part is in memory
+        temp_path = f"{snapshot_path}.tmp"
+        with pq.ParquetWriter(temp_path, PIPEDRIVE_SCHEMA, compression=SNAPSHOT_COMPRESSION) as snapshot_writer:
+            for part in checkpoint['parts']:
+                snapshot_writer.write_table(pq.read_table(os.path.join(PIPEDRIVE_PARTS_PATH, part), schema=PIPEDRIVE_SCHEMA))
+
+        os.replace(temp_path, snapshot_path)
+        clear_checkpoint()
+
+    except Exception:
+        print(f"Pipedrive extraction stopped, it will resume from offset {checkpoint['next_start']} on the next run")
+        raise
+
+    finally:
+        stop_event.set()
+        for stage in stages:
+            stage.join()
+
+    return checkpoint['deal_count'], checkpoint['watermark']
+
+def main(full_refresh: bool = False):
+    '''
+    Updates the local Pipedrive deal store. When a previous sync exists, only deals changed since
+    its watermark are fetched and merged. Otherwise every deal is pulled again.\n
+
+    Parameters:
+        `full_refresh (bool)` - Ignore the saved watermark and pull every deal.\n
+    '''
 
     print("Extracting Pipedrive Data")
 
-    global ca_tracking_flag_dict, deal_status_dict, pipeline_dict, stages_dict
+    api_key, base_url = pipedrive_connection()
+
+    with PipedriveClient(api_key, base_url=base_url) as client:
+
+        # Lookup tables rarely change, so they come from the metadata cache unless a full refresh is asked for
+        metadata = read_metadata(client, max_age=0 if full_refresh else METADATA_TTL_SECONDS)
+        ca_tracking_flag_dict, deal_status_dict = get_deal_fields(metadata["api/v1/dealFields"])
+        pipeline_dict = get_pipelines(metadata["api/v1/pipelines"])
+        stages_dict = get_deal_stages(metadata["api/v1/stages"])
+        lookups = {
+            'deal_status': deal_status_dict,
+            'ca_tracking_flag': ca_tracking_flag_dict,
+            'pipelines': pipeline_dict,
+            'stages': stages_dict
+        }
+
+        # Server time before any deal is read, so changes made during this sync are picked up next time. The
+        # metadata may have come from the cache without a request, so the clock is always asked for here.
+        sync_started_at = client.server_time()
+
+        sync_state = None if full_refresh else read_sync_state()
+
+        if sync_state:
+            # The recents endpoint has no filter, so changed deals are merged whether or not they match
+            # PIPEDRIVE_FILTER_ID. The next full pull applies the filter again.
+            print(f"Syncing deals changed since {sync_state['watermark']}")
+            changed_deals = fetch_changed_deals(client, sync_state['watermark'])
+            deal_count = merge_changed_deals(changed_deals, lookups)
+            save_sync_state(sync_started_at, 'incremental', deal_count)
+
+        else:
+            deal_count, watermark = stream_deals_to_snapshot(client, PIPEDRIVE_SNAPSHOT_PATH, sync_started_at, lookups)
+            save_sync_state(watermark, 'full', deal_count)
+
+            # The CSV snapshot of older versions is replaced by the Parquet snapshot
+            if os.path.exists(LEGACY_SNAPSHOT_PATH):
+                os.remove(LEGACY_SNAPSHOT_PATH)
+
+        transfer_stats = client.transfer_stats()
+        if transfer_stats['responses']:
+            print(f"Received {transfer_stats['bytes_received'] / 2 ** 20:.2f} MiB over the wire for "
+                  f"{transfer_stats['bytes_decoded'] / 2 ** 20:.2f} MiB of JSON in {transfer_stats['responses']} "
+                  f"Pipedrive responses")
+
+    # Phone number lookups of this run read the index instead of the phone_number column
+    build_phone_index()
+
+def snapshot_age() -> 'float | None':
+    '''
+    Returns how long ago the local deal store was last synced.\n
+
+    Return:
+        `age (float | None)` - Seconds since the last successful sync, or `None` if there is no usable local deal store.\n
+    '''
+
+    sync_state = read_sync_state()
+    if not sync_state or not sync_state.get('synced_at'):
+        return None
+
+    synced_at = datetime.strptime(sync_state['synced_at'], PIPEDRIVE_TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+
+    return (datetime.now(timezone.utc) - synced_at).total_seconds()
+
+def ensure_fresh(max_age: float = PIPEDRIVE_MAX_AGE_SECONDS, force_refresh: bool = False) -> bool:
+    '''
+    Syncs the local deal store unless it was synced less than `max_age` seconds ago. If another
+    sync is already running, e.g. the prefetch started by the UI, this waits for it and then
+    checks the age again, so back to back runs only sync once.\n
+
+    Parameters:
+        `max_age (float)` - Maximum age in seconds of a snapshot that is used as it is.\n
+        `force_refresh (bool)` - Pull every deal again, even if the snapshot is recent enough. The full pull
+        applies `PIPEDRIVE_FILTER_ID` again, so deals that left the filter are dropped.\n
+
+    Return:
+        `synced (bool)` - `True` if a sync ran, `False` if the snapshot was recent enough.\n
+    '''
+
+    with SYNC_LOCK:
+        age = snapshot_age()
+
+        if not force_refresh and age is not None and age < max_age:
+            print(f"Using Pipedrive data synced {age / 60:.0f} minutes ago")
+            return False
+
+        main(full_refresh=force_refresh)
 
-    ca_tracking_flag_dict, deal_status_dict = get_deal_fields("api/v1/dealFields")
-    pipeline_dict = get_pipelines("api/v1/pipelines")
-    stages_dict = get_deal_stages("api/v1/stages")
-    df_combined = gather_paginated_data_parallel_batch(5)
-    df_combined.to_csv('./data/pipedrive/pipedrive_data.csv', index=False)
+        return True
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,210 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+from user_input.pipedrive_snapshot import PIPEDRIVE_SNAPSHOT_PATH, read_pipedrive_snapshot
+from misc.phone_keys import to_phone_keys
+
+
+'''
+This module contains the phone number index of the Pipedrive snapshot.\n
+Every phone number of every deal is stored as an int64 key. The keys are sorted and point through an
+offsets array into the snapshot rows and deal IDs that carry the phone number. The arrays are saved
+as `.npy` files and memory-mapped when read, so looking up a phone number is a binary search and
+nothing has to be exploded or grouped per run.\n
+'''
+
+PHONE_INDEX_PATH = './data/pipedrive_sync/phone_index'
+
+# Phone numbers are the digits of each comma separated entry. Entries that do not fit in an int64
+# or start with 0 are left out, they are not phone numbers a call can come from.
+PHONE_KEY_PATTERN = r'[1-9]\d{0,17}'
+
+INDEX_ARRAYS = ['phone_keys', 'offsets', 'deal_rows', 'deal_ids']
+
+
+def _load_array(path: str) -> np.ndarray:
+
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # Empty arrays cannot be memory-mapped
+        return np.load(path)
+
+def _snapshot_fingerprint(snapshot_path: str) -> dict:
+
+    snapshot_stat = os.stat(snapshot_path)
+
+    return {'snapshot_size': snapshot_stat.st_size, 'snapshot_mtime_ns': snapshot_stat.st_mtime_ns}
+
+
+class PhoneIndex:
+    '''
+    Memory-mapped phone number index of one Pipedrive snapshot.\n
+    '''
+
+    def __init__(self, folder: str):
+
+        arrays = {name: _load_array(os.path.join(folder, f"{name}.npy")) for name in INDEX_ARRAYS}
+        self.phone_keys = arrays['phone_keys']
+        self.offsets = arrays['offsets']
+        self.deal_rows = arrays['deal_rows']
+        self.deal_ids = arrays['deal_ids']
+
+    def _find(self, phones: pd.Series) -> 'tuple[np.ndarray, np.ndarray]':
+
+        keys, valid = to_phone_keys(phones, PHONE_KEY_PATTERN)
+
+        # Binary search every key, a key is found if the sorted keys hold it at the insert position
+        positions = np.searchsorted(self.phone_keys, keys)
+        found = valid & (positions < len(self.phone_keys))
+        found[found] = self.phone_keys[positions[found]] == keys[found]
+
+        starts = self.offsets[positions[found]]
+        counts = self.offsets[positions[found] + 1] - starts
+
+        # Expand each [start, end) range of the index into one entry per match
+        match_count = int(counts.sum())
+        entries = np.arange(match_count) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        phone_positions = np.repeat(np.flatnonzero(found), counts)
+
+        return phone_positions, entries
+
+    def match(self, phones: pd.Series) -> 'tuple[np.ndarray, np.ndarray]':
+        '''
+        Finds every deal that has one of the phone numbers.\n
+
+        Parameters:
+            `phones (pd.Series)` - Phone numbers to look up.\n
+
+        Return:
+            `phone_positions (np.ndarray)` - Position in `phones` of every match, in ascending order.\n
+            `deal_rows (np.ndarray)` - Snapshot row of every match, in snapshot order per phone number.\n
+        '''
+
+        phone_positions, entries = self._find(phones)
+
+        return phone_positions, np.asarray(self.deal_rows[entries])
+
+    def indexed_rows(self) -> np.ndarray:
+        '''
+        Returns the snapshot rows that have at least one phone number, in snapshot order.\n
+        '''
+
+        return np.unique(self.deal_rows)
+
+    def lookup_deal_ids(self, phones: pd.Series) -> pd.Series:
+        '''
+        Looks up the deals of each phone number.\n
+
+        Parameters:
+            `phones (pd.Series)` - Phone numbers to look up.\n
+
+        Return:
+            `deal_ids (pd.Series)` - Deal IDs of each phone number joined with " | ", `NaN` where no deal has the phone number.\n
+        '''
+
+        phone_positions, entries = self._find(phones)
+
+        joined_ids = pd.Series(np.asarray(self.deal_ids[entries]).astype(str))\
+            .groupby(phone_positions, sort=False)\
+            .agg(" | ".join)
+
+        deal_ids = pd.Series(np.nan, index=phones.index, dtype=object)
+        deal_ids.iloc[joined_ids.index.to_numpy()] = joined_ids.to_numpy()
+
+        return deal_ids
+
+
+def build_phone_index(snapshot_path: str = PIPEDRIVE_SNAPSHOT_PATH, path: str = PHONE_INDEX_PATH) -> PhoneIndex:
+    '''
+    Builds the phone number index of the Pipedrive snapshot. Each build is written to its own folder
+    and `current.json` is switched to it last, so an index that is still mapped by a reader is never
+    overwritten. The previous build is kept until the next build, older builds are removed.\n
+
+    Parameters:
+        `snapshot_path (str)` - Path of the Pipedrive snapshot.\n
+        `path (str)` - Folder of the phone index.\n
+
+    Return:
+        `phone_index (PhoneIndex)` - The new index.\n
+    '''
+
+    # Fingerprint first, so a snapshot replaced while it is read is detected on the next load
+    fingerprint = _snapshot_fingerprint(snapshot_path)
+    pipedrive_df = read_pipedrive_snapshot(columns=['Deal - ID', 'phone_number'], path=snapshot_path)
+
+    # One entry per phone number of every deal, labelled with the snapshot row it came from
+    phones = pipedrive_df['phone_number'].reset_index(drop=True).str.split(',').explode().dropna()
+    digits = phones.str.replace(r'\D', '', regex=True)
+    keys, valid = to_phone_keys(digits, PHONE_KEY_PATTERN)
+    keys, rows = keys[valid], digits.index.to_numpy(dtype=np.int64)[valid]
+
+    # Sort by phone number, then by snapshot row, and drop phone numbers repeated on one deal
+    order = np.lexsort((rows, keys))
+    keys, rows = keys[order], rows[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+    keys, rows = keys[first], rows[first]
+
+    phone_keys, starts = np.unique(keys, return_index=True)
+    arrays = {
+        'phone_keys': phone_keys,
+        'offsets': np.append(starts, len(keys)).astype(np.int64),
+        'deal_rows': rows,
+        'deal_ids': pipedrive_df['Deal - ID'].to_numpy(dtype=np.int64)[rows]
+    }
+
+    version = f"{fingerprint['snapshot_mtime_ns']}-{fingerprint['snapshot_size']}"
+    folder = os.path.join(path, version)
+    os.makedirs(folder, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(folder, f"{name}.npy"), array)
+
+    # The build that is current until the switch may still be mapped by a running lookup
+    try:
+        with open(os.path.join(path, 'current.json'), 'r', encoding='utf-8') as current_file:
+            previous_version = json.load(current_file).get('version')
+    except (OSError, ValueError, AttributeError):
+        previous_version = None
+
+    temp_path = os.path.join(path, 'current.json.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as current_file:
+        json.dump({'version': version, 'deal_count': len(pipedrive_df), **fingerprint}, current_file)
+    os.replace(temp_path, os.path.join(path, 'current.json'))
+
+    # The previous build is kept for the lookups that still map it, only builds older than that are removed
+    for old_version in os.listdir(path):
+        if old_version in (version, previous_version, 'current.json', 'current.json.tmp'):
+            continue
+        shutil.rmtree(os.path.join(path, old_version), ignore_errors=True)
+
+    return PhoneIndex(folder)
+
+def load_phone_index(snapshot_path: str = PIPEDRIVE_SNAPSHOT_PATH, path: str = PHONE_INDEX_PATH) -> PhoneIndex:
+    '''
+    Loads the phone number index of the Pipedrive snapshot. The index is built again if it is
+    missing or was built from a different snapshot.\n
+
+    Parameters:
+        `snapshot_path (str)` - Path of the Pipedrive snapshot.\n
+        `path (str)` - Folder of the phone index.\n
+
+    Return:
+        `phone_index (PhoneIndex)` - Index of the current snapshot.\n
+    '''
+
+    try:
+        with open(os.path.join(path, 'current.json'), 'r', encoding='utf-8') as current_file:
+            current = json.load(current_file)
+
+        fingerprint = _snapshot_fingerprint(snapshot_path)
+        if all(current.get(key) == value for key, value in fingerprint.items()):
+            return PhoneIndex(os.path.join(path, current['version']))
+
+    except (OSError, ValueError, KeyError):
+        pass
+
+    return build_phone_index(snapshot_path, path)
@@ -0,0 +1,489 @@
+import json
+import math
+import time
+import random
+import threading
+import concurrent.futures
+from email.utils import parsedate_to_datetime
+from datetime import timezone
+import requests
+from requests.adapters import HTTPAdapter
+
+# orjson decodes JSON pages several times faster than the standard library, but is optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+'''
+This module contains the HTTP client used to extract data from the Pipedrive API.\n
+All requests share one pooled keep-alive session, are paced by a token bucket that follows
+Pipedrive's rate-limit headers, and are retried with jittered backoff. Paginated endpoints are
+fetched with a number of in-flight requests that adapts to the observed latency.\n
+'''
+
+DEFAULT_BASE_URL = 'https://communityminerals-f099fc.pipedrive.com'
+PAGE_SIZE = 500
+
+# Throttling and server-side errors are worth retrying, other client errors are not
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def decode_json(content: bytes):
+    '''
+    Decodes a JSON response body, with orjson if it is installed.\n
+
+    Parameters:
+        `content (bytes)` - Raw (decompressed) response body.\n
+
+    Return:
+        `body` - Decoded JSON.\n
+    '''
+
+    if orjson is not None:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+
+class PipedriveFetchError(Exception):
+    '''
+    Raised when one or more pages could not be fetched, so a partial deal snapshot is never saved.\n
+    '''
+
+
+class TokenBucket:
+    '''
+    Paces requests across all worker threads.\n
+    The refill rate follows the `x-ratelimit-remaining` and `x-ratelimit-reset` response headers, so the
+    remaining request budget is spread over the rest of the rate-limit window, and a 429 `Retry-After`
+    pauses every worker until the window resets.\n
+    '''
+
+    def __init__(self, rate: float = 20.0, capacity: float = 10.0):
+        self.default_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def observe_headers(self, headers) -> None:
+        try:
+            remaining = float(headers['x-ratelimit-remaining'])
+            reset = max(float(headers['x-ratelimit-reset']), 0.1)
+        except (KeyError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            self._refill(time.monotonic())
+            if remaining < 1:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+                self.tokens = 0
+            else:
+                # Spread what is left of the budget over the rest of the window, never faster than configured
+                self.rate = min(self.default_rate, max(remaining / reset, 0.5))
+
+
+class AdaptiveConcurrency:
+    '''
+    Tunes how many requests are in flight from observed request latency.\n
+    The limit grows by one while latency stays close to the best latency seen and shrinks
+    multiplicatively when latency climbs or a request fails (additive increase, multiplicative decrease).\n
+    '''
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16, smoothing: float = 0.3):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.smoothing = smoothing
+        self.best_latency = None
+        self.smoothed_latency = None
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            if self.best_latency is None or latency < self.best_latency:
+                self.best_latency = latency
+
+            if self.smoothed_latency is None:
+                self.smoothed_latency = latency
+            else:
+                self.smoothed_latency += self.smoothing * (latency - self.smoothed_latency)
+
+            # Server is keeping up, allow one more request in flight
+            if self.smoothed_latency <= self.best_latency * 1.5:
+                self.limit = min(self.limit + 1, self.maximum)
+
+            # Requests are queueing up on the server side, back off
+            elif self.smoothed_latency >= self.best_latency * 2.5:
+                self.limit = max(int(self.limit * 0.75), self.minimum)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.limit = max(self.limit // 2, self.minimum)
+
+
+class PipedriveClient:
+    '''
+    Reusable client for the Pipedrive API.\n
+
+    Parameters:
+        `api_token (str)` - Pipedrive API token.\n
+        `base_url (str)` - Pipedrive company domain, or a local stand-in server for offline benchmarks.\n
+        `page_size (int)` - Number of items requested per page.\n
+        `max_workers (int)` - Upper bound of requests in flight and of pooled connections.\n
+        `max_retries (int)` - Number of retries of a throttled or failed request before it is given up.\n
+        `requests_per_second (float)` - Highest request rate, lowered automatically from rate-limit headers.\n
+        `timeout (float)` - Timeout in seconds of a single request.\n
+    '''
+
+    def __init__(self,
+                 api_token: str,
+                 base_url: str = DEFAULT_BASE_URL,
+                 page_size: int = PAGE_SIZE,
+                 max_workers: int = 16,
+                 max_retries: int = 6,
+                 requests_per_second: float = 20.0,
+                 timeout: float = 60):
+
+        self.api_token = api_token
+        self.base_url = base_url.rstrip('/')
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(rate=requests_per_second, capacity=max(max_workers, 1))
+
+        # Bytes received over the wire and after decompression, to report the transfer size of a sync
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.response_count = 0
+        self._stats_lock = threading.Lock()
+
+        # One keep-alive session, so connections (and TLS handshakes) are reused across pages
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> 'PipedriveClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _backoff(self, attempt: int) -> float:
+
+        # Exponential backoff with full jitter, so retrying workers do not hit the server in lockstep
+        return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+    def _record_transfer(self, response: requests.Response) -> None:
+
+        # The raw stream counts the bytes read from the socket, before decompression
+        try:
+            wire_bytes = response.raw.tell()
+        except (AttributeError, OSError):
+            wire_bytes = len(response.content)
+
+        with self._stats_lock:
+            self.bytes_received += wire_bytes
+            self.bytes_decoded += len(response.content)
+            self.response_count += 1
+
+    def transfer_stats(self) -> dict:
+        '''
+        Returns the number of responses and the bytes received over the wire and after decompression so far.\n
+        '''
+
+        with self._stats_lock:
+            return {
+                'responses': self.response_count,
+                'bytes_received': self.bytes_received,
+                'bytes_decoded': self.bytes_decoded
+            }
+
+    def _send(self, endpoint: str, params: 'dict | None' = None, headers: 'dict | None' = None) -> requests.Response:
+        '''
+        Sends a GET request and returns the first response that is not throttled or a server error.\n
+        Throttled requests, server errors, timeouts and dropped connections are retried with
+        jittered exponential backoff. A 429 response pauses all requests for its `Retry-After`.\n
+        '''
+
+        query = {'api_token': self.api_token}
+        query.update(params or {})
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+
+            try:
+                response = self.session.get(url, params=query, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                self.rate_limiter.observe_headers(response.headers)
+
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    self._record_transfer(response)
+                    return response
+
+                if response.status_code == 429:
+                    try:
+                        retry_after = float(response.headers.get('Retry-After', 2))
+                    except ValueError:
+                        retry_after = 2.0
+                    self.rate_limiter.pause(retry_after)
+
+                error = requests.HTTPError(f"{response.status_code} response from {endpoint}", response=response)
+
+            if attempt == self.max_retries:
+                raise error
+
+            delay = self._backoff(attempt)
+            print(f"Retrying {endpoint} (start {query.get('start', 0)}) in {delay:.1f}s: {error}")
+            time.sleep(delay)
+
+    def get(self, endpoint: str, params: 'dict | None' = None) -> dict:
+        '''
+        Sends a GET request to an endpoint and returns the decoded JSON body.\n
+
+        Parameters:
+            `endpoint (str)` - API path, e.g. `api/v1/deals`.\n
+            `params (dict | None)` - Query string parameters.\n
+
+        Return:
+            `body (dict)` - Decoded JSON response.\n
+        '''
+
+        return decode_json(self._send(endpoint, params).content)
+
+    def get_conditional(self,
+                        endpoint: str,
+                        params: 'dict | None' = None,
+                        etag: 'str | None' = None,
+                        last_modified: 'str | None' = None) -> 'tuple[dict | None, str | None, str | None]':
+        '''
+        Sends a conditional GET request that only returns a body if the resource changed.\n
+
+        Parameters:
+            `endpoint (str)` - API path, e.g. `api/v1/stages`.\n
+            `params (dict | None)` - Query string parameters.\n
+            `etag (str | None)` - `ETag` of the cached copy.\n
+            `last_modified (str | None)` - `Last-Modified` of the cached copy.\n
+
+        Return:
+            `body (dict | None)` - Decoded JSON response, or `None` if the cached copy is still valid.\n
+            `etag (str | None)` - `ETag` to send on the next revalidation.\n
+            `last_modified (str | None)` - `Last-Modified` to send on the next revalidation.\n
+        '''
+
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        response = self._send(endpoint, params, headers)
+        etag = response.headers.get('ETag', etag)
+        last_modified = response.headers.get('Last-Modified', last_modified)
+
+        if response.status_code == 304:
+            return None, etag, last_modified
+
+        return decode_json(response.content), etag, last_modified
+
+    def server_time(self) -> str:
+        '''
+        Reads the Pipedrive server clock from the `Date` header of a one deal page. Sync watermarks
+        always come from this clock, never from the local one.\n
+
+        Return:
+            `server_time (str)` - Server time in UTC, formatted like Pipedrive timestamps.\n
+        '''
+
+        response = self._send('api/v1/deals', {'start': 0, 'limit': 1})
+        try:
+            server_time = parsedate_to_datetime(response.headers['Date']).astimezone(timezone.utc)
+        except (KeyError, TypeError, ValueError) as e:
+            raise PipedriveFetchError(f"Pipedrive response has no usable Date header: {e}") from e
+
+        return server_time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def count_deals(self, params: 'dict | None' = None) -> 'int | None':
+        '''
+        Returns the number of deals reported by the deals summary, used to plan the page range.\n
+
+        Parameters:
+            `params (dict | None)` - Deal filters, e.g. `filter_id`, sent with the deals requests.\n
+        '''
+
+        try:
+            summary = self.get('api/v1/deals/summary', params)
+            return int(summary['data']['total_count'])
+        except (requests.RequestException, KeyError, TypeError, ValueError):
+            return None
+
+    def _fetch_page(self, endpoint: str, params: dict, start: int, page_hook=None) -> 'tuple[dict, float]':
+
+        page_params = dict(params)
+        page_params.update({'start': start, 'limit': self.page_size})
+
+        started = time.perf_counter()
+        result = self.get(endpoint, page_params)
+        latency = time.perf_counter() - started
+
+        # Trim the page in the worker, so only the trimmed page waits for its turn to be yielded
+        if page_hook is not None:
+            result = page_hook(result)
+
+        return result, latency
+
+    def iter_pages(self,
+                   endpoint: str,
+                   params: 'dict | None' = None,
+                   total_items: 'int | None' = None,
+                   start: int = 0,
+                   page_hook=None):
+        '''
+        Yields every page of a paginated endpoint in page order. See `iter_numbered_pages`.\n
+        '''
+
+        for _, result in self.iter_numbered_pages(endpoint, params, total_items, start, page_hook):
+            yield result
+
+    def iter_numbered_pages(self,
+                            endpoint: str,
+                            params: 'dict | None' = None,
+                            total_items: 'int | None' = None,
+                            start: int = 0,
+                            page_hook=None):
+        '''
+        Yields every page of a paginated endpoint in page order, together with its offset.\n
+        When `total_items` is known, pages are scheduled from the known page range with an adaptive
+        number of requests in flight. Otherwise pages are followed one by one through `next_start`,
+        so no request is ever sent past the end of the collection.\n
+
+        Parameters:
+            `endpoint (str)` - API path of a paginated endpoint.\n
+            `params (dict | None)` - Extra query string parameters sent with every page.\n
+            `total_items (int | None)` - Number of items in the collection, if known.\n
+            `start (int)` - Offset of the first page, used to resume an interrupted extraction.\n
+            `page_hook (callable | None)` - Applied to each decoded page in the thread that fetched it, e.g. to drop unused fields.\n
+
+        Return:
+            `(start, result) (tuple[int, dict])` - Offset and decoded JSON of each page.\n
+        '''
+
+        params = params or {}
+
+        if total_items is None:
+            yield from self._iter_pages_sequential(endpoint, params, start, page_hook)
+        else:
+            yield from self._iter_pages_concurrent(endpoint, params, total_items, start, page_hook)
+
+    def _iter_pages_sequential(self, endpoint: str, params: dict, start: int, page_hook=None):
+
+        next_start = start
+        more_items = True
+
+        while more_items:
+            try:
+                result, _ = self._fetch_page(endpoint, params, next_start, page_hook)
+            except requests.RequestException as e:
+                raise PipedriveFetchError(f"Could not fetch {endpoint} page at start {next_start}: {e}") from e
+
+            yield next_start, result
+
+            pagination = (result.get('additional_data') or {}).get('pagination') or {}
+            more_items = pagination.get('more_items_in_collection', False)
+            next_start = pagination.get('next_start', next_start + self.page_size)
+
+    def _iter_pages_concurrent(self, endpoint: str, params: dict, total_items: int, start: int, page_hook=None):
+
+        concurrency = AdaptiveConcurrency(initial=4, maximum=self.max_workers)
+
+        # Known page range, extended if the last page reports more items (e.g. deals added mid-crawl)
+        first_page = start // self.page_size
+        last_page = max(math.ceil(total_items / self.page_size) - 1, first_page)
+        next_page = first_page
+        next_to_yield = first_page
+        completed = {}
+        failed_pages = []
+        in_flight = {}
+
+        # Only schedule a bounded window ahead of the next page to yield, so a slow page cannot
+        # make finished pages pile up in memory
+        window = self.max_workers * 2
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+
+            while in_flight or (next_page <= last_page and not failed_pages):
+
+                while (next_page <= last_page
+                       and not failed_pages
+                       and len(in_flight) < concurrency.limit
+                       and next_page - next_to_yield < window):
+                    future = executor.submit(self._fetch_page, endpoint, params, next_page * self.page_size, page_hook)
+                    in_flight[future] = next_page
+                    next_page += 1
+
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    page = in_flight.pop(future)
+                    try:
+                        result, latency = future.result()
+                    except requests.RequestException as e:
+                        # Retries are exhausted, stop scheduling but keep the pages before it
+                        concurrency.record_failure()
+                        print(f"Request failed for start {page * self.page_size}: {e}")
+                        failed_pages.append(page)
+                        continue
+
+                    concurrency.record_success(latency)
+                    completed[page] = result
+
+                    pagination = (result.get('additional_data') or {}).get('pagination') or {}
+                    if page == last_page and pagination.get('more_items_in_collection'):
+                        last_page += 1
+
+                # Hand pages over in order as soon as the next one is available, up to the first failed page
+                while next_to_yield in completed:
+                    yield next_to_yield * self.page_size, completed.pop(next_to_yield)
+                    next_to_yield += 1
+
+        if failed_pages:
+            offsets = ', '.join(str(page * self.page_size) for page in sorted(failed_pages))
+            raise PipedriveFetchError(f"Could not fetch {endpoint} pages at start {offsets}")
@@ -0,0 +1,113 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+'''
+This module contains the on-disk format of the Pipedrive deal snapshot.\n
+The snapshot is a zstd compressed Parquet file with a fixed schema, so IDs keep their integer type,
+and phones and dates stay text, on every read. Readers only load the columns they ask for.\n
+'''
+
+PIPEDRIVE_SNAPSHOT_PATH = './data/pipedrive/pipedrive_data.parquet'
+
+# Snapshot written by versions that stored the deals as CSV
+LEGACY_SNAPSHOT_PATH = './data/pipedrive/pipedrive_data.csv'
+
+SNAPSHOT_COMPRESSION = 'zstd'
+
+PIPEDRIVE_SCHEMA = pa.schema(
+    [
+        ('Deal - ID', pa.int64()),
+        ('Deal - Title', pa.string()),
+        ('Person - ID', pa.int64()),
+        ('Deal - Contact person', pa.string()),
+        ('phone_number', pa.string())
+    ] +
+    [(f'Person - Phone {slot}', pa.string()) for slot in range(1, 11)] +
+    [
+        ('Deal - Owner', pa.string()),
+        ('Deal - Stage', pa.string()),
+        ('Deal - Pipeline', pa.string()),
+        ('Deal - CA Tracking Flag', pa.string()),
+        ('Deal - Unique Database ID', pa.string()),
+        ('Deal - Deal Status', pa.string()),
+        ('Deal - Offer Ready Date', pa.string()),
+        ('Deal - Offer Ready - Small Date', pa.string())
+    ]
+)
+
+PIPEDRIVE_COLUMNS = PIPEDRIVE_SCHEMA.names
+
+
+def to_snapshot_table(pipedrive_df: pd.DataFrame) -> pa.Table:
+    '''
+    Converts rows of the Pipedrive snapshot to an Arrow table with the snapshot schema.\n
+
+    Parameters:
+        `pipedrive_df (pd.DataFrame)` - Rows with the `PIPEDRIVE_COLUMNS` columns.\n
+
+    Return:
+        `table (pa.Table)` - Rows cast to `PIPEDRIVE_SCHEMA`.\n
+    '''
+
+    return pa.Table.from_pandas(pipedrive_df[PIPEDRIVE_COLUMNS], schema=PIPEDRIVE_SCHEMA, preserve_index=False)
+
+def write_pipedrive_snapshot(pipedrive_df: pd.DataFrame, path: str = PIPEDRIVE_SNAPSHOT_PATH) -> None:
+    '''
+    Writes the whole Pipedrive snapshot. The file is written next to the snapshot first and then
+    moved over it, so readers never see a half written snapshot.\n
+
+    Parameters:
+        `pipedrive_df (pd.DataFrame)` - Rows with the `PIPEDRIVE_COLUMNS` columns.\n
+        `path (str)` - Path of the snapshot file.\n
+    '''
+
+    temp_path = f"{path}.tmp"
+    pq.write_table(to_snapshot_table(pipedrive_df), temp_path, compression=SNAPSHOT_COMPRESSION)
+    os.replace(temp_path, path)
+
+def migrate_legacy_snapshot(path: str = PIPEDRIVE_SNAPSHOT_PATH, legacy_path: str = LEGACY_SNAPSHOT_PATH) -> bool:
+    '''
+    Converts the CSV snapshot of older versions to the Parquet snapshot, if there is no Parquet
+    snapshot yet. The CSV is kept until the next full pull replaces it.\n
+
+    Parameters:
+        `path (str)` - Path of the snapshot file.\n
+        `legacy_path (str)` - Path of the CSV snapshot.\n
+
+    Return:
+        `migrated (bool)` - `True` if the CSV snapshot was converted.\n
+    '''
+
+    if os.path.exists(path) or not os.path.exists(legacy_path):
+        return False
+
+    # Every column is read as text, IDs are converted to integers and columns the CSV lacks are empty
+    legacy_df = pd.read_csv(legacy_path, dtype=str).reindex(columns=PIPEDRIVE_COLUMNS)
+    for field in PIPEDRIVE_SCHEMA:
+        if pa.types.is_integer(field.type):
+            legacy_df[field.name] = pd.to_numeric(legacy_df[field.name]).astype('Int64')
+
+    write_pipedrive_snapshot(legacy_df, path)
+
+    return True
+
+def read_pipedrive_snapshot(columns: 'list | None' = None, path: str = PIPEDRIVE_SNAPSHOT_PATH) -> pd.DataFrame:
+    '''
+    Reads the Pipedrive snapshot. Installs that only have the CSV snapshot of older versions are
+    migrated to the Parquet snapshot on their first read.\n
+
+    Parameters:
+        `columns (list | None)` - Columns to read. Every column is read if `None`.\n
+        `path (str)` - Path of the snapshot file.\n
+
+    Return:
+        `pipedrive_df (pd.DataFrame)` - Pipedrive deals with the requested columns.\n
+    '''
+
+    if path == PIPEDRIVE_SNAPSHOT_PATH:
+        migrate_legacy_snapshot(path)
+
+    return pq.read_table(path, columns=columns).to_pandas()
@@ -0,0 +1,243 @@
+import os
+import json
+import shutil
+import hashlib
+import concurrent.futures
+from datetime import datetime, timezone
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+'''
+This module contains the versioned snapshot store of the reference data (Community Minerals Database,
+Bottoms Up Database and Pipedrive deals) that offline runs read instead of the remote sources.\n
+Every snapshot is a folder of zstd compressed Parquet files, one per table, with a manifest that holds
+the checksum and row count of each file and the timestamp of the source data. A snapshot is written
+into a temporary folder and renamed to its version when complete, so readers never see a half written
+snapshot. Writes run on a background thread and only the newest `SNAPSHOTS_KEPT` versions are kept.
+A snapshot whose files match the newest version is not saved again.\n
+'''
+
+SNAPSHOT_STORE_PATH = './data/snapshots'
+SNAPSHOTS_KEPT = 3
+SNAPSHOT_COMPRESSION = 'zstd'
+MANIFEST_NAME = 'manifest.json'
+
+# Versions are UTC timestamps, so they sort in the order they were written
+VERSION_FORMAT = '%Y%m%dT%H%M%S%fZ'
+
+# One writer thread, so snapshots of a name are written in the order they were requested
+_SNAPSHOT_WRITER = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot-writer')
+_PENDING_WRITES = []
+
+
+def _file_checksum(path: str) -> str:
+
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as snapshot_file:
+        for block in iter(lambda: snapshot_file.read(1 << 20), b''):
+            checksum.update(block)
+
+    return checksum.hexdigest()
+
+def _to_table(df: 'pd.DataFrame | pa.Table') -> pa.Table:
+
+    if isinstance(df, pa.Table):
+        return df
+
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # SQLite columns can hold values of mixed types, those columns are stored as text
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+def _table_checksums(manifest: dict) -> dict:
+
+    return {table_name: table_info.get('sha256') for table_name, table_info in manifest.get('tables', {}).items()}
+
+def _versions(name: str, path: str) -> list:
+
+    folder = os.path.join(path, name)
+    if not os.path.isdir(folder):
+        return []
+
+    # Folders still being written start with a dot and have no manifest yet
+    return sorted((version for version in os.listdir(folder)
+                   if not version.startswith('.') and os.path.exists(os.path.join(folder, version, MANIFEST_NAME))),
+                  reverse=True)
+
+def _write_snapshot(name: str, tables: dict, source: dict, path: str) -> dict:
+
+    version = datetime.now(timezone.utc).strftime(VERSION_FORMAT)
+    folder = os.path.join(path, name)
+    temp_folder = os.path.join(folder, f".{version}.{os.getpid()}.tmp")
+    os.makedirs(temp_folder)
+
+    try:
+        manifest = {
+            'name': name,
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'source': source,
+            'tables': {}
+        }
+
+        for table_name, table in tables.items():
+            if callable(table):
+                table = table()
+            table = _to_table(table)
+
+            file_name = f"{table_name}.parquet"
+            pq.write_table(table, os.path.join(temp_folder, file_name), compression=SNAPSHOT_COMPRESSION)
+            manifest['tables'][table_name] = {
+                'file': file_name,
+                'rows': table.num_rows,
+                'sha256': _file_checksum(os.path.join(temp_folder, file_name))
+            }
+
+        # Source timestamps can move without the data changing, e.g. a mirror synced again with no new rows
+        latest = latest_manifest(name, path)
+        if latest is not None and _table_checksums(latest) == _table_checksums(manifest):
+            shutil.rmtree(temp_folder, ignore_errors=True)
+            print(f"{name} snapshot {latest['version']} is unchanged")
+            return latest
+
+        with open(os.path.join(temp_folder, MANIFEST_NAME), 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+        # The rename publishes the whole snapshot at once
+        os.replace(temp_folder, os.path.join(folder, version))
+
+    except BaseException:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        raise
+
+    for old_version in _versions(name, path)[SNAPSHOTS_KEPT:]:
+        shutil.rmtree(os.path.join(folder, old_version), ignore_errors=True)
+
+    print(f"Saved {name} snapshot {version}")
+
+    return manifest
+
+def latest_manifest(name: str, path: str = SNAPSHOT_STORE_PATH) -> 'dict | None':
+    '''
+    Returns the manifest of the newest snapshot of a data source.\n
+
+    Parameters:
+        `name (str)` - Name of the data source, e.g. `cm_db`.\n
+        `path (str)` - Folder of the snapshot store.\n
+
+    Return:
+        `manifest (dict | None)` - Version, creation time, source and tables of the snapshot, `None` if there is no snapshot.\n
+    '''
+
+    for version in _versions(name, path):
+        try:
+            with open(os.path.join(path, name, version, MANIFEST_NAME), 'r', encoding='utf-8') as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            continue
+
+    return None
+
+def write_snapshot_in_background(name: str,
+                                 tables: dict,
+                                 source: dict,
+                                 path: str = SNAPSHOT_STORE_PATH) -> 'concurrent.futures.Future | None':
+    '''
+    Saves a new snapshot of a data source on the writer thread. DataFrames are copied right away, so
+    the rest of the run can change them, and converted to Arrow and written on the writer thread.
+    A table given as a function is read on the writer thread as well.
+    Nothing is written if the newest snapshot was taken from the same source data, or if its files
+    hold the same data.\n
+
+    Parameters:
+        `name (str)` - Name of the data source, e.g. `cm_db`.\n
+        `tables (dict)` - DataFrames, Arrow tables or functions returning either, by table name.\n
+        `source (dict)` - Where the data came from, with the `timestamp` of the source data.\n
+        `path (str)` - Folder of the snapshot store.\n
+
+    Return:
+        `future (Future | None)` - Write of the snapshot, `None` if the newest snapshot is already up to date.\n
+    '''
+
+    # Compared as JSON, the way the source is stored in the manifest
+    source = json.loads(json.dumps(source, default=str))
+    manifest = latest_manifest(name, path)
+    if manifest is not None and manifest.get('source') == source:
+        return None
+
+    # A copy only copies the column arrays, text values are shared with the original DataFrame
+    pending_tables = {table_name: df.copy() if isinstance(df, pd.DataFrame) else df for table_name, df in tables.items()}
+
+    future = _SNAPSHOT_WRITER.submit(_write_snapshot, name, pending_tables, source, path)
+    _PENDING_WRITES.append((name, future))
+
+    return future
+
+def wait_for_snapshots() -> None:
+    '''
+    Waits until every snapshot requested so far is written. A failed write is reported and the
+    previous snapshot stays the newest.\n
+    '''
+
+    while _PENDING_WRITES:
+        name, future = _PENDING_WRITES.pop(0)
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Could not save {name} snapshot: {e}")
+
+def snapshot_table_path(manifest: dict, table_name: str, path: str = SNAPSHOT_STORE_PATH) -> str:
+    '''
+    Returns the path of a table file of a snapshot.\n
+
+    Parameters:
+        `manifest (dict)` - Manifest of the snapshot.\n
+        `table_name (str)` - Name of the table.\n
+        `path (str)` - Folder of the snapshot store.\n
+
+    Return:
+        `table_path (str)` - Path of the Parquet file of the table.\n
+    '''
+
+    return os.path.join(path, manifest['name'], manifest['version'], manifest['tables'][table_name]['file'])
+
+def read_snapshot(name: str, path: str = SNAPSHOT_STORE_PATH) -> 'tuple[dict, dict] | tuple[None, None]':
+    '''
+    Reads the newest snapshot of a data source whose files match their checksums. A damaged
+    snapshot is reported and the next older one is read instead.\n
+
+    Parameters:
+        `name (str)` - Name of the data source, e.g. `cm_db`.\n
+        `path (str)` - Folder of the snapshot store.\n
+
+    Return:
+        `tables (dict | None)` - DataFrames of the snapshot by table name, `None` if there is no usable snapshot.\n
+        `manifest (dict | None)` - Manifest of the snapshot that was read.\n
+    '''
+
+    for version in _versions(name, path):
+        try:
+            with open(os.path.join(path, name, version, MANIFEST_NAME), 'r', encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+
+            tables = {}
+            for table_name, table_info in manifest['tables'].items():
+                table_path = snapshot_table_path(manifest, table_name, path)
+                if _file_checksum(table_path) != table_info['sha256']:
+                    raise ValueError(f"checksum of {table_info['file']} does not match")
+                tables[table_name] = pq.read_table(table_path).to_pandas()
+
+            return tables, manifest
+
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Skipping {name} snapshot {version}: {e}")
+
+    return None, None
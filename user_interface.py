@@ -3,14 +3,14 @@ This module creates the UI of the App and calls backend functions from the
 project directory for streamline processing of Abandoned Calls Files
 """
 
-import os
 import json
-import pandas as pd
 import customtkinter
 import threading
 from transform.dedupe_rc_data import remove_rc_duplicates
 from main import main as run_tool
 from transform.grab_new_deals_id import main as grab_new_deals_id
+from user_input.pipedrive_snapshot import read_pipedrive_snapshot
+from user_input.parallel_get import ensure_fresh as prefetch_pipedrive_data
 
 
 customtkinter.set_appearance_mode("System")  # Modes: "System" (standard), "Dark", "Light"
@@ -77,6 +77,12 @@ class App(customtkinter.CTk):
         # Read pipedrive stages data
         self.pipeline_stages_dict = self.extract_pipedrive_stages()
 
+        # Sync pipedrive data in background so it is usually fresh by the time the tool is run
+        threading.Thread(target=self.prefetch_pipedrive, daemon=True).start()
+
+        # Pull every pipedrive deal again on the next run instead of only the recently changed ones
+        self.refresh_pipedrive = False
+
         # pipeline buttons
         self.pipeline_buttons = {}
 
@@ -1502,7 +1508,7 @@ class App(customtkinter.CTk):
 
         # Pop up window for two run options
         select_run_option_window = customtkinter.CTkToplevel()
-        select_run_option_window.geometry("400x200")
+        select_run_option_window.geometry("400x240")
         select_run_option_window.title("Run Tool")
         select_run_option_window.attributes("-topmost", True)
         select_run_option_window.resizable(False, False)
@@ -1517,27 +1523,36 @@ class App(customtkinter.CTk):
         # Button for Generating New Deals
         run_tool_button = customtkinter.CTkButton(select_run_option_window,
                                                   text='Generate New Deals',
-                                                  command=lambda:self.run_tool(select_run_option_window))
+                                                  command=lambda:self.run_tool(select_run_option_window, refresh_pipedrive_var))
         run_tool_button.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
 
         # Button for Grabbing Deal ID of all New Deals
         grab_new_deals_button = customtkinter.CTkButton(select_run_option_window,
                                                         text="Lookup Deal ID",
-                                                        command=lambda: self.grab_new_deals(select_run_option_window))
+                                                        command=lambda: self.grab_new_deals(select_run_option_window, refresh_pipedrive_var))
         grab_new_deals_button.grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
 
+        # Check box for pulling every Pipedrive deal again, e.g. after deals left the Pipedrive filter
+        refresh_pipedrive_var = customtkinter.BooleanVar(value=False)
+        refresh_pipedrive_check_box = customtkinter.CTkCheckBox(select_run_option_window,
+                                                                variable=refresh_pipedrive_var,
+                                                                text="Refresh all Pipedrive deals")
+        refresh_pipedrive_check_box.grid(row=3, column=0, padx=10, pady=10)
+
     # Function that will run backend code of Generating New Deals
-    def run_tool(self, window: customtkinter.CTkFrame) -> None:
+    def run_tool(self, window: customtkinter.CTkFrame, refresh_pipedrive_var: customtkinter.BooleanVar) -> None:
 
+        self.refresh_pipedrive = refresh_pipedrive_var.get()
         window.destroy()
 
         # Pass true to display Run Tool Button in all pipeline display
         self.display_all_pipeline_conditions(True)
 
     # Function that will pop up confirmation of Grabbing Deal ID of all New Deals
-    def grab_new_deals(self, window: customtkinter.CTkFrame) -> None:
+    def grab_new_deals(self, window: customtkinter.CTkFrame, refresh_pipedrive_var: customtkinter.BooleanVar) -> None:
 
         # Pop up confirmation window for running run option
+        self.refresh_pipedrive = refresh_pipedrive_var.get()
         window.destroy()
         grab_new_deals_window = customtkinter.CTkToplevel()
         grab_new_deals_window.geometry("400x150")
@@ -1584,13 +1599,13 @@ class App(customtkinter.CTk):
 
         # Invoke tool backend function after 1 second
         # self.grab_new_deals_window.after(1000, self.run_grab_new_deals)
-        threading.Thread(target=self.run_grab_new_deals).start()
+        threading.Thread(target=self.run_grab_new_deals, args=(self.refresh_pipedrive,)).start()
 
 
     # Function that will run tool backend code in background
-    def run_grab_new_deals(self) -> None:
+    def run_grab_new_deals(self, refresh_pipedrive: bool = False) -> None:
 
-        error_code = grab_new_deals_id()
+        error_code = grab_new_deals_id(refresh_pipedrive=refresh_pipedrive)
         if error_code:
             self.wrong_db_credentials(error_code)
 
@@ -1840,13 +1855,18 @@ class App(customtkinter.CTk):
 
         return f"{width}x{height}+{x}+{y}"
 
+    def prefetch_pipedrive(self) -> None:
+
+        # A failed prefetch is not fatal, the tool run syncs again
+        try:
+            prefetch_pipedrive_data()
+        except Exception as e:
+            print(f"Pipedrive prefetch failed: {e}")
+
     def extract_pipedrive_stages(self) -> dict:
 
-        # Define path and read columns of pipedrive data
-        pipedrive_path = 'data/pipedrive'
-        pipedrive_data_list = os.listdir(pipedrive_path)
-        pipedrive_df = pd.read_csv(f"{pipedrive_path}/{pipedrive_data_list[0]}",
-                                     usecols=['Deal - Stage', 'Deal - Pipeline'])
+        # Read only the stage and pipeline columns of pipedrive data
+        pipedrive_df = read_pipedrive_snapshot(columns=['Deal - Stage', 'Deal - Pipeline'])
         pipedrive_df['Pipeline'] = pipedrive_df['Deal - Pipeline'].str.split('Pipeline').str[0].str.strip()
 
         # Group by pipeline name and create a list of unique stages per pipeline
@@ -1948,7 +1968,9 @@ class App(customtkinter.CTk):
 
         # If wrong credentials, pop up warning
         try:
-            threading.Thread(target=self.run_clean_up_with_callback, args=(run_tool,)).start()
+            refresh_pipedrive = self.refresh_pipedrive
+            threading.Thread(target=self.run_clean_up_with_callback,
+                             args=(lambda: run_tool(refresh_pipedrive=refresh_pipedrive),)).start()
         except Exception as e:
             self.wrong_db_credentials('main')
         # if run_error_check != 'pass':